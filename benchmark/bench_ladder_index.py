@@ -0,0 +1,125 @@
+"""
+Builds the local ladder index from a generated snapshot of 1M players and measures search latency, compared with
+a linear scan over all players, and how long an incremental snapshot refresh takes.
+Usage:
+python benchmark/bench_ladder_index.py
+"""
+import sys, os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+import asyncio
+import json
+import random
+import resource
+import string
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from loguru import logger
+
+from commands.ladder_index import GRAM_LENGTH, LadderIndex, LadderSnapshot, SEARCH_FIELDS, normalize_search
+
+PLAYERS = 1_000_000
+APPENDED = 1000
+SEARCHES = 200
+RACES = ["Zerg", "Terran", "Protoss", "Random"]
+RANKS = ["Grandmaster", "Master", "Diamond", "Platinum", "Gold", "Silver", "Bronze"]
+REGIONS = ["US", "EU", "KR"]
+
+
+def create_player(rng: random.Random, profile_id: int) -> dict:
+    username: str = "".join(rng.choice(string.ascii_letters) for _ in range(rng.randint(4, 12)))
+    clan: str = "".join(rng.choice(string.ascii_uppercase + string.digits) for _ in range(rng.randint(2, 6)))
+    return {
+        "realm": 1,
+        "region": rng.choice(REGIONS),
+        "rank": rng.choice(RANKS),
+        "username": username,
+        "bnet_id": f"{username}#{rng.randint(1000, 9999)}",
+        "race": rng.choice(RACES),
+        "mmr": rng.randint(1000, 7500),
+        "wins": rng.randint(0, 500),
+        "losses": rng.randint(0, 500),
+        "clan": clan if rng.random() < 0.3 else None,
+        "profile_id": profile_id,
+        "alias": username.lower() if rng.random() < 0.01 else None,
+    }
+
+
+def linear_search(players: List[dict], query: str, limit: int = 15) -> List[dict]:
+    """ Same results as LadderIndex.search(), by checking every player """
+    query = normalize_search(query)
+    matches: List[dict] = []
+    for player in players:
+        keys = [str(player[field]).lower() for field in SEARCH_FIELDS if player.get(field)]
+        if any(key.startswith(query) if len(query) < GRAM_LENGTH else query in key for key in keys):
+            matches.append(player)
+    return sorted(matches, key=lambda player: player["mmr"], reverse=True)[:limit]
+
+
+def measure(search: Callable[[str], List[dict]], queries: List[str]) -> float:
+    """ Mean microseconds per search """
+    t0 = time.perf_counter()
+    for query in queries:
+        search(query)
+    return (time.perf_counter() - t0) / len(queries) * 1_000_000
+
+
+async def main():
+    logger.remove()
+    rng = random.Random(0)
+    players: List[dict] = [create_player(rng, profile_id) for profile_id in range(PLAYERS)]
+    sample: List[dict] = rng.sample(players, SEARCHES)
+    clans: List[dict] = [player for player in players if player["clan"]]
+    query_sets: Dict[str, List[str]] = {
+        "full username": [player["username"] for player in sample],
+        "battle tag": [player["bnet_id"] for player in sample],
+        "clan tag": [f"[{player['clan']}]" for player in rng.sample(clans, SEARCHES)],
+        "4 char substring": [player["username"][1:5] for player in sample],
+        "2 char prefix": [player["username"][:2] for player in sample],
+    }
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = Path(folder) / "ladder_snapshot.jsonl"
+        with path.open("w") as f:
+            for player in players:
+                f.write(json.dumps(player) + "\n")
+        print(f"Snapshot of {PLAYERS} players: {path.stat().st_size / 1e6:.0f} MB")
+
+        snapshot = LadderSnapshot(path)
+        rss_before: int = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        t0 = time.perf_counter()
+        await snapshot.refresh()
+        print(
+            f"Built index in {time.perf_counter() - t0:.1f}s, {len(snapshot.index.postings)} posting lists, "
+            f"peak memory grew by {(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) / 1024:.0f} MB"
+        )
+
+        index: LadderIndex = snapshot.index
+        for name, queries in query_sets.items():
+            # The index has to find exactly what a scan over all players finds
+            for query in queries[:3]:
+                assert [r["profile_id"] for r in index.search(query)] == [
+                    r["profile_id"] for r in linear_search(players, query)
+                ], query
+            indexed: float = measure(index.search, queries)
+            scanned: float = measure(lambda query: linear_search(players, query), queries[:3])
+            print(
+                f"{name:>16}: index {indexed:>9.1f}us, linear scan {scanned / 1000:>7.0f}ms "
+                f"({scanned / indexed:,.0f}x)"
+            )
+
+        with path.open("a") as f:
+            for profile_id in range(PLAYERS, PLAYERS + APPENDED):
+                f.write(json.dumps(create_player(rng, profile_id)) + "\n")
+        t0 = time.perf_counter()
+        await snapshot.refresh()
+        assert snapshot.index is index and len(index) == PLAYERS + APPENDED
+        print(f"Applied {APPENDED} appended players in {(time.perf_counter() - t0) * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
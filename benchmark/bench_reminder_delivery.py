@@ -0,0 +1,67 @@
+"""
+Delivers a burst of due reminders through a fake discord client with injected REST latency.
+Usage:
+python benchmark/bench_reminder_delivery.py
+"""
+import sys, os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "test"))
+
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Tuple
+
+from loguru import logger
+
+from commands.metrics import LatencyHistogram
+from commands.public_remind import Remind, Reminder
+from fake_discord import FakeClient
+
+REMINDERS = 500
+LATENCY = 0.02
+
+
+async def measure_tick(concurrency: int) -> Tuple[float, int, Dict[str, LatencyHistogram]]:
+    """ Returns the duration of the tick, the amount of messages sent to the channel and the delivery lateness """
+    client = FakeClient(latency=LATENCY)
+    channel = client.add_channel(1)
+    with tempfile.TemporaryDirectory() as folder:
+        r = Remind(client=client, data_folder=Path(folder))
+        r.delivery_concurrency = concurrency
+        await r.load_reminders()
+        now = time.time()
+        for user_id in range(REMINDERS):
+            client.add_user(user_id)
+            # Every second reminder was created with a prefix command and is sent as direct message
+            message_id = user_id if user_id % 2 else 0
+            await r._add_reminder(
+                Reminder(reminder_utc_timestamp=now - 1, user_id=user_id, channel_id=1, message_id=message_id)
+            )
+
+        t0 = time.perf_counter()
+        await r.tick()
+        t1 = time.perf_counter()
+        await r.shutdown()
+        return t1 - t0, len(channel.sent), r.delivery_lateness
+
+
+async def main():
+    logger.remove()
+    print(f"{REMINDERS} due reminders, {LATENCY * 1000:.0f}ms per REST call")
+    for concurrency in [1, 5, 10, 25, 50]:
+        duration, channel_messages, lateness = await measure_tick(concurrency)
+        print(
+            f"concurrency {concurrency:>3}: {duration:>6.2f}s, {REMINDERS / duration:>8.1f} reminders/s, "
+            f"{channel_messages} channel messages, lateness p50/p99 "
+            + ", ".join(
+                f"{path} {histogram.percentile(50):.2f}s/{histogram.percentile(99):.2f}s"
+                for path, histogram in lateness.items()
+            )
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,84 @@
+"""
+Measures the memory used by a heap of reminders, compared to the previous Reminder class with a __dict__ per instance.
+Usage:
+python benchmark/bench_reminder_memory.py
+"""
+import sys, os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+import gc
+import json
+import tracemalloc
+from heapq import heapify
+from typing import Callable, List
+
+from commands.public_remind import Reminder
+
+
+class DictReminder:
+    """ The previous Reminder class """
+
+    def __init__(self, reminder_utc_timestamp=0, user_id=0, user_name="", guild_id=0, channel_id=0, message="", message_id=0):
+        self.reminder_utc_timestamp = reminder_utc_timestamp
+        self.guild_id = guild_id
+        self.channel_id = channel_id
+        self.user_id = user_id
+        self.user_name = user_name
+        self.message = message
+        self.message_id = message_id
+
+    def __lt__(self, other):
+        return self.reminder_utc_timestamp < other.reminder_utc_timestamp
+
+    @staticmethod
+    def from_dict(dict):
+        r = DictReminder()
+        r.__dict__.update(dict)
+        return r
+
+
+def create_serialized_reminders(amount: int) -> List[dict]:
+    # Round trip through json, so that strings are separate objects like after loading the reminder file
+    return json.loads(
+        json.dumps(
+            [
+                {
+                    "reminder_utc_timestamp": 1_600_000_000 + i * 1.5,
+                    "guild_id": 384968030423351298,
+                    "channel_id": 384968030423351299 + i % 50,
+                    "user_id": 100_000_000_000_000_000 + i % 10_000,
+                    "user_name": f"user{i % 10_000}",
+                    "message": "scrim",
+                    "message_id": 800_000_000_000_000_000 + i,
+                }
+                for i in range(amount)
+            ]
+        )
+    )
+
+
+def measure(from_dict: Callable, serialized: List[dict]) -> int:
+    gc.collect()
+    tracemalloc.start()
+    heap = [(data["reminder_utc_timestamp"], from_dict(data)) for data in serialized]
+    heapify(heap)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del heap
+    return size
+
+
+def main():
+    for amount in [10_000, 100_000, 1_000_000]:
+        serialized = create_serialized_reminders(amount)
+        old = measure(DictReminder.from_dict, serialized)
+        new = measure(Reminder.from_dict, serialized)
+        print(
+            f"{amount:>9} reminders: __dict__ {old / 2 ** 20:>8.1f} MiB ({old / amount:>5.0f} B/reminder), "
+            f"__slots__ {new / 2 ** 20:>8.1f} MiB ({new / amount:>5.0f} B/reminder)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Compares how many reminder writes per second the reminder storage backends can do.
+Usage:
+python benchmark/bench_reminder_persistence.py
+"""
+import sys, os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+from commands.public_remind import Remind, Reminder
+
+
+async def measure_writes_per_second(storage: str, existing_reminders: int, writes: int) -> float:
+    with tempfile.TemporaryDirectory() as folder:
+        r = Remind(client=None, data_folder=Path(folder))
+        r.reminder_storage = storage
+        await r.load_reminders()
+        # One reminder per minute, so the partitioned store spreads them over many buckets
+        existing = [Reminder(reminder_utc_timestamp=i * 60, user_id=i, message=f"reminder {i}") for i in range(existing_reminders)]
+        for reminder in existing:
+            r.reminders.push(reminder)
+        if storage in {"sqlite", "partitioned"}:
+            r.store.record_many("add", [reminder.to_dict() for reminder in existing])
+        else:
+            await r.save_reminders()
+
+        t0 = time.perf_counter()
+        for i in range(writes):
+            await r._add_reminder(Reminder(reminder_utc_timestamp=(existing_reminders + i) * 60, user_id=i, message="new"))
+            if storage == "json":
+                # Write every change instead of coalescing them, like before the json file was written in the background
+                await r.save_reminders()
+        t1 = time.perf_counter()
+        await r.shutdown()
+        return writes / (t1 - t0)
+
+
+async def main():
+    for existing_reminders in [100, 10_000, 50_000]:
+        writes = 2000 if existing_reminders <= 100 else 50
+        rewrite = await measure_writes_per_second("json", existing_reminders, writes)
+        journal = await measure_writes_per_second("journal", existing_reminders, writes * 20)
+        sqlite = await measure_writes_per_second("sqlite", existing_reminders, writes * 20)
+        partitioned = await measure_writes_per_second("partitioned", existing_reminders, writes * 20)
+        print(
+            f"{existing_reminders:>6} reminders: json rewrite {rewrite:>10.1f} writes/s, "
+            f"journal {journal:>10.1f} writes/s ({journal / rewrite:.1f}x), "
+            f"sqlite {sqlite:>10.1f} writes/s ({sqlite / rewrite:.1f}x), "
+            f"partitioned {partitioned:>10.1f} writes/s ({partitioned / rewrite:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
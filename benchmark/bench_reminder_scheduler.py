@@ -0,0 +1,89 @@
+"""
+Replays the same operation trace against the binary heap (ReminderQueue) and the timing wheel (TimingWheelQueue).
+The trace starts with a number of pending reminders, then simulates one hour in which every second new reminders
+are added, some are cancelled and all due reminders are popped.
+Usage:
+python benchmark/bench_reminder_scheduler.py
+"""
+import sys, os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+import random
+import time
+from typing import Callable, List, Tuple
+
+from commands.public_remind import Reminder
+from commands.reminder_queue import ReminderQueue
+from commands.timing_wheel import TimingWheelQueue
+
+START = 1_600_000_000
+SIMULATED_SECONDS = 3600
+PUSHES_PER_SECOND = 50
+CANCELS_PER_SECOND = 5
+
+
+def create_trace(pending: int, seed: int = 0) -> Tuple[List[float], List[Tuple[str, int]]]:
+    """ Due times of all reminders, and a list of ('push', index), ('cancel', index) and ('advance', second) """
+    rng = random.Random(seed)
+    # Pending reminders are due within 30 days, new ones mostly within minutes to hours
+    timestamps: List[float] = [START + rng.uniform(0, 30 * 86400) for _ in range(pending)]
+    operations: List[Tuple[str, int]] = []
+    for second in range(1, SIMULATED_SECONDS + 1):
+        for _ in range(PUSHES_PER_SECOND):
+            timestamps.append(START + second + rng.choice([rng.uniform(0, 300), rng.uniform(0, 86400)]))
+            operations.append(("push", len(timestamps) - 1))
+        for _ in range(CANCELS_PER_SECOND):
+            operations.append(("cancel", rng.randrange(len(timestamps))))
+        operations.append(("advance", START + second))
+    return timestamps, operations
+
+
+def replay(create_queue: Callable, timestamps: List[float], operations: List[Tuple[str, int]], pending: int):
+    """ Returns the time to build the queue, the time to replay the trace and the popped due times """
+    reminders: List[Reminder] = [Reminder(reminder_utc_timestamp=timestamp) for timestamp in timestamps]
+    popped_ids = set()
+    popped: List[float] = []
+    t0 = time.perf_counter()
+    queue = create_queue(reminders[:pending])
+    t1 = time.perf_counter()
+    for operation, value in operations:
+        if operation == "push":
+            queue.push(reminders[value])
+        elif operation == "cancel":
+            reminder = reminders[value]
+            # Like Remind, only reminders that are still queued are cancelled
+            if id(reminder) not in popped_ids:
+                queue.cancel(reminder)
+        else:
+            while 1:
+                earliest = queue.peek()
+                if earliest is None or earliest.reminder_utc_timestamp > value:
+                    break
+                reminder = queue.pop()
+                popped_ids.add(id(reminder))
+                popped.append(reminder.reminder_utc_timestamp)
+    t2 = time.perf_counter()
+    return t1 - t0, t2 - t1, popped
+
+
+def main():
+    schedulers = {
+        "heap": ReminderQueue,
+        "wheel": lambda reminders: TimingWheelQueue(reminders, time_now=START),
+    }
+    for pending in [10_000, 100_000, 1_000_000]:
+        timestamps, operations = create_trace(pending)
+        results = {name: replay(create_queue, timestamps, operations, pending) for name, create_queue in schedulers.items()}
+        # Both schedulers have to fire the same reminders in the same order
+        assert results["heap"][2] == results["wheel"][2]
+        print(f"{pending:>9} pending, {len(operations)} operations, {len(results['heap'][2])} fired")
+        for name, (build_seconds, replay_seconds, _) in results.items():
+            print(
+                f"    {name:>5}: build {build_seconds * 1000:>8.1f} ms, replay {replay_seconds * 1000:>8.1f} ms, "
+                f"{len(operations) / replay_seconds:>10.0f} operations/s"
+            )
+
+
+if __name__ == "__main__":
+    main()
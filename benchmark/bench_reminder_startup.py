@@ -0,0 +1,100 @@
+"""
+Measures how long the bot needs to load its reminders at startup, compared to the previous implementation
+which used json.load and pushed the reminders onto the heap one by one.
+Usage:
+python benchmark/bench_reminder_startup.py
+"""
+import sys, os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+import asyncio
+import json
+import tempfile
+import time
+import tracemalloc
+from bisect import insort
+from heapq import heappush
+from pathlib import Path
+from typing import Dict, List
+
+from loguru import logger
+
+from commands.public_remind import Remind, Reminder
+
+
+def write_reminder_file(path: Path, amount: int):
+    reminders = [
+        {
+            "reminder_utc_timestamp": 1_600_000_000 + (i * 7919) % amount * 1.5,
+            "guild_id": 384968030423351298,
+            "channel_id": 384968030423351299 + i % 50,
+            "user_id": 100_000_000_000_000_000 + i % 10_000,
+            "user_name": f"user{i % 10_000}",
+            "message": "scrim",
+            "message_id": 800_000_000_000_000_000 + i,
+        }
+        for i in range(amount)
+    ]
+    path.write_text(json.dumps(reminders, indent=2))
+
+
+def load_previous(path: Path) -> int:
+    """ The previous startup path """
+    with open(path) as f:
+        data = json.load(f)
+    heap: List[Reminder] = []
+    reminders_by_user: Dict[int, List[Reminder]] = {}
+    for reminder_dict in data:
+        reminder = Reminder(**reminder_dict)
+        heappush(heap, reminder)
+        insort(reminders_by_user.setdefault(reminder.user_id, []), reminder)
+    return len(heap)
+
+
+async def load_current(folder: Path, storage: str) -> int:
+    r = Remind(client=None, data_folder=folder)
+    r.reminder_storage = storage
+    await r.load_reminders()
+    r.store.close()
+    return len(r.reminders)
+
+
+async def main():
+    logger.remove()
+    for amount in [100_000, 1_000_000]:
+        with tempfile.TemporaryDirectory() as folder:
+            path = Path(folder) / "reminders.json"
+            write_reminder_file(path, amount)
+
+            t0 = time.perf_counter()
+            assert load_previous(path) == amount
+            t1 = time.perf_counter()
+            assert await load_current(Path(folder), "json") == amount
+            t2 = time.perf_counter()
+            assert await load_current(Path(folder), "journal") == amount
+            t3 = time.perf_counter()
+            print(
+                f"{amount:>9} reminders: previous {t1 - t0:>6.2f}s, "
+                f"json {t2 - t1:>6.2f}s ({(t1 - t0) / (t2 - t1):.1f}x), "
+                f"journal {t3 - t2:>6.2f}s ({(t1 - t0) / (t3 - t2):.1f}x)"
+            )
+
+            if amount == 100_000:
+                # Separate runs, as tracing every allocation slows down loading
+                tracemalloc.start()
+                load_previous(path)
+                _, previous_peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                tracemalloc.start()
+                await load_current(Path(folder), "json")
+                _, current_peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                print(
+                    f"{amount:>9} reminders: peak memory previous {previous_peak / 2 ** 20:.1f} MiB, "
+                    f"json {current_peak / 2 ** 20:.1f} MiB"
+                )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
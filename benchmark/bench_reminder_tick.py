@@ -0,0 +1,108 @@
+"""
+Measures Remind.tick() and the due check inside of it with an empty heap, 1k due reminders and 1M pending reminders.
+The due check is compared with the previous version, which created an Arrow object per call and compared floats.
+Usage:
+python benchmark/bench_reminder_tick.py
+"""
+import sys, os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "test"))
+
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List
+
+import arrow
+from loguru import logger
+
+from commands.public_remind import Remind, Reminder
+from commands.reminder_queue import ReminderQueue
+from fake_discord import FakeClient
+
+
+def previous_pop_due_reminders(r: Remind, limit: int) -> List[Reminder]:
+    """ Remind._pop_due_reminders() before the scheduling core used integer epoch milliseconds """
+    due_reminders: List[Reminder] = []
+    time_now: float = arrow.utcnow().timestamp()
+    while len(due_reminders) < limit:
+        earliest_reminder = r.reminders.peek()
+        if earliest_reminder is None or earliest_reminder.reminder_utc_timestamp >= time_now + r.coalesce_window:
+            break
+        reminder: Reminder = r.reminders.pop()
+        r._unindex_reminder(reminder)
+        due_reminders.append(reminder)
+    return due_reminders
+
+
+def current_pop_due_reminders(r: Remind, limit: int) -> List[Reminder]:
+    return r._pop_due_reminders(limit)
+
+
+def fill_queue(r: Remind, reminders: List[Reminder]):
+    r.reminders = ReminderQueue(reminders)
+    r.reminders_by_user = {}
+    for reminder in reminders:
+        r._index_reminder(reminder)
+
+
+def measure_pop_due(r: Remind, pop_due: Callable, create_reminders: Callable, repeat: int) -> float:
+    """ Mean microseconds to take all due reminders from the queue """
+    total: float = 0
+    for _ in range(repeat):
+        fill_queue(r, create_reminders())
+        t0 = time.perf_counter()
+        while pop_due(r, r.tick_batch_size):
+            pass
+        total += time.perf_counter() - t0
+    return total / repeat * 1_000_000
+
+
+async def measure_ticks(r: Remind, create_reminders: Callable, repeat: int) -> float:
+    """ Mean milliseconds of a tick, as reported by the tick instrumentation """
+    total: float = 0
+    for _ in range(repeat):
+        fill_queue(r, create_reminders())
+        await r.tick()
+        total += r.last_tick.duration_ms
+    return total / repeat
+
+
+async def main():
+    logger.remove()
+    client = FakeClient()
+    for channel_id in range(10):
+        client.add_channel(channel_id)
+    for user_id in range(1000):
+        client.add_user(user_id, cached=True)
+
+    now = time.time()
+    pending_reminders = [Reminder(now + 3600 + i, user_id=i % 1000, channel_id=i % 10) for i in range(1_000_000)]
+    scenarios = {
+        "empty heap": (lambda: [], 1000),
+        "1k due": (lambda: [Reminder(now - 10 + i / 1000, user_id=i, channel_id=i % 10) for i in range(1000)], 5),
+        "1M pending": (lambda: pending_reminders, 3),
+    }
+    with tempfile.TemporaryDirectory() as folder:
+        r = Remind(client=client)
+        r.reminder_file_path = Path(folder) / "reminders.json"
+        r.reminder_journal_path = Path(folder) / "reminders.journal"
+        r.reminder_outbox_path = Path(folder) / "reminders.outbox"
+        r.reminder_dead_letter_path = Path(folder) / "reminders_dead_letter.jsonl"
+        await r.load_reminders()
+        for name, (create_reminders, repeat) in scenarios.items():
+            previous = measure_pop_due(r, previous_pop_due_reminders, create_reminders, repeat)
+            current = measure_pop_due(r, current_pop_due_reminders, create_reminders, repeat)
+            tick = await measure_ticks(r, create_reminders, repeat)
+            print(
+                f"{name:>10}: due check previous {previous:>9.1f}us, epoch ms {current:>9.1f}us "
+                f"({previous / current:.1f}x), whole tick {tick:>8.3f}ms, "
+                f"fired {r.last_tick.fired}, queue size {r.last_tick.queue_size}"
+            )
+        await r.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
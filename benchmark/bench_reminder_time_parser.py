@@ -0,0 +1,117 @@
+"""
+Compares the throughput of the reminder time parsers with the regular expressions they replaced.
+Usage:
+python benchmark/bench_reminder_time_parser.py
+"""
+import sys, os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+import re
+import time
+from typing import Callable, List
+
+import arrow
+
+from commands.reminder_time_parser import parse_date_and_time, parse_time_shift
+
+
+def regex_parse_date_and_time(message: str, time_now: arrow.Arrow):
+    """ The previous implementation of Remind._parse_date_and_time_from_message """
+    date_pattern = r"(?:(?:(\d{4})-)?(\d{1,2})-(\d{1,2}))?"
+    time_pattern = r"(?:(\d{1,2}):(\d{1,2})(?::(\d{1,2}))?)?"
+    text_pattern = "((?:.|\n)+)"
+    space_pattern = " ?"
+    regex_pattern = f"{date_pattern}{space_pattern}{time_pattern}{space_pattern} {text_pattern}"
+    result = re.fullmatch(regex_pattern, message)
+    if result is None:
+        return None
+    results = [(message[x[0] : x[1]] if x != (-1, -1) else "") for x in result.regs]
+    _ = results.pop(0)
+    year, month, day, hour, minute, second, reminder_message = results
+    if not reminder_message.strip():
+        return None
+    if not all([month, day]) and not all([hour, minute]):
+        return None
+    year = year if year else time_now.year
+    month = month if month else time_now.month
+    day = day if day else time_now.day
+    hour, minute, second = [v.zfill(2) for v in [hour, minute, second]]
+    try:
+        future_reminder_time = arrow.get(
+            f"{str(year).zfill(2)}-{str(month).zfill(2)}-{str(day).zfill(2)} {str(hour).zfill(2)}:{str(minute).zfill(2)}:{str(second).zfill(2)}",
+            ["YYYY-MM-DD HH:mm:ss"],
+        )
+    except (ValueError, arrow.parser.ParserError):
+        return None
+    return future_reminder_time, reminder_message.strip()
+
+
+def regex_parse_time_shift(message: str, time_now: arrow.Arrow):
+    """ The previous implementation of Remind._parse_time_shift_from_message """
+    days_pattern = "(?:([0-9]+) ?(?:d|day|days))?"
+    hours_pattern = "(?:([0-9]+) ?(?:h|hour|hours))?"
+    minutes_pattern = "(?:([0-9]+) ?(?:m|min|mins|minute|minutes))?"
+    seconds_pattern = "(?:([0-9]+) ?(?:s|sec|secs|second|seconds))?"
+    text_pattern = "((?:.|\n)+)"
+    space_pattern = " ?"
+    regex_pattern = f"{days_pattern}{space_pattern}{hours_pattern}{space_pattern}{minutes_pattern}{space_pattern}{seconds_pattern} {text_pattern}"
+    result = re.fullmatch(regex_pattern, message)
+    if result is None:
+        return None
+    results = [(message[x[0] : x[1]] if x != (-1, -1) else "") for x in result.regs]
+    _ = results.pop(0)
+    day, hour, minute, second, reminder_message = results
+    if not reminder_message.strip():
+        return None
+    if not ((day or hour or minute or second) and reminder_message):
+        return None
+    days, hours, minutes, seconds = map(int, [v.zfill(1) for v in [day, hour, minute, second]])
+    if any(time > 1_000_000 for time in [days, hours, minutes, seconds]):
+        return None
+    try:
+        future_reminder_time = time_now.shift(days=days, hours=hours, minutes=minutes, seconds=seconds)
+    except OverflowError:
+        return None
+    return future_reminder_time, reminder_message.strip()
+
+
+def measure(parse: Callable, messages: List[str], repeat: int) -> float:
+    time_now = arrow.utcnow()
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        for message in messages:
+            parse(message, time_now)
+    return len(messages) * repeat / (time.perf_counter() - t0)
+
+
+def main():
+    cases = {
+        "remindat typical": (
+            [parse_date_and_time, regex_parse_date_and_time],
+            ["2021-04-20 04:20:00 scrim", "04-20 04:20 remind me of this", "20:00 scrim", "hello"],
+            5000,
+        ),
+        "reminder typical": (
+            [parse_time_shift, regex_parse_time_shift],
+            ["5d 3h 2m 1s remind me of this", "1day 1hour remind me", "30m tea", "hello"],
+            5000,
+        ),
+        "remindat 2000 chars": (
+            [parse_date_and_time, regex_parse_date_and_time],
+            ["20:00 " + "a" * 2000, "1-" * 1000, "1 " * 1000],
+            200,
+        ),
+        "reminder 2000 chars": (
+            [parse_time_shift, regex_parse_time_shift],
+            ["5m " + "a" * 2000, "1" * 2000, "1 " * 1000],
+            200,
+        ),
+    }
+    for name, (parsers, messages, repeat) in cases.items():
+        new, old = [measure(parse, messages, repeat) for parse in parsers]
+        print(f"{name:<20}: parser {new:>10.0f} msg/s, regex {old:>10.0f} msg/s ({new / old:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,16 +8,26 @@ from discord.ext import commands
 from discord_slash import SlashCommand
 from discord_slash.utils import manage_commands
 import json, os
+import copy
+from pathlib import Path
 from typing import List, Dict, Set, Optional, Union
 import asyncio
+import aiohttp
 import sys
 
 import traceback
 
 from loguru import logger
 
-from commands.public_mmr import public_mmr
+from commands.http_client import HttpClient
+from commands.ladder_index import LadderIndex, LadderSnapshot
+from commands.message_splitter import DISCORD_MESSAGE_LIMIT
+from commands.persister import DebouncedPersister
+from commands.public_mmr import public_mmr, public_mmr_batch
 from commands.public_remind import Remind
+from commands.sharding import get_client_shards
+from commands.single_flight import SingleFlight
+from commands.tiered_cache import TieredCache
 
 # from commands.public_vod import Vod
 
@@ -47,15 +57,75 @@ def write_error(error: Exception, file_name="bot_error.log"):
     print(trace, flush=True)
 
 
-# Instanciate classes
-client = commands.Bot(command_prefix="!")
-slash = SlashCommand(client, sync_commands=True)
-my_reminder: Remind = Remind(client)
+# Run the bot as several processes with e.g. SHARD_COUNT=2 SHARD_ID=0 and SHARD_COUNT=2 SHARD_ID=1,
+# or as one process with AUTO_SHARD=1 which lets discord decide the amount of shards
+shard_count: Optional[int] = int(os.environ["SHARD_COUNT"]) if "SHARD_COUNT" in os.environ else None
+shard_id: Optional[int] = int(os.environ["SHARD_ID"]) if "SHARD_ID" in os.environ else None
+BotBase = commands.AutoShardedBot if os.environ.get("AUTO_SHARD") else commands.Bot
+
+
+class Bot(BotBase):
+    async def close(self):
+        """ Write pending reminder and settings changes to disk before disconnecting """
+        try:
+            await my_reminder.shutdown()
+            await settings_persister.flush()
+            # Background refreshes of the cache still need the http client
+            await mmr_cache.close()
+            await http_client.close()
+            if my_reminder.store is not None:
+                logger.info(f"Coalesced {my_reminder.store.coalesced_writes} reminder writes")
+            logger.info(f"Coalesced {settings_persister.coalesced_writes} settings writes")
+            logger.info(f"MMR cache: {mmr_cache.summary()}")
+            logger.info(f"Saved {mmr_flights.coalesced} sc2ladder requests by joining identical requests in flight")
+        except Exception:
+            logger.exception("Failed to shut down cleanly")
+        finally:
+            # Always disconnect, even if writing to disk failed
+            await super().close()
+
 
 # Static variables
 guild_ids = [384968030423351298]
 bot_folder_path = os.path.dirname(__file__)
 
+# Load settings
+settings_path = os.path.join(bot_folder_path, "settings.json")
+settings = {}
+if os.path.exists(settings_path):
+    with open(settings_path) as f:
+        settings: dict = json.load(f)
+# The only writer of settings.json, the commands get the settings and mark them dirty after changing them
+settings_persister = DebouncedPersister(Path(settings_path), lambda: copy.deepcopy(settings))
+
+# Instanciate classes
+client = Bot(command_prefix="!", shard_id=shard_id, shard_count=shard_count)
+slash = SlashCommand(client, sync_commands=True)
+my_reminder: Remind = Remind(
+    client, settings=settings, settings_persister=settings_persister, data_folder=Path(bot_folder_path) / "data"
+)
+# Shared by all commands which call external apis, keeps connections alive between commands
+http_client: HttpClient = HttpClient(
+    timeouts={
+        "www.sc2ladder.com": aiohttp.ClientTimeout(total=10, sock_connect=5),
+        "api.twitch.tv": aiohttp.ClientTimeout(total=15, sock_connect=5),
+    }
+)
+if shard_id is not None:
+    # All processes share the reminder database, but each one has its own outbox of due reminders
+    my_reminder.reminder_storage = "sqlite"
+    my_reminder.reminder_outbox_path = my_reminder.data_folder / f"reminders_shard{shard_id}.outbox"
+    my_reminder.reminder_dead_letter_path = my_reminder.data_folder / f"reminders_dead_letter_shard{shard_id}.jsonl"
+
+# Ladder data changes slowly, results are fresh for 10 minutes and served while refreshing for up to a day
+mmr_cache: TieredCache = TieredCache(ttl=600, stale_ttl=86400, path=Path(bot_folder_path) / "data" / "mmr_cache.json")
+mmr_flights: SingleFlight = SingleFlight()
+# Optional local copy of the ladder, '!mmr' answers from it without asking sc2ladder if it finds the player
+ladder_snapshot_path = Path(bot_folder_path) / "data" / "ladder_snapshot.jsonl"
+ladder_snapshot: Optional[LadderSnapshot] = None
+if ladder_snapshot_path.exists():
+    ladder_snapshot = LadderSnapshot(ladder_snapshot_path)
+
 # Load twitch client_id
 client_id_path = os.path.join(bot_folder_path, "my_client_id.json")
 client_id = ""
@@ -64,13 +134,6 @@ if os.path.exists(client_id_path):
         data: dict = json.load(f)
         client_id = data["client_id"]
 
-# Load settings
-settings_path = os.path.join(bot_folder_path, "settings.json")
-settings = {}
-if os.path.exists(settings_path):
-    with open(settings_path) as f:
-        settings: dict = json.load(f)
-
 
 bot_is_ready = False
 
@@ -78,7 +141,8 @@ bot_is_ready = False
 @client.event
 async def on_ready():
     global bot_is_ready
-    await my_reminder.load_reminders()
+    # Loads the reminders of this process' shards, and again if the shard count changed since the last connect
+    await my_reminder.set_shards(*get_client_shards(client))
     bot_is_ready = True
     print("Ready!")
 
@@ -98,11 +162,26 @@ async def on_ready():
     ],
 )
 @client.command()
-async def mmr(ctx: commands.Context, name: str):
+async def mmr(ctx: commands.Context, name: str, *names: str):
     author: discord.User = ctx.author
-    result = await public_mmr(author, name)
     channel: discord.TextChannel = ctx.channel
-    await channel.send(f"@{author.name}\n{result}")
+    mention: str = f"@{author.name}\n"
+    index: Optional[LadderIndex] = ladder_snapshot.index if ladder_snapshot is not None else None
+    if names:
+        # '!mmr name1 name2 name3' looks up all names at once and answers with one table
+        results = await public_mmr_batch(
+            author,
+            [name, *names],
+            http_client,
+            mmr_cache,
+            mmr_flights,
+            index,
+            limit=DISCORD_MESSAGE_LIMIT - len(mention),
+        )
+    else:
+        results = [await public_mmr(author, name, http_client, mmr_cache, mmr_flights, index)]
+    for result in results:
+        await channel.send(f"{mention}{result}")
 
 
 # TODO Re-enable command:
@@ -150,8 +229,8 @@ async def reminder_slash(ctx: commands.Context, time: str, message: str):
 
 
 @client.command()
-async def reminder(ctx: commands.Context, *message_list):
-    message = " ".join(message_list)
+async def reminder(ctx: commands.Context, *, message: str = ""):
+    # Keeps line breaks, every line is a separate reminder
     await _reminder(ctx, "", message)
 
 
@@ -191,8 +270,8 @@ async def remindat_slash(ctx: commands.Context, time: str, message: str):
 
 
 @client.command()
-async def remindat(ctx: commands.Context, *message_list):
-    message = " ".join(message_list)
+async def remindat(ctx: commands.Context, *, message: str = ""):
+    # Keeps line breaks, every line is a separate reminder
     await _remindat(ctx, "", message)
 
 
@@ -214,7 +293,7 @@ async def reminders(ctx: commands.Context, *args):
     options=[
         manage_commands.create_option(
             name="reminder_id",
-            description="Which reminder you want to remove. See !reminders",
+            description="Which reminders you want to remove, e.g. '2', '1-5,8' or 'all'. See !reminders",
             # Option type: https://discord.com/developers/docs/interactions/slash-commands#applicationcommandoptiontype
             option_type=3,
             required=True,
@@ -222,7 +301,7 @@ async def reminders(ctx: commands.Context, *args):
     ],
 )
 @client.command()
-async def delreminder(ctx: commands.Context, reminder_id: str):
+async def delreminder(ctx: commands.Context, *, reminder_id: str):
     author: discord.User = ctx.author
     response = await my_reminder.public_del_remind(author, reminder_id)
     channel: discord.TextChannel = ctx.channel
@@ -233,14 +312,14 @@ async def delreminder(ctx: commands.Context, reminder_id: str):
 
 
 async def loop_function():
-    """ A function that is called every X seconds based on the asyncio.sleep(time) below. """
-    global bot_is_ready
-    while 1:
+    """ Waits until the bot is ready, then lets the reminder scheduler sleep until the next reminder is due. """
+    # Wait until bot is ready until reminders get sent
+    # TODO If bot disconnects, un-ready the bot?
+    while not bot_is_ready:
         await asyncio.sleep(1)
-        # Wait until bot is ready until it gets called
-        # TODO If bot disconnects, un-ready the bot?
-        if bot_is_ready:
-            await my_reminder.tick()
+    if ladder_snapshot is not None:
+        asyncio.ensure_future(ladder_snapshot.run())
+    await my_reminder.run_scheduler()
 
 
 if __name__ == "__main__":
@@ -8,14 +8,23 @@ import asyncio
 from prettytable import PrettyTable  # pip install PTable
 import traceback
 
+from commands.persister import DebouncedPersister
+
 
 class BaseClass(discord.Client):
-    def __init__(self):
+    def __init__(self, settings: Optional[dict] = None, settings_persister: Optional[DebouncedPersister] = None):
         super().__init__()
         self.owner = "BuRny#8752"
         self.client_id = ""
         self.trigger = "!"
-        self.settings = {}
+        # Owned by the bot, which also owns the only persister of settings.json
+        self.settings: dict = settings if settings is not None else {}
+        self.settings_persister: Optional[DebouncedPersister] = settings_persister
+
+    async def save_settings(self):
+        """ Save settings to disk after every change, bursts of changes are written together in the background """
+        if self.settings_persister is not None:
+            self.settings_persister.mark_dirty()
 
     async def _get_message_as_list(self, message: discord.Message) -> List[str]:
         """ Parse a message and return the message as list (without the trigger at the start) """
@@ -0,0 +1,85 @@
+from types import SimpleNamespace
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import aiohttp
+from loguru import logger
+
+
+class HttpClient:
+    """
+    One long lived aiohttp session which is shared by all commands, so connections to the same upstream are kept
+    alive and reused instead of doing a new DNS lookup, TCP and TLS handshake for every command.
+    The session is created on the first request, because aiohttp sessions have to be created inside the event loop.
+    """
+
+    def __init__(
+        self,
+        limit: int = 100,
+        limit_per_host: int = 10,
+        ttl_dns_cache: Optional[int] = 300,
+        keepalive_timeout: float = 30,
+        default_timeout: aiohttp.ClientTimeout = aiohttp.ClientTimeout(total=10, sock_connect=5),
+        timeouts: Optional[Dict[str, aiohttp.ClientTimeout]] = None,
+    ):
+        self.limit: int = limit
+        self.limit_per_host: int = limit_per_host
+        self.ttl_dns_cache: Optional[int] = ttl_dns_cache
+        self.keepalive_timeout: float = keepalive_timeout
+        self.default_timeout: aiohttp.ClientTimeout = default_timeout
+        # Host name -> timeout for requests to that upstream
+        self.timeouts: Dict[str, aiohttp.ClientTimeout] = timeouts or {}
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.requests: int = 0
+        # A request that got a pooled connection is a hit, one that had to open a new connection is a miss
+        self.pool_hits: int = 0
+        self.pool_misses: int = 0
+
+    def _create_session(self) -> aiohttp.ClientSession:
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_connection_reuseconn.append(self._on_connection_reused)
+        trace_config.on_connection_create_end.append(self._on_connection_created)
+        connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            ttl_dns_cache=self.ttl_dns_cache,
+            use_dns_cache=self.ttl_dns_cache is not None,
+            keepalive_timeout=self.keepalive_timeout,
+        )
+        return aiohttp.ClientSession(connector=connector, timeout=self.default_timeout, trace_configs=[trace_config])
+
+    async def _on_connection_reused(self, session: aiohttp.ClientSession, context: SimpleNamespace, params):
+        self.pool_hits += 1
+
+    async def _on_connection_created(self, session: aiohttp.ClientSession, context: SimpleNamespace, params):
+        self.pool_misses += 1
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = self._create_session()
+        return self._session
+
+    def timeout_for(self, url: str) -> aiohttp.ClientTimeout:
+        return self.timeouts.get(urlsplit(url).hostname, self.default_timeout)
+
+    def get(self, url: str, **kwargs):
+        """ Same as aiohttp.ClientSession.get(), use it with 'async with', uses the timeout of the upstream """
+        self.requests += 1
+        kwargs.setdefault("timeout", self.timeout_for(url))
+        return self.session.get(url, **kwargs)
+
+    @property
+    def pool_hit_rate(self) -> float:
+        connections: int = self.pool_hits + self.pool_misses
+        return self.pool_hits / connections if connections else 0
+
+    async def close(self):
+        """ Closes all pooled connections, a new session is created if the client is used again """
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            logger.info(
+                f"Closed HTTP client after {self.requests} requests, "
+                f"{self.pool_hits} pooled connection hits and {self.pool_misses} misses"
+            )
+        self._session = None
@@ -0,0 +1,232 @@
+import asyncio
+import heapq
+import json
+import os
+from array import array
+from bisect import bisect_left
+from operator import itemgetter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from loguru import logger
+
+# Fields of a Sc2LadderResult which are searched
+SEARCH_FIELDS = ["username", "alias", "clan", "bnet_id"]
+# Queries with at least this many characters are substring searches, shorter ones are prefix searches
+GRAM_LENGTH = 4
+
+
+def normalize_search(query: str) -> str:
+    """ Lower case without surrounding whitespace, clan tags like '[zelos]' are searched without brackets """
+    query = query.strip().lower()
+    if query.startswith("[") and query.endswith("]"):
+        query = query[1:-1].strip()
+    return query
+
+
+def search_grams(value: str) -> Set[str]:
+    """ Prefixes of up to GRAM_LENGTH - 1 characters, marked with '^', and all substrings of GRAM_LENGTH characters """
+    grams: Set[str] = {"^" + value[:length] for length in range(1, min(len(value), GRAM_LENGTH - 1) + 1)}
+    grams.update(value[i : i + GRAM_LENGTH] for i in range(len(value) - GRAM_LENGTH + 1))
+    return grams
+
+
+class LadderIndex:
+    """
+    In-memory search index over sc2ladder player records, the same dicts as returned by the sc2ladder player api.
+    Queries with at least GRAM_LENGTH characters find every player where one of SEARCH_FIELDS contains the query,
+    shorter queries find players where one of them starts with it. Results are ordered by mmr, highest first.
+
+    Each record gets a dense id, posting lists map n-grams and short prefixes to these ids. A substring search only
+    checks the records of the shortest posting list of the query's n-grams.
+    The records given to the constructor get their ids in order of mmr, so a search can stop after 'limit' matches
+    in that part. Records added later are appended to a tail which is always searched completely.
+    Replaced and removed records leave tombstones in the posting lists until the index is compacted.
+    """
+
+    def __init__(self, records: Iterable[dict] = (), compact_ratio: float = 0.5, compact_minimum: int = 1000):
+        # Dense id -> record, None for removed records
+        self.records: List[Optional[dict]] = []
+        # Dense id -> lower case values of the search fields
+        self.keys: List[Optional[Tuple[str, ...]]] = []
+        self.ids_by_profile: Dict[int, int] = {}
+        self.postings: Dict[str, array] = {}
+        # Records with a lower id are ordered by mmr
+        self.sorted_until: int = 0
+        self.removed: int = 0
+        self.compact_ratio: float = compact_ratio
+        self.compact_minimum: int = compact_minimum
+        self._add_sorted(records)
+
+    def __len__(self) -> int:
+        return len(self.ids_by_profile)
+
+    def _add_sorted(self, records: Iterable[dict]):
+        for record in sorted(records, key=itemgetter("mmr"), reverse=True):
+            self.add(record)
+        self.sorted_until = len(self.records)
+
+    def add(self, record: dict):
+        """ Adds the record, or replaces the record with the same profile_id """
+        self.remove(record["profile_id"], compact=False)
+        record_id: int = len(self.records)
+        keys: Tuple[str, ...] = tuple(str(record[field]).lower() for field in SEARCH_FIELDS if record.get(field))
+        self.records.append(record)
+        self.keys.append(keys)
+        self.ids_by_profile[record["profile_id"]] = record_id
+        grams: Set[str] = set()
+        for key in keys:
+            grams |= search_grams(key)
+        postings: Dict[str, array] = self.postings
+        for gram in grams:
+            posting: Optional[array] = postings.get(gram)
+            if posting is None:
+                posting = postings[gram] = array("I")
+            posting.append(record_id)
+
+    def remove(self, profile_id: int, compact: bool = True) -> bool:
+        """ Returns False if there is no record with this profile_id """
+        record_id: Optional[int] = self.ids_by_profile.pop(profile_id, None)
+        if record_id is None:
+            return False
+        self.records[record_id] = None
+        self.keys[record_id] = None
+        self.removed += 1
+        if compact and self.removed > self.compact_minimum and self.removed > len(self.records) * self.compact_ratio:
+            self.compact()
+        return True
+
+    def compact(self):
+        """ Rebuild without tombstones and with all records ordered by mmr, O(n log n) """
+        records: List[dict] = [record for record in self.records if record is not None]
+        self.records, self.keys, self.ids_by_profile, self.postings, self.removed = [], [], {}, {}, 0
+        self._add_sorted(records)
+
+    def search(self, query: str, limit: int = 15) -> List[dict]:
+        """ Up to 'limit' matching records with the highest mmr first """
+        query = normalize_search(query)
+        if not query:
+            return []
+        posting: Optional[array]
+        if len(query) < GRAM_LENGTH:
+            posting = self.postings.get("^" + query)
+            # Every record in the posting list of a prefix matches
+            substring: Optional[str] = None
+        else:
+            posting = None
+            for gram in search_grams(query):
+                if gram.startswith("^"):
+                    continue
+                gram_posting: Optional[array] = self.postings.get(gram)
+                if gram_posting is None:
+                    return []
+                if posting is None or len(gram_posting) < len(posting):
+                    posting = gram_posting
+            substring = query
+        if posting is None:
+            return []
+
+        keys: List[Optional[Tuple[str, ...]]] = self.keys
+
+        def matches(record_id: int) -> bool:
+            record_keys: Optional[Tuple[str, ...]] = keys[record_id]
+            return record_keys is not None and (substring is None or any(substring in key for key in record_keys))
+
+        best: List[int] = []
+        tail_start: int = bisect_left(posting, self.sorted_until)
+        # The sorted part is ordered by mmr, the first 'limit' matches are its best ones
+        for position in range(tail_start):
+            if matches(posting[position]):
+                best.append(posting[position])
+                if len(best) == limit:
+                    break
+        sorted_matches: int = len(best)
+        best.extend(record_id for record_id in posting[tail_start:] if matches(record_id))
+        records: List[Optional[dict]] = self.records
+        if len(best) > sorted_matches:
+            best = heapq.nlargest(limit, best, key=lambda record_id: records[record_id]["mmr"])
+        return [records[record_id] for record_id in best]
+
+
+class LadderSnapshot:
+    """
+    Keeps a LadderIndex up to date with a json lines snapshot file of sc2ladder player records.
+    Lines appended to the file are applied incrementally, a line like {"profile_id": 1, "deleted": true} removes
+    a player. If the file was replaced or truncated, a new index is built in a worker thread and swapped in.
+    """
+
+    def __init__(self, path: Path, refresh_interval: float = 60):
+        self.path: Path = path
+        self.refresh_interval: float = refresh_interval
+        self.index: LadderIndex = LadderIndex()
+        # Bytes of the file which were applied to the index, and the file they belong to
+        self.offset: int = 0
+        self.inode: Optional[int] = None
+        self.loaded: bool = False
+
+    @staticmethod
+    def _parse(data: bytes) -> List[dict]:
+        records: List[dict] = []
+        for line in data.splitlines():
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                logger.warning(f"Skipping invalid ladder snapshot line: {line[:100]!r}")
+        return records
+
+    @staticmethod
+    def _apply(index: LadderIndex, records: List[dict]):
+        for record in records:
+            if record.get("deleted"):
+                index.remove(record["profile_id"])
+            else:
+                index.add(record)
+
+    def _read(self, offset: int) -> Tuple[bytes, int]:
+        """ Complete lines from 'offset' on, and the offset after them """
+        with self.path.open("rb") as f:
+            f.seek(offset)
+            data: bytes = f.read()
+        # A line that is still being written is read with the next refresh
+        end: int = data.rfind(b"\n") + 1
+        return data[:end], offset + end
+
+    def _build(self) -> Tuple[LadderIndex, int]:
+        data, offset = self._read(0)
+        records: Dict[int, dict] = {}
+        for record in self._parse(data):
+            if record.get("deleted"):
+                records.pop(record["profile_id"], None)
+            else:
+                records[record["profile_id"]] = record
+        return LadderIndex(records.values()), offset
+
+    async def refresh(self):
+        """ Applies the changes of the snapshot file since the last refresh """
+        try:
+            stat: os.stat_result = self.path.stat()
+        except FileNotFoundError:
+            return
+        loop = asyncio.get_event_loop()
+        if stat.st_ino != self.inode or stat.st_size < self.offset:
+            self.index, self.offset = await loop.run_in_executor(None, self._build)
+            self.inode = stat.st_ino
+            logger.info(f"Loaded {len(self.index)} players from ladder snapshot {self.path}")
+        elif stat.st_size > self.offset:
+            data, offset = await loop.run_in_executor(None, self._read, self.offset)
+            records: List[dict] = await loop.run_in_executor(None, self._parse, data)
+            self._apply(self.index, records)
+            self.offset = offset
+            logger.debug(f"Applied {len(records)} ladder snapshot changes, {len(self.index)} players")
+        self.loaded = True
+
+    async def run(self):
+        """ Refreshes the index every 'refresh_interval' seconds """
+        while 1:
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception(f"Failed to refresh ladder snapshot {self.path}")
+            await asyncio.sleep(self.refresh_interval)
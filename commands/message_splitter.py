@@ -0,0 +1,65 @@
+from typing import Iterable, List, Tuple
+
+# Discord rejects messages and embed descriptions with more characters than this
+DISCORD_MESSAGE_LIMIT = 2000
+DISCORD_EMBED_DESCRIPTION_LIMIT = 4096
+
+
+def split_line(line: str, limit: int = DISCORD_MESSAGE_LIMIT) -> List[str]:
+    """ Splits a line that is too long at spaces, or anywhere if a single word is too long """
+    parts: List[str] = []
+    while len(line) > limit:
+        split_at: int = line.rfind(" ", 0, limit + 1)
+        if split_at <= 0:
+            split_at = limit
+        parts.append(line[:split_at])
+        line = line[split_at:].lstrip(" ")
+    if line:
+        parts.append(line)
+    return parts
+
+
+def truncate_lines(lines: List[str], limit: int = DISCORD_MESSAGE_LIMIT) -> str:
+    """ Joins as many lines as fit into one message of 'limit' characters, the rest is summarized as '... and N more' """
+    # Room for the summary, in case not all lines fit
+    summary_length: int = len(f"\n... and {len(lines)} more")
+    text: str = ""
+    shown: int = 0
+    for line in lines:
+        candidate: str = f"{text}\n{line}" if text else line
+        if len(candidate) > limit - (summary_length if shown + 1 < len(lines) else 0):
+            break
+        text, shown = candidate, shown + 1
+    if lines and not shown:
+        # Even the first line is too long
+        cut: int = limit - (summary_length if len(lines) > 1 else 0) - len("...")
+        text, shown = f"{lines[0][: max(0, cut)]}...", 1
+    if shown < len(lines):
+        text = f"{text}\n... and {len(lines) - shown} more"
+    return text
+
+
+def split_message(lines: Iterable[str], limit: int = DISCORD_MESSAGE_LIMIT) -> List[str]:
+    """ Packs lines into as few messages as possible, each at most 'limit' characters long """
+    return [message for message, _ in pack_lines(lines, limit)]
+
+
+def pack_lines(lines: Iterable[str], limit: int = DISCORD_MESSAGE_LIMIT) -> List[Tuple[str, List[int]]]:
+    """ Same as split_message(), also returns the indexes of the lines each message contains """
+    messages: List[Tuple[str, List[int]]] = []
+    current: str = ""
+    indexes: List[int] = []
+    for index, line in enumerate(lines):
+        for part in split_line(line, limit):
+            if current and len(current) + 1 + len(part) <= limit:
+                current = f"{current}\n{part}"
+            else:
+                if current:
+                    messages.append((current, indexes))
+                current, indexes = part, []
+            # A line that is too long is split over several messages
+            if not indexes or indexes[-1] != index:
+                indexes.append(index)
+    if current:
+        messages.append((current, indexes))
+    return messages
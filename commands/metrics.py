@@ -0,0 +1,51 @@
+import math
+from typing import Dict
+
+
+class LatencyHistogram:
+    """
+    Histogram of latencies in seconds with logarithmic buckets, so memory does not grow with the amount of values.
+    Each bucket is 'growth' times wider than the previous one, so percentiles are accurate to within that factor.
+    Values up to 'resolution' seconds, including negative ones, go into the first bucket.
+    """
+
+    def __init__(self, resolution: float = 0.001, growth: float = 1.1):
+        self.resolution: float = resolution
+        self.growth: float = growth
+        self._log_growth: float = math.log(growth)
+        # Bucket index -> amount of values, bucket i holds values up to resolution * growth ** i
+        self.buckets: Dict[int, int] = {}
+        self.count: int = 0
+        self.total: float = 0
+        self.max: float = 0
+
+    def record(self, seconds: float):
+        index: int = 0
+        if seconds > self.resolution:
+            index = math.ceil(math.log(seconds / self.resolution) / self._log_growth)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, percent: float) -> float:
+        """ Upper bound of the bucket that contains the value at 'percent', 0 if nothing was recorded """
+        if not self.count:
+            return 0
+        rank: int = max(1, math.ceil(self.count * percent / 100))
+        seen: int = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return min(self.resolution * self.growth ** index, self.max)
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0
+
+    def summary(self) -> str:
+        return (
+            f"{self.count} values, p50 {self.percentile(50):.3f}s, p95 {self.percentile(95):.3f}s, "
+            f"p99 {self.percentile(99):.3f}s, max {self.max:.3f}s"
+        )
@@ -0,0 +1,79 @@
+from pathlib import Path
+import asyncio
+import json
+from typing import Any, Callable, Optional
+
+from atomicwrites import atomic_write
+from loguru import logger
+
+
+class DebouncedPersister:
+    """
+    Write-behind json file.
+    Changes are only marked with mark_dirty(), and the file is written at most once per 'interval' seconds.
+    The data is serialized and written in a worker thread, and the old file is replaced atomically,
+    so neither a large file nor a crash during the write can stall the event loop or truncate the file.
+    """
+
+    def __init__(self, path: Path, get_data: Callable[[], Any], interval: float = 1, indent: Optional[int] = 2):
+        self.path: Path = path
+        # Returns a snapshot of the data which is not modified afterwards, as it is serialized in another thread
+        self.get_data: Callable[[], Any] = get_data
+        self.interval: float = interval
+        self.indent: Optional[int] = indent
+        self.dirty: bool = False
+        # Amount of mark_dirty() calls and amount of writes that actually happened
+        self.requested_writes: int = 0
+        self.writes: int = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    @property
+    def coalesced_writes(self) -> int:
+        """ Changes which did not need their own write because they were written together with others """
+        return max(0, self.requested_writes - self.writes)
+
+    def mark_dirty(self):
+        """ Schedule a write, must be called from within the event loop """
+        self.requested_writes += 1
+        self.dirty = True
+        if self._timer is None:
+            self._timer = asyncio.get_event_loop().call_later(self.interval, self._flush_later)
+
+    def _flush_later(self):
+        self._timer = None
+        asyncio.ensure_future(self.flush())
+
+    def cancel(self):
+        """ Drop a scheduled write, pending changes stay marked as dirty """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    async def flush(self):
+        """ Write now if there are pending changes, e.g. on shutdown """
+        self.cancel()
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        # Only one write at a time, so that an older snapshot can never overwrite a newer one
+        async with self._lock:
+            if not self.dirty:
+                return
+            self.dirty = False
+            data = self.get_data()
+            try:
+                await asyncio.get_event_loop().run_in_executor(None, self.write, data)
+            except Exception:
+                # Try again with the next flush
+                self.dirty = True
+                logger.exception(f"Failed to write {self.path}")
+                return
+            self.writes += 1
+            logger.debug(f"Wrote {self.path}, {self.coalesced_writes} writes were coalesced so far")
+
+    def write(self, data: Any):
+        """ Blocking write, done in a worker thread by flush() """
+        serialized: str = json.dumps(data, indent=self.indent)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with atomic_write(self.path, overwrite=True) as f:
+            f.write(serialized)
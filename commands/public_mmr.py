@@ -1,3 +1,4 @@
+import asyncio
 from dataclasses import dataclass
 
 # https://discordpy.readthedocs.io/en/latest/api.html
@@ -5,9 +6,21 @@ import discord
 from typing import List, Dict, Set, Optional, Union
 import aiohttp
 
+from commands.http_client import HttpClient
+from commands.ladder_index import LadderIndex
+from commands.message_splitter import DISCORD_MESSAGE_LIMIT, split_message
+from commands.single_flight import SingleFlight
+from commands.tiered_cache import TieredCache
+
 # http://zetcode.com/python/prettytable/
 from prettytable import PrettyTable  # pip install PTable
 
+SC2LADDER_URL = "https://www.sc2ladder.com"
+
+
+class Sc2LadderError(Exception):
+    """ Error of the sc2ladder api, the message is sent to the user """
+
 
 @dataclass()
 class Sc2LadderResult:
@@ -56,7 +69,68 @@ class Sc2LadderResult:
         ]
 
 
-async def public_mmr(author: discord.User, query_name: str):
+def normalize_query(query_name: str) -> str:
+    """ Queries which only differ in case or whitespace return the same players """
+    return " ".join(query_name.lower().split())
+
+
+async def fetch_players(query_name: str, http_client: HttpClient) -> List[dict]:
+    # It might fit 15 results in discord
+    url = f"{SC2LADDER_URL}/api/player?query={query_name}&results=15"
+    async with http_client.get(url) as response:
+        if response.status != 200:
+            raise Sc2LadderError(f"Error: Status code `{response.status}` for query `{query_name}`")
+        try:
+            return await response.json()
+        except aiohttp.ContentTypeError:
+            # Error with aiohttp with decoding
+            raise Sc2LadderError(f"Error while trying to decode JSON with input: `{query_name}`")
+
+
+async def lookup_players(
+    query_key: str,
+    http_client: HttpClient,
+    cache: Optional[TieredCache] = None,
+    single_flight: Optional[SingleFlight] = None,
+    index: Optional[LadderIndex] = None,
+) -> List[dict]:
+    """ Players matching the normalized query, from the local index or cache if possible, raises Sc2LadderError """
+    if index is not None:
+        results: List[dict] = index.search(query_key)
+        # Queries the index can not answer, e.g. stream names, are still sent to sc2ladder
+        if results:
+            return results
+
+    async def fetch() -> List[dict]:
+        if single_flight is None:
+            return await fetch_players(query_key, http_client)
+        # Everyone asking for the same player at the same time waits for one upstream request
+        return await single_flight.do(query_key, lambda: fetch_players(query_key, http_client))
+
+    if cache is None:
+        return await fetch()
+    return await cache.get(query_key, fetch)
+
+
+def create_table(results: List[Sc2LadderResult]) -> PrettyTable:
+    # Server, Race, League, MMR, Win/Loss, Name, Last Played, Last Streamed
+    fields = ["S-R-L", "MMR", "W/L", "Username", "Alias"]
+    pretty_table = PrettyTable(field_names=fields)
+    pretty_table.border = False
+    for result_object in results:
+        formated_result = result_object.format_result()
+        pretty_table.add_row(formated_result)
+    return pretty_table
+
+
+async def public_mmr(
+    author: discord.User,
+    query_name: str,
+    http_client: HttpClient,
+    cache: Optional[TieredCache] = None,
+    single_flight: Optional[SingleFlight] = None,
+    index: Optional[LadderIndex] = None,
+):
     """The public command '!mmr name', will look up an account name, clan name or stream name and list several results as a markdown table using PrettyTable
     Usage:
     !mmr twitch.tv/rotterdam08
@@ -64,29 +138,85 @@ async def public_mmr(author: discord.User, query_name: str):
     !mmr [zelos]"""
     # Correct usage
     assert query_name
-    async with aiohttp.ClientSession() as session:
-        # It might fit 15 results in discord
-        url = f"https://www.sc2ladder.com/api/player?query={query_name}&results=15"
-        async with session.get(url) as response:
-            if response.status != 200:
-                return f"Error: Status code `{response.status}` for query `{query_name}`"
+    try:
+        results = await lookup_players(normalize_query(query_name), http_client, cache, single_flight, index)
+    except Sc2LadderError as e:
+        return str(e)
+
+    if not results:
+        # No player found
+        return f"No player found with name `{query_name}`"
+    else:
+        pretty_table = create_table([Sc2LadderResult(**api_result) for api_result in results])
+        query_link = f"<https://www.sc2ladder.com/search?query={query_name}>"
+        return f"{query_link}\n```md\n{len(results)} results for {query_name}:\n{pretty_table}```"
+
+
+async def public_mmr_batch(
+    author: discord.User,
+    query_names: List[str],
+    http_client: HttpClient,
+    cache: Optional[TieredCache] = None,
+    single_flight: Optional[SingleFlight] = None,
+    index: Optional[LadderIndex] = None,
+    concurrency: int = 5,
+    max_queries: int = 10,
+    limit: int = DISCORD_MESSAGE_LIMIT,
+) -> List[str]:
+    """The public command '!mmr name1 name2 name3', looks up all names at the same time and lists the players of all of them in one table, split into messages of at most 'limit' characters
+    Usage:
+    !mmr harstem serral maru"""
+    # Queries which only differ in case are looked up once
+    query_keys: Dict[str, str] = {}
+    for query_name in query_names:
+        query_keys.setdefault(normalize_query(query_name), query_name)
+    query_keys.pop("", None)
+    assert query_keys
+    if len(query_keys) > max_queries:
+        return [f"Too many names, at most {max_queries} can be looked up at once"]
+
+    # Bounded, so a long roster does not open too many connections to sc2ladder at once
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def lookup(query_key: str) -> Union[List[dict], str]:
+        async with semaphore:
             try:
-                results = await response.json()
-            except aiohttp.ContentTypeError:
-                # Error with aiohttp with decoding
-                return f"Error while trying to decode JSON with input: `{query_name}`"
-
-            if not results:
-                # No player found
-                return f"No player found with name `{query_name}`"
-            else:
-                # Server, Race, League, MMR, Win/Loss, Name, Last Played, Last Streamed
-                fields = ["S-R-L", "MMR", "W/L", "Username", "Alias"]
-                pretty_table = PrettyTable(field_names=fields)
-                pretty_table.border = False
-                for api_result in results:
-                    result_object = Sc2LadderResult(**api_result)
-                    formated_result = result_object.format_result()
-                    pretty_table.add_row(formated_result)
-                query_link = f"<https://www.sc2ladder.com/search?query={query_name}>"
-                return f"{query_link}\n```md\n{len(results)} results for {query_name}:\n{pretty_table}```"
+                return await lookup_players(query_key, http_client, cache, single_flight, index)
+            except Sc2LadderError as e:
+                return str(e)
+
+    lookups: List[Union[List[dict], str]] = await asyncio.gather(*(lookup(query_key) for query_key in query_keys))
+
+    notes: List[str] = []
+    players: List[Sc2LadderResult] = []
+    profile_ids: Set[int] = set()
+    for query_name, results in zip(query_keys.values(), lookups):
+        if isinstance(results, str):
+            notes.append(results)
+            continue
+        if not results:
+            notes.append(f"No player found with name `{query_name}`")
+        for api_result in results:
+            # A player can match several queries, e.g. by name and by clan tag
+            if api_result["profile_id"] not in profile_ids:
+                profile_ids.add(api_result["profile_id"])
+                players.append(Sc2LadderResult(**api_result))
+    if not players:
+        return split_message(notes, limit)
+
+    table_lines: List[str] = create_table(players).get_string().split("\n")
+    title: str = f"{len(players)} results for {', '.join(query_keys.values())}:"
+    header: str = table_lines[0]
+    # Every message is a code block which starts with the table header
+    block_limit: int = limit - len("```md\n") - len(header) - len("\n```")
+    blocks: List[str] = split_message([title, *table_lines[1:]], block_limit)
+    messages: List[str] = []
+    for block_index, block in enumerate(blocks):
+        if block_index == 0:
+            title_line, _, block = block.partition("\n")
+            messages.append(f"```md\n{title_line}\n{header}\n{block}```")
+        else:
+            messages.append(f"```md\n{header}\n{block}```")
+    if notes:
+        return split_message(notes, limit) + messages
+    return messages
@@ -1,10 +1,13 @@
 # https://discordpy.readthedocs.io/en/latest/api.html
 from pathlib import Path
-import json
-import re
 import asyncio
+import itertools
+import sys
+import time
+from dataclasses import dataclass
 from typing import List, Dict, Set, Optional, Union, Tuple
-from heapq import heappush, heappop, heapify
+from bisect import insort
+from operator import attrgetter
 
 
 import discord
@@ -12,9 +15,46 @@ import arrow
 from loguru import logger
 
 from commands.base_class import BaseClass
+from commands.reminder_journal import reminder_key
+from commands.reminder_store import (
+    ReminderStore,
+    JsonReminderStore,
+    JournalReminderStore,
+    SqliteReminderStore,
+    PartitionedReminderStore,
+)
+from commands.message_splitter import (
+    DISCORD_EMBED_DESCRIPTION_LIMIT,
+    DISCORD_MESSAGE_LIMIT,
+    pack_lines,
+    truncate_lines,
+)
+from commands.metrics import LatencyHistogram
+from commands.persister import DebouncedPersister
+from commands.rate_limiter import RateLimiter
+from commands.reminder_outbox import ReminderOutbox, OutboxEntry
+from commands.reminder_queue import ReminderQueue, to_epoch_ms, epoch_ms_now
+from commands.reminder_time_parser import parse_date_and_time, parse_time_shift
+from commands.timing_wheel import TimingWheelQueue
+from commands.ttl_cache import TTLCache
 
 
 class Reminder:
+    # No per-instance __dict__, which matters with a million reminders in memory
+    __slots__ = (
+        "reminder_utc_timestamp",
+        "guild_id",
+        "channel_id",
+        "user_id",
+        "user_name",
+        "message",
+        "message_id",
+        "sequence",
+        "cancelled",
+    )
+    # Insertion order of reminders, used as tie-breaker between reminders that are due at the same time
+    _sequence_counter = itertools.count()
+
     def __init__(
         self,
         reminder_utc_timestamp: float = 0,
@@ -29,18 +69,32 @@ class Reminder:
         self.guild_id: int = guild_id
         self.channel_id: int = channel_id
         self.user_id: int = user_id
-        self.user_name: str = user_name
+        # The same user usually has several reminders, so the name is only stored once
+        self.user_name: str = sys.intern(user_name)
         self.message: str = message
         self.message_id: int = message_id
+        self.sequence: int = next(Reminder._sequence_counter)
+        # Set when the reminder was deleted, it then stays in the heap as tombstone until it gets dropped
+        self.cancelled: bool = False
 
     def __lt__(self, other: "Reminder"):
-        return self.reminder_utc_timestamp < other.reminder_utc_timestamp
+        if self.reminder_utc_timestamp != other.reminder_utc_timestamp:
+            return self.reminder_utc_timestamp < other.reminder_utc_timestamp
+        return self.sequence < other.sequence
 
     @staticmethod
     def from_dict(dict) -> "Reminder":
-        r: Reminder = Reminder()
-        r.__dict__.update(dict)
-        return r
+        # Positional arguments, as this is called for every reminder at startup
+        get = dict.get
+        return Reminder(
+            get("reminder_utc_timestamp", 0),
+            get("user_id", 0),
+            get("user_name", ""),
+            get("guild_id", 0),
+            get("channel_id", 0),
+            get("message", ""),
+            get("message_id", 0),
+        )
 
     def to_dict(self) -> Dict[str, Union[int, str]]:
         return {
@@ -57,181 +111,759 @@ class Reminder:
         return f"Reminder({self.reminder_utc_timestamp} {self.guild_id} {self.channel_id} {self.user_id} {self.user_name} {self.message})"
 
 
+# Same order as Reminder.__lt__, but sorting with a key is faster
+reminder_sort_key = attrgetter("reminder_utc_timestamp", "sequence")
+
+
+@dataclass()
+class TickStats:
+    """ What a single call of Remind.tick() did """
+
+    duration_ms: float
+    fired: int
+    queue_size: int
+
+
 class Remind(BaseClass):
-    def __init__(self, client: discord.Client):
-        super().__init__()
+    def __init__(
+        self,
+        client: discord.Client,
+        settings: Optional[dict] = None,
+        settings_persister: Optional[DebouncedPersister] = None,
+        data_folder: Optional[Path] = None,
+    ):
+        super().__init__(settings, settings_persister)
         self.client: discord.Client = client
-        self.reminders: List[Tuple[int, Reminder]] = []
-        self.reminder_file_path: Path = Path(__file__).parent.parent / "data" / "reminders.json"
+        # Which queue holds the reminders in memory:
+        # "heap" is a binary heap, O(log n) per push and pop
+        # "wheel" is a hierarchical timing wheel, O(1) per push and cancel
+        self.reminder_scheduler: str = "heap"
+        self.reminders: Union[ReminderQueue, TimingWheelQueue] = ReminderQueue()
+        # Reminders of each user, sorted by time ascending
+        self.reminders_by_user: Dict[int, List[Reminder]] = {}
+        # All files of the reminders are in this folder
+        self.data_folder: Path = data_folder or Path(__file__).parent.parent / "data"
+        self.reminder_file_path: Path = self.data_folder / "reminders.json"
+        self.reminder_journal_path: Path = self.data_folder / "reminders.journal"
+        self.reminder_database_path: Path = self.data_folder / "reminders.db"
+        self.reminder_partition_folder: Path = self.data_folder / "reminders"
+        # Due reminders which were not delivered yet, and the ones that failed too often
+        self.reminder_outbox_path: Path = self.data_folder / "reminders.outbox"
+        self.reminder_dead_letter_path: Path = self.data_folder / "reminders_dead_letter.jsonl"
+        # How reminders are stored on disk:
+        # "json" rewrites reminders.json on every change
+        # "journal" appends single add/delete/fire records to reminders.journal and folds them into reminders.json
+        # "sqlite" keeps them in reminders.db, only the near-term reminders are then loaded into memory
+        # "partitioned" keeps one file per due-time bucket in the reminders folder, also only loading near-term ones
+        self.reminder_storage: str = "journal"
+        # Length of a due-time bucket of the partitioned storage, in seconds
+        self.partition_seconds: float = 6 * 3600
+        # With json storage, changes within this many seconds are written to reminders.json together
+        self.save_interval: float = 1
+        # Amount of journal records after which the journal is folded into reminders.json
+        self.journal_compact_threshold: int = 1000
+        self.store: Optional[ReminderStore] = None
+        # When the bot runs as several processes, each one only loads and delivers the reminders of its own shards
+        # The processes have to share a store that supports it (sqlite), None means all shards
+        self.shard_ids: Optional[List[int]] = None
+        self.shard_count: int = 1
+        # With sqlite or partitioned storage, reminders which are due within this many seconds are kept in memory
+        self.memory_window: float = 6 * 3600
+        # Reminders due at or after this time are only in the store, None if all reminders are in memory
+        self.loaded_until: Optional[float] = None
         # Limit of reminders per person
         self.reminder_limit = 10
+        # Amount of due reminders that are popped from the heap at once
+        self.tick_batch_size: int = 100
+        # Amount of reminders that are delivered at the same time
+        self.delivery_concurrency: int = 10
+        # Reminders in the same channel which are due within this many seconds of each other are sent as one message
+        self.coalesce_window: float = 1
+        # Failed deliveries are retried after 'delivery_retry_delay' seconds, doubled with every attempt
+        # After 'delivery_max_attempts' the reminder is moved to the dead letter file
+        self.delivery_max_attempts: int = 5
+        self.delivery_retry_delay: float = 5
+        self.outbox: Optional[ReminderOutbox] = None
+        # Users and channels that were not in the gateway cache and had to be fetched via REST
+        self.user_cache: TTLCache = TTLCache(max_size=10_000, ttl=3600)
+        self.channel_cache: TTLCache = TTLCache(max_size=10_000, ttl=3600)
+        # Amount of REST requests made to deliver reminders, and amount of delivered reminders
+        self.rest_calls: int = 0
+        self.delivered_reminders: int = 0
+        # Longest time the scheduler sleeps without calling tick(), in seconds
+        self.scheduler_max_sleep: float = 60
+        # Time the scheduler waits after a failed tick(), due reminders would otherwise make it retry in a busy loop
+        self.tick_retry_interval: float = 5
+        # Amount of ticks and what the last one did
+        self.tick_count: int = 0
+        self.last_tick: Optional[TickStats] = None
+        # Time between when a reminder was due and when it was sent, by delivery path:
+        # "channel" for reminders that mention the user in the channel, "dm" for direct messages with a jump url
+        self.delivery_lateness: Dict[str, LatencyHistogram] = {"channel": LatencyHistogram(), "dm": LatencyHistogram()}
+        # The lateness is logged every this many seconds, if reminders were delivered in the meantime
+        self.lateness_summary_interval: float = 600
+        self._lateness_summary_at: float = time.monotonic()
+        self._lateness_summary_count: int = 0
+        # Set when the earliest reminder changed, so the scheduler can re-arm its timer
+        self._scheduler_wakeup: Optional[asyncio.Event] = None
+        # Reminders which were overdue by more than 'backlog_grace' seconds at startup, e.g. after downtime
+        # They are drained oldest first at a limited rate, so reminders that become due in the meantime stay on time
+        self.backlog: ReminderQueue = ReminderQueue()
+        self.backlog_grace: float = 60
+        # Reminders due before this time belong to the backlog
+        self.backlog_until: float = 0
+        # Messages per second while draining the backlog, below discord's global limit of 50 to leave room for others
+        self.backlog_rate: float = 20
+        # Messages per 'backlog_channel_period' seconds into the same channel while draining the backlog
+        self.backlog_channel_rate: float = 5
+        self.backlog_channel_period: float = 5
+        # Amount of reminders that went into the backlog, amount delivered from it and how long that took
+        self.backlog_size: int = 0
+        self.backlog_drained: int = 0
+        self.backlog_drain_seconds: float = 0
+        self._backlog_drain: Optional[asyncio.Future] = None
+
+    def _create_store(self) -> ReminderStore:
+        def get_reminders() -> List[dict]:
+            return [reminder.to_dict() for reminder in itertools.chain(self.backlog, self.reminders)]
+
+        if self.reminder_storage == "sqlite":
+            store = SqliteReminderStore(self.reminder_database_path, self.shard_ids, self.shard_count)
+            store.migrate_from_json(self.reminder_file_path, self.reminder_journal_path)
+            return store
+        if self.reminder_storage == "partitioned":
+            store = PartitionedReminderStore(self.reminder_partition_folder, bucket_seconds=self.partition_seconds)
+            store.migrate_from_json(self.reminder_file_path, self.reminder_journal_path)
+            return store
+        if self.reminder_storage == "journal":
+            return JournalReminderStore(
+                self.reminder_file_path,
+                self.reminder_journal_path,
+                get_reminders,
+                compact_threshold=self.journal_compact_threshold,
+            )
+        return JsonReminderStore(self.reminder_file_path, get_reminders, save_interval=self.save_interval)
 
     async def load_reminders(self):
-        if self.reminder_file_path.is_file():
-            with open(self.reminder_file_path) as f:
-                reminders = json.load(f)
-                # Append them in order in the minheap
-                self.reminders: List[Tuple[int, Reminder]] = []
-                for reminder in reminders:
-                    r: Reminder = Reminder.from_dict(reminder)
-                    heappush(self.reminders, (r.reminder_utc_timestamp, r))
-        else:
-            self.reminders = []
-            await self.save_reminders()
+        if self.store is not None:
+            await self.shutdown()
+            self.store = None
+        store: ReminderStore = self._create_store()
+        if self.shard_ids is not None and not store.shared:
+            store.close()
+            raise ValueError(f"Reminder storage '{self.reminder_storage}' can not be shared by several shards")
+        self.store = store
+        self.outbox = ReminderOutbox(
+            self.reminder_outbox_path,
+            self.reminder_dead_letter_path,
+            Reminder.from_dict,
+            max_attempts=self.delivery_max_attempts,
+            retry_delay=self.delivery_retry_delay,
+        )
+        self.outbox.load()
+        self.loaded_until = time.time() + self.memory_window if self.store.windowed else None
+        t0: float = time.perf_counter()
+
+        # Records are streamed from the store, so each dict can be freed right after its Reminder was created
+        reminders = self.store.load(until=self.loaded_until)
+        loaded_reminders: List[Reminder] = [Reminder.from_dict(reminder) for reminder in reminders]
+        if self.outbox:
+            loaded_reminders = self._remove_reminders_in_outbox(loaded_reminders)
+        self.reminders = self._create_queue(loaded_reminders)
+        # Group by user first and sort each user's list once, instead of inserting one by one
+        self.reminders_by_user = {}
+        for r in loaded_reminders:
+            self.reminders_by_user.setdefault(r.user_id, []).append(r)
+        for user_reminders in self.reminders_by_user.values():
+            user_reminders.sort(key=reminder_sort_key)
+        self._split_backlog()
+        self._rearm_scheduler()
+        logger.info(f"Loaded {len(loaded_reminders)} reminders in {time.perf_counter() - t0:.2f}s")
+
+    async def set_shards(self, shard_ids: Optional[List[int]], shard_count: int):
+        """
+        Loads the reminders of the shards this process is connected to.
+        If the shards changed since the last call, e.g. because the shard count changed, the reminders are loaded
+        again from the shared store, so every process ends up with the reminders of its new shards.
+        """
+        shard_ids = sorted(shard_ids) if shard_ids is not None else None
+        if self.store is not None and shard_ids == self.shard_ids and shard_count == self.shard_count:
+            return
+        if self.store is not None:
+            logger.info(
+                f"Rebalancing reminders from shards {self.shard_ids} of {self.shard_count} "
+                f"to shards {shard_ids} of {shard_count}"
+            )
+        self.shard_ids = shard_ids
+        self.shard_count = shard_count
+        await self.load_reminders()
+
+    def _create_queue(self, reminders: List[Reminder]) -> Union[ReminderQueue, TimingWheelQueue]:
+        if self.reminder_scheduler == "wheel":
+            return TimingWheelQueue(reminders)
+        # Build the minheap in one go with heapify, O(n) instead of O(n log n) for pushing one by one
+        return ReminderQueue(reminders)
+
+    def _remove_reminders_in_outbox(self, reminders: List[Reminder]) -> List[Reminder]:
+        """
+        A crash between writing reminders to the outbox and removing them from the store leaves them in both places.
+        They are delivered from the outbox, so remove them from the store.
+        """
+        outbox_keys: Dict[tuple, int] = {}
+        for entry in self.outbox.entries.values():
+            key = reminder_key(entry.reminder.to_dict())
+            outbox_keys[key] = outbox_keys.get(key, 0) + 1
+        remaining_reminders: List[Reminder] = []
+        duplicate_reminders: List[Reminder] = []
+        for reminder in reminders:
+            key = reminder_key(reminder.to_dict())
+            if outbox_keys.get(key):
+                outbox_keys[key] -= 1
+                duplicate_reminders.append(reminder)
+            else:
+                remaining_reminders.append(reminder)
+        if duplicate_reminders:
+            self.store.record_many("fire", [reminder.to_dict() for reminder in duplicate_reminders])
+        return remaining_reminders
+
+    def _split_backlog(self):
+        """ Moves the reminders which are overdue by more than 'backlog_grace' seconds from the heap into the backlog """
+        self.backlog_until = time.time() - self.backlog_grace
+        # Compared as float, 'backlog_grace' may be infinite
+        backlog_until_ms: float = self.backlog_until * 1000
+        overdue_reminders: List[Reminder] = []
+        while 1:
+            due_ms: Optional[int] = self.reminders.peek_due_ms()
+            if due_ms is None or due_ms >= backlog_until_ms:
+                break
+            overdue_reminders.append(self.reminders.pop())
+        self.backlog = ReminderQueue(overdue_reminders)
+        self.backlog_size = len(overdue_reminders)
+        self.backlog_drained = 0
+        self.backlog_drain_seconds = 0
+        if overdue_reminders:
+            logger.warning(
+                f"Found {len(overdue_reminders)} overdue reminders, the oldest is "
+                f"{time.time() - overdue_reminders[0].reminder_utc_timestamp:.0f} seconds overdue"
+            )
+
+    def _get_queue(self, reminder: Reminder) -> Union[ReminderQueue, TimingWheelQueue]:
+        """ The backlog or the heap, depending on when the reminder is due """
+        return self.backlog if reminder.reminder_utc_timestamp < self.backlog_until else self.reminders
+
+    @property
+    def backlog_drain_rate(self) -> float:
+        """ Reminders per second delivered from the backlog """
+        return self.backlog_drained / self.backlog_drain_seconds if self.backlog_drain_seconds else 0
+
+    def _load_next_window(self):
+        """ Moves reminders from the store into memory once they are due within 'memory_window' """
+        if self.loaded_until is None:
+            return
+        time_now: float = time.time()
+        # Refill once half of the window has passed
+        if self.loaded_until - time_now > self.memory_window / 2:
+            return
+        new_loaded_until: float = time_now + self.memory_window
+        for reminder_dict in self.store.load(since=self.loaded_until, until=new_loaded_until):
+            reminder: Reminder = Reminder.from_dict(reminder_dict)
+            self.reminders.push(reminder)
+            self._index_reminder(reminder)
+        self.loaded_until = new_loaded_until
+        self._rearm_scheduler()
 
     async def save_reminders(self):
-        with open(self.reminder_file_path, "w") as f:
-            reminders_serialized = [reminder[1].to_dict() for reminder in self.reminders]
-            json.dump(reminders_serialized, f, indent=2)
+        await self.store.flush()
+
+    async def shutdown(self):
+        """ Write all pending changes to disk """
+        self._log_lateness_summary(force=True)
+        # The reminders were never loaded, e.g. the bot was stopped during login
+        if self.store is None:
+            return
+        await self.store.flush()
+        self.store.close()
+        self.outbox.close()
+
+    async def _persist_many(self, operation: str, reminders: List[Reminder]):
+        """ Store the same change of several reminders on disk in one write """
+        self.store.record_many(operation, [reminder.to_dict() for reminder in reminders])
+
+    def _rearm_scheduler(self):
+        """ Wake up the scheduler so that it sleeps until the new earliest reminder instead """
+        if self._scheduler_wakeup is not None:
+            self._scheduler_wakeup.set()
+
+    async def run_scheduler(self):
+        """
+        Sleeps until the earliest reminder is due and then calls tick().
+        Adding an earlier reminder or deleting the earliest one re-arms the timer.
+        tick() is still called at least every 'scheduler_max_sleep' seconds as fallback.
+        """
+        self._scheduler_wakeup = asyncio.Event()
+        try:
+            while 1:
+                # Clear before tick() so that reminders added during tick() are not missed
+                self._scheduler_wakeup.clear()
+                # The backlog is drained next to the scheduler, so it does not delay reminders that are due now
+                if self.backlog and (self._backlog_drain is None or self._backlog_drain.done()):
+                    self._backlog_drain = asyncio.ensure_future(self.drain_backlog())
+                sleep_time: float = self.scheduler_max_sleep
+                try:
+                    await self.tick()
+                except Exception:
+                    # Keep the scheduler alive, the next tick tries again
+                    logger.exception("Reminder tick failed")
+                    sleep_time = min(sleep_time, self.tick_retry_interval)
+                else:
+                    due_ms: Optional[int] = self.reminders.peek_due_ms()
+                    if due_ms is not None:
+                        sleep_time = min(sleep_time, max(0, (due_ms - epoch_ms_now()) / 1000))
+                    next_retry_at: Optional[float] = self.outbox.next_attempt_at()
+                    if next_retry_at is not None:
+                        sleep_time = min(sleep_time, max(0, next_retry_at - time.time()))
+                try:
+                    await asyncio.wait_for(self._scheduler_wakeup.wait(), timeout=sleep_time)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            if self._backlog_drain is not None:
+                self._backlog_drain.cancel()
+
+    async def drain_backlog(self):
+        """
+        Delivers the overdue reminders of the backlog oldest first.
+        Messages are paced by a global limit and a limit per channel (or per user for direct messages),
+        so a large backlog after downtime does not run into discord's rate limits.
+        """
+        global_rate_limiter: RateLimiter = RateLimiter(self.backlog_rate)
+        channel_rate_limiters: Dict[int, RateLimiter] = {}
+        t0: float = time.perf_counter() - self.backlog_drain_seconds
+        logger.info(f"Draining {len(self.backlog)} overdue reminders with up to {self.backlog_rate} messages per second")
+        while self.backlog:
+            reminders: List[Reminder] = []
+            while self.backlog and len(reminders) < self.tick_batch_size:
+                reminder: Reminder = self.backlog.pop()
+                self._unindex_reminder(reminder)
+                reminders.append(reminder)
+            deliveries: List[List[Reminder]] = self._group_deliveries(reminders)
+            # Deliveries which were written to the outbox, they are retried from there if sending them fails
+            moved: int = 0
+            try:
+                for delivery in deliveries:
+                    first_reminder: Reminder = delivery[0]
+                    rate_limit_key: int = (
+                        first_reminder.user_id if first_reminder.message_id else first_reminder.channel_id
+                    )
+                    if rate_limit_key not in channel_rate_limiters:
+                        channel_rate_limiters[rate_limit_key] = RateLimiter(
+                            self.backlog_channel_rate, self.backlog_channel_period
+                        )
+                    await channel_rate_limiters[rate_limit_key].acquire()
+                    await global_rate_limiter.acquire()
+                    entries: List[OutboxEntry] = self._move_to_outbox(delivery)
+                    moved += 1
+                    await self._deliver_outbox_entries(entries)
+                    self.backlog_drained += len(delivery)
+                    self.backlog_drain_seconds = time.perf_counter() - t0
+            except Exception:
+                # Keep draining, the reminders which are not in the outbox yet are drained again later
+                logger.exception("Draining a batch of the reminder backlog failed")
+                self._requeue_reminders(
+                    self.backlog, [reminder for delivery in deliveries[moved:] for reminder in delivery]
+                )
+                await asyncio.sleep(self.tick_retry_interval)
+                continue
+            logger.info(
+                f"Drained {self.backlog_drained} of {self.backlog_size} overdue reminders "
+                f"({self.backlog_drain_rate:.1f} reminders/s)"
+            )
 
     async def tick(self):
-        """ Function gets called every second. """
-        need_to_save_reminders = False
-        while self.reminders:
-            reminded: bool = False
-            # First element, but is stored as tuple
-            reminder: Reminder = self.reminders[0][1]
-            reminder_time: arrow.Arrow = arrow.Arrow.utcfromtimestamp(reminder.reminder_utc_timestamp)
-            time_now: arrow.Arrow = arrow.utcnow()
-            if reminder_time < time_now:
-                reminder = heappop(self.reminders)[1]
-                need_to_save_reminders = True
-                reminded = True
-                person: discord.User = await self._get_user_by_id(reminder.user_id)
-                logger.info(f"Attempting to remind {person.name} of: {reminder.message}")
-                channel: discord.TextChannel = await self._get_channel_by_id(reminder.channel_id)
-                # Reminder was done using bot command
-                if channel and person and reminder.message_id:
-                    message: discord.Message = await channel.fetch_message(reminder.message_id)
-                    await person.send(f"{message.jump_url}\nYou wanted to be reminded of: {reminder.message}")
-                # Reminder was done using slash command
-                elif person and channel:
-                    # Send the reminder text
-                    await channel.send(f"{person.mention} You wanted to be reminded of: {reminder.message}")
-            if not reminded:
+        """ Function gets called by the scheduler when the earliest reminder is due. """
+        t0: float = time.perf_counter()
+        self._load_next_window()
+        rest_calls_before: int = self.rest_calls
+        delivered_before: int = self.delivered_reminders
+        fired: int = 0
+        while 1:
+            due_reminders: List[Reminder] = self._pop_due_reminders(self.tick_batch_size)
+            if not due_reminders:
+                break
+            try:
+                entries: List[OutboxEntry] = self._move_to_outbox(due_reminders)
+            except Exception:
+                self._requeue_reminders(self.reminders, due_reminders)
+                raise
+            fired += len(due_reminders)
+            await self._deliver_outbox_entries(entries)
+        # Retry earlier deliveries that failed
+        while 1:
+            entries: List[OutboxEntry] = self.outbox.take_due(self.tick_batch_size)
+            if not entries:
                 break
+            await self._deliver_outbox_entries(entries)
 
-        # Save reminder to file because we did remind a person now
-        if need_to_save_reminders:
-            await self.save_reminders()
+        delivered: int = self.delivered_reminders - delivered_before
+        if delivered:
+            rest_calls: int = self.rest_calls - rest_calls_before
+            logger.info(
+                f"Delivered {delivered} reminders with {rest_calls} REST calls ({rest_calls / delivered:.2f} per reminder)"
+            )
+        self._log_lateness_summary()
+        self.tick_count += 1
+        self.last_tick = TickStats((time.perf_counter() - t0) * 1000, fired, len(self.reminders))
+        logger.debug(
+            f"Tick {self.tick_count} took {self.last_tick.duration_ms:.3f}ms, fired {fired} reminders, "
+            f"{self.last_tick.queue_size} reminders in the queue"
+        )
 
-    async def _add_reminder(self, reminder: Reminder):
-        heappush(self.reminders, (reminder.reminder_utc_timestamp, reminder))
-        await self.save_reminders()
+    def _move_to_outbox(self, reminders: List[Reminder]) -> List[OutboxEntry]:
+        """ Due reminders are written to the outbox first, so they are not lost if the bot crashes before sending """
+        entries: List[OutboxEntry] = self.outbox.add(reminders)
+        try:
+            still_stored: List[bool] = self.store.fire_many([reminder.to_dict() for reminder in reminders])
+        except Exception:
+            # The reminders are still in the store, so they must not be delivered from the outbox as well
+            self.outbox.ack(entries)
+            raise
+        # Another process deleted these reminders in the shared store, or already delivered them during a rebalance
+        removed_entries: List[OutboxEntry] = [entry for entry, stored in zip(entries, still_stored) if not stored]
+        if removed_entries:
+            logger.info(f"Skipping {len(removed_entries)} reminders which were removed by another process")
+            self.outbox.ack(removed_entries)
+        return [entry for entry, stored in zip(entries, still_stored) if stored]
 
-    async def _get_user_by_id(self, user_id: int) -> Optional[discord.User]:
-        return await self.client.fetch_user(user_id)
+    def _requeue_reminders(self, queue: Union[ReminderQueue, TimingWheelQueue], reminders: List[Reminder]):
+        """ Puts popped reminders back into the heap or the backlog, if they could not be moved to the outbox """
+        for reminder in reminders:
+            queue.push(reminder)
+        self._index_reminders(reminders)
 
-    async def _get_channel_by_id(self, channel_id: int) -> Optional[discord.TextChannel]:
-        return self.client.get_channel(channel_id)
+    async def _deliver_outbox_entries(self, entries: List[OutboxEntry]):
+        """ Entries are only removed from the outbox once their reminder was sent """
+        failures: Dict[Reminder, str] = await self._deliver_reminders([entry.reminder for entry in entries])
+        self.outbox.ack([entry for entry in entries if entry.reminder not in failures])
+        for entry in entries:
+            if entry.reminder in failures and self.outbox.fail(entry, failures[entry.reminder]):
+                logger.error(
+                    f"Giving up on reminder {entry.reminder} after {entry.attempts} attempts, "
+                    f"moved it to {self.reminder_dead_letter_path}"
+                )
 
-    async def _get_all_reminders_by_user_id(self, user_id: int) -> List[Reminder]:
-        user_reminders: List[Reminder] = []
-        reminders_copy = self.reminders.copy()
-        while reminders_copy:
-            r: Reminder = heappop(reminders_copy)[1]
-            if user_id == r.user_id:
-                user_reminders.append(r)
-        return user_reminders
+    def _pop_due_reminders(self, limit: int) -> List[Reminder]:
+        """
+        Removes up to 'limit' reminders from the heap which are due.
+        Reminders due within 'coalesce_window' are taken as well, so they can be sent together with the due ones.
+        """
+        due_reminders: List[Reminder] = []
+        # Only integers are compared, no Arrow or datetime objects are created
+        due_before_ms: int = epoch_ms_now() + to_epoch_ms(self.coalesce_window)
+        while len(due_reminders) < limit:
+            # Cancelled reminders are skipped by the queue
+            due_ms: Optional[int] = self.reminders.peek_due_ms()
+            if due_ms is None or due_ms >= due_before_ms:
+                break
+            reminder: Reminder = self.reminders.pop()
+            self._unindex_reminder(reminder)
+            due_reminders.append(reminder)
+        return due_reminders
 
-    async def _user_reached_max_reminder_threshold(self, user_id: int) -> bool:
-        user_reminders = await self._get_all_reminders_by_user_id(user_id)
-        return len(user_reminders) >= self.reminder_limit
+    async def _deliver_reminders(self, reminders: List[Reminder]) -> Dict[Reminder, str]:
+        """
+        Delivers the reminders with up to 'delivery_concurrency' workers.
+        Reminders made with a bot command are sent to each user individually, as their jump url points to their own
+        message. All other reminders of the same channel are sent together, see _deliver_channel_reminders().
+        A reminder that fails is logged and does not stop the other reminders.
+        Returns the failed reminders with their error.
+        """
+        remaining_deliveries = iter(self._group_deliveries(reminders))
+        failures: Dict[Reminder, str] = {}
 
-    async def _parse_date_and_time_from_message(self, message: str) -> Optional[Tuple[arrow.Arrow, str]]:
-        time_now: arrow.Arrow = arrow.utcnow()
+        async def worker():
+            # All workers take the next delivery from the same iterator
+            for delivery in remaining_deliveries:
+                failures.update(await self._deliver(delivery))
 
-        # Old pattern which was working:
-        # date_pattern = "(?:([0-9]{4})?-?([0-9]{1,2})-([0-9]{1,2}))?"
-        # time_pattern = r"(?:(\d{1,2}):(\d{1,2}):?(\d{1,2})?)?"
-        date_pattern = r"(?:(?:(\d{4})-)?(\d{1,2})-(\d{1,2}))?"
-        time_pattern = r"(?:(\d{1,2}):(\d{1,2})(?::(\d{1,2}))?)?"
-        text_pattern = "((?:.|\n)+)"
-        space_pattern = " ?"
-        regex_pattern = f"{date_pattern}{space_pattern}{time_pattern}{space_pattern} {text_pattern}"
+        worker_count: int = min(self.delivery_concurrency, len(reminders))
+        await asyncio.gather(*(worker() for _ in range(worker_count)))
+        return failures
 
-        result = re.fullmatch(regex_pattern, message)
+    @staticmethod
+    def _group_deliveries(reminders: List[Reminder]) -> List[List[Reminder]]:
+        """ Splits the reminders into the ones sent individually and groups of reminders for the same channel """
+        deliveries: List[List[Reminder]] = []
+        reminders_by_channel: Dict[int, List[Reminder]] = {}
+        for reminder in reminders:
+            if reminder.message_id:
+                deliveries.append([reminder])
+            else:
+                reminders_by_channel.setdefault(reminder.channel_id, []).append(reminder)
+        deliveries.extend(reminders_by_channel.values())
+        # Oldest first
+        deliveries.sort(key=lambda delivery: delivery[0].reminder_utc_timestamp)
+        return deliveries
 
-        # Pattern does not match
-        if result is None:
-            return None
+    async def _deliver(self, delivery: List[Reminder]) -> Dict[Reminder, str]:
+        """ Delivers one entry of _group_deliveries(), returns the failed reminders with their error """
+        try:
+            if delivery[0].message_id:
+                return await self._deliver_reminder(delivery[0])
+            return await self._deliver_channel_reminders(delivery)
+        except Exception as e:
+            logger.exception(f"Failed to deliver reminders {delivery}")
+            return {reminder: repr(e) for reminder in delivery}
 
-        results = [(message[x[0] : x[1]] if x != (-1, -1) else "") for x in result.regs]
-        _ = results.pop(0)
-        year, month, day, hour, minute, second, reminder_message = results
+    async def _deliver_reminder(self, reminder: Reminder) -> Dict[Reminder, str]:
+        person: discord.User = await self._get_user_by_id(reminder.user_id)
+        logger.info(f"Attempting to remind {reminder.user_name} of: {reminder.message}")
+        channel: discord.TextChannel = await self._get_channel_by_id(reminder.channel_id)
+        # Reminder was done using bot command
+        if channel and person and reminder.message_id:
+            self.rest_calls += 1
+            await person.send(f"{self._get_jump_url(reminder)}\nYou wanted to be reminded of: {reminder.message}")
+            self.delivered_reminders += 1
+            self._record_lateness("dm", [reminder])
+        # Reminder was done using slash command
+        elif person and channel:
+            return await self._deliver_channel_reminders([reminder])
+        return {}
 
-        # Message is empty or just a new line character
-        if not reminder_message.strip():
-            return None
+    async def _deliver_channel_reminders(self, reminders: List[Reminder]) -> Dict[Reminder, str]:
+        """
+        Sends reminders of the same channel in as few messages as possible, which saves the per-channel rate limit.
+        Users with the same reminder text are mentioned in one line. Returns the reminders whose user could not be
+        found or whose message could not be sent, with the error. Reminders of messages that were sent are not
+        returned, even if a later message failed, so they are not sent twice.
+        """
+        channel: discord.TextChannel = await self._get_channel_by_id(reminders[0].channel_id)
+        people = await asyncio.gather(
+            *(self._get_user_by_id(reminder.user_id) for reminder in reminders), return_exceptions=True
+        )
+        failures: Dict[Reminder, str] = {}
+        # Reminder text -> everyone who wanted to be reminded of it with their mention, in the order they were due
+        reminders_by_message: Dict[str, List[Tuple[Reminder, str]]] = {}
+        for reminder, person in zip(reminders, people):
+            if isinstance(person, Exception) or person is None:
+                failures[reminder] = repr(person) if isinstance(person, Exception) else "User not found"
+                logger.opt(exception=person if isinstance(person, Exception) else None).error(
+                    f"Failed to find user of reminder {reminder}"
+                )
+                continue
+            logger.info(f"Attempting to remind {reminder.user_name} of: {reminder.message}")
+            reminders_by_message.setdefault(reminder.message, []).append((reminder, person.mention))
+        if not channel or not reminders_by_message:
+            return failures
 
-        # Could not retrieve a combination of month+day or hour+minute from the message
-        if not all([month, day]) and not all([hour, minute]):
-            return None
+        lines: List[str] = []
+        # Reminders mentioned in each line
+        line_reminders: List[List[Reminder]] = []
+        for message, entries in reminders_by_message.items():
+            for line, mention_count in self._get_reminder_lines([mention for _, mention in entries], message):
+                lines.append(line)
+                line_reminders.append([reminder for reminder, _ in entries[:mention_count]])
+                entries = entries[mention_count:]
+        sent: List[Reminder] = []
+        for content, line_indexes in pack_lines(lines):
+            message_reminders: List[Reminder] = [
+                reminder for index in line_indexes for reminder in line_reminders[index]
+            ]
+            self.rest_calls += 1
+            try:
+                await channel.send(content)
+            except Exception as e:
+                logger.exception(f"Failed to send {len(message_reminders)} reminders to channel {channel.id}")
+                failures.update((reminder, repr(e)) for reminder in message_reminders)
+                continue
+            sent.extend(message_reminders)
+        # A line that was split over several messages only counts as sent if all of them were sent
+        sent = [reminder for reminder in dict.fromkeys(sent) if reminder not in failures]
+        self.delivered_reminders += len(sent)
+        self._record_lateness("channel", sent)
+        return failures
 
-        # Set year to current year if it was not set in the message string
-        year = year if year else time_now.year
-        # Set current month and day if the input was only HH:mm:ss
-        month = month if month else time_now.month
-        day = day if day else time_now.day
+    def _record_lateness(self, path: str, reminders: List[Reminder]):
+        """ Records how late the reminders were sent, reminders sent early by coalescing count as on time """
+        time_now: float = time.time()
+        histogram: LatencyHistogram = self.delivery_lateness[path]
+        for reminder in reminders:
+            histogram.record(time_now - reminder.reminder_utc_timestamp)
 
-        # Fill empty strings with 1 zero
-        hour, minute, second = [v.zfill(2) for v in [hour, minute, second]]
+    def _log_lateness_summary(self, force: bool = False):
+        """ Logs the lateness percentiles of each delivery path every 'lateness_summary_interval' seconds """
+        count: int = sum(histogram.count for histogram in self.delivery_lateness.values())
+        if count == self._lateness_summary_count:
+            return
+        if not force and time.monotonic() - self._lateness_summary_at < self.lateness_summary_interval:
+            return
+        self._lateness_summary_at = time.monotonic()
+        self._lateness_summary_count = count
+        for path, histogram in self.delivery_lateness.items():
+            if histogram.count:
+                logger.info(f"Delivery lateness via {path}: {histogram.summary()}")
 
-        try:
-            future_reminder_time = arrow.get(
-                f"{str(year).zfill(2)}-{str(month).zfill(2)}-{str(day).zfill(2)} {str(hour).zfill(2)}:{str(minute).zfill(2)}:{str(second).zfill(2)}",
-                ["YYYY-MM-DD HH:mm:ss"],
-            )
-        except (ValueError, arrow.parser.ParserError):
-            # Exception: ParserError not the right format
-            return None
-        return future_reminder_time, reminder_message.strip()
+    @staticmethod
+    def _get_reminder_lines(mentions: List[str], message: str) -> List[Tuple[str, int]]:
+        """
+        Mentions everyone with the same reminder text, spread over several lines if they do not fit in one message.
+        Returns each line with the amount of mentions in it.
+        """
+        text: str = f" You wanted to be reminded of: {message}"
+        mentions_limit: int = DISCORD_MESSAGE_LIMIT - len(text)
+        lines: List[Tuple[str, int]] = []
+        current: List[str] = []
+        current_length: int = 0
+        for mention in mentions:
+            if current and current_length + 1 + len(mention) > mentions_limit:
+                lines.append((f"{' '.join(current)}{text}", len(current)))
+                current, current_length = [], 0
+            current_length += len(mention) + (1 if current else 0)
+            current.append(mention)
+        lines.append((f"{' '.join(current)}{text}", len(current)))
+        return lines
 
-    async def _parse_time_shift_from_message(self, message: str) -> Optional[Tuple[arrow.Arrow, str]]:
-        time_now: arrow.Arrow = arrow.utcnow()
+    @staticmethod
+    def _get_jump_url(reminder: Reminder) -> str:
+        """ Same as message.jump_url, but without having to fetch the message first """
+        guild_id = reminder.guild_id or "@me"
+        return f"https://discord.com/channels/{guild_id}/{reminder.channel_id}/{reminder.message_id}"
 
-        days_pattern = "(?:([0-9]+) ?(?:d|day|days))?"
-        hours_pattern = "(?:([0-9]+) ?(?:h|hour|hours))?"
-        minutes_pattern = "(?:([0-9]+) ?(?:m|min|mins|minute|minutes))?"
-        seconds_pattern = "(?:([0-9]+) ?(?:s|sec|secs|second|seconds))?"
-        text_pattern = "((?:.|\n)+)"
-        space_pattern = " ?"
-        regex_pattern = f"{days_pattern}{space_pattern}{hours_pattern}{space_pattern}{minutes_pattern}{space_pattern}{seconds_pattern} {text_pattern}"
+    async def _add_reminder(self, reminder: Reminder):
+        await self._add_reminders([reminder])
 
-        result = re.fullmatch(regex_pattern, message)
+    async def _add_reminders(self, reminders: List[Reminder]):
+        """ Adds several reminders as one change, with one update of the user index and one write to disk """
+        loaded_reminders: List[Reminder] = []
+        rearm_scheduler: bool = False
+        for reminder in reminders:
+            # Reminders further in the future than the loaded window stay in the store only
+            if self.loaded_until is None or reminder.reminder_utc_timestamp < self.loaded_until:
+                queue: Union[ReminderQueue, TimingWheelQueue] = self._get_queue(reminder)
+                queue.push(reminder)
+                loaded_reminders.append(reminder)
+                if queue is self.backlog:
+                    self.backlog_size += 1
+                if queue.peek() is reminder:
+                    rearm_scheduler = True
+        self._index_reminders(loaded_reminders)
+        if rearm_scheduler:
+            self._rearm_scheduler()
+        await self._persist_many("add", reminders)
 
-        # Pattern does not match
-        if result is None:
-            return None
+    def _index_reminder(self, reminder: Reminder):
+        """ Insert the reminder into the time sorted list of its user, O(k) in the user's reminder count """
+        insort(self.reminders_by_user.setdefault(reminder.user_id, []), reminder)
 
-        results = [(message[x[0] : x[1]] if x != (-1, -1) else "") for x in result.regs]
-        _ = results.pop(0)
-        day, hour, minute, second, reminder_message = results
+    def _index_reminders(self, reminders: List[Reminder]):
+        """ Insert several reminders, each user's list is sorted once """
+        if len(reminders) == 1:
+            self._index_reminder(reminders[0])
+            return
+        changed_user_ids: Set[int] = set()
+        for reminder in reminders:
+            self.reminders_by_user.setdefault(reminder.user_id, []).append(reminder)
+            changed_user_ids.add(reminder.user_id)
+        for user_id in changed_user_ids:
+            self.reminders_by_user[user_id].sort(key=reminder_sort_key)
 
-        # Message is empty or just a new line character
-        if not reminder_message.strip():
-            return None
+    def _unindex_reminder(self, reminder: Reminder) -> bool:
+        """ Returns False if the reminder was not in memory """
+        user_reminders = self.reminders_by_user.get(reminder.user_id)
+        if user_reminders is None:
+            return False
+        found: bool = False
+        # Compare by identity, two reminders with the same time may exist
+        for index, user_reminder in enumerate(user_reminders):
+            if user_reminder is reminder:
+                user_reminders.pop(index)
+                found = True
+                break
+        if not user_reminders:
+            self.reminders_by_user.pop(reminder.user_id)
+        return found
 
-        # At least one value must be given
-        valid_usage: bool = (day or hour or minute or second) and reminder_message
-        if not valid_usage:
-            return None
+    def _unindex_reminders(self, reminders: List[Reminder]) -> List[Reminder]:
+        """ Removes several reminders from the user index, each user's list is rebuilt once """
+        ids_by_user: Dict[int, Set[int]] = {}
+        for reminder in reminders:
+            ids_by_user.setdefault(reminder.user_id, set()).add(id(reminder))
+        removed_reminders: List[Reminder] = []
+        for user_id, reminder_ids in ids_by_user.items():
+            user_reminders: List[Reminder] = self.reminders_by_user.get(user_id, [])
+            # Compare by identity, two reminders with the same time may exist
+            remaining_reminders: List[Reminder] = []
+            for reminder in user_reminders:
+                (removed_reminders if id(reminder) in reminder_ids else remaining_reminders).append(reminder)
+            if remaining_reminders:
+                self.reminders_by_user[user_id] = remaining_reminders
+            else:
+                self.reminders_by_user.pop(user_id, None)
+        return removed_reminders
 
-        # Fill empty strings with 1 zero
-        days, hours, minutes, seconds = [v.zfill(1) for v in [day, hour, minute, second]]
-        # Convert strings to int
-        days, hours, minutes, seconds = map(int, [days, hours, minutes, seconds])
+    async def _delete_reminders(self, reminders: List[Reminder]):
+        """ Deletes several reminders as one change, with one update of the user index and one write to disk """
+        earliest_reminder: Optional[Reminder] = self.reminders.peek()
+        for reminder in reminders:
+            logger.info(f"Removing reminder {reminder}")
+        # Reminders outside of the loaded window are only in the store
+        for reminder in self._unindex_reminders(reminders):
+            # Marks the reminder as cancelled, tick() skips it
+            self._get_queue(reminder).cancel(reminder)
+        if any(reminder is earliest_reminder for reminder in reminders):
+            self._rearm_scheduler()
+        await self._persist_many("delete", reminders)
 
-        # Do not do ridiculous reminders
-        if any(time > 1_000_000 for time in [days, hours, minutes, seconds]):
-            return None
+    async def _get_user_by_id(self, user_id: int) -> Optional[discord.User]:
+        """ Looks in the gateway cache first, then in our own cache, and only then fetches the user via REST """
+        user: Optional[discord.User] = self.client.get_user(user_id)
+        if user is None:
+            user = self.user_cache.get(user_id)
+        if user is None:
+            self.rest_calls += 1
+            user = await self.client.fetch_user(user_id)
+            self.user_cache.set(user_id, user)
+        return user
 
-        try:
-            future_reminder_time = time_now.shift(days=days, hours=hours, minutes=minutes, seconds=seconds)
-        # Days > 3_000_000 => error
-        except OverflowError:
-            return None
-        return future_reminder_time, reminder_message.strip()
+    async def _get_channel_by_id(self, channel_id: int) -> Optional[discord.TextChannel]:
+        """ Looks in the gateway cache first, then in our own cache, and only then fetches the channel via REST """
+        channel: Optional[discord.TextChannel] = self.client.get_channel(channel_id)
+        if channel is None:
+            channel = self.channel_cache.get(channel_id)
+        if channel is None:
+            self.rest_calls += 1
+            channel = await self.client.fetch_channel(channel_id)
+            self.channel_cache.set(channel_id, channel)
+        return channel
+
+    async def _get_all_reminders_by_user_id(self, user_id: int) -> List[Reminder]:
+        """ Returns a copy of the user's reminders, sorted by time ascending """
+        loaded_reminders: List[Reminder] = self.reminders_by_user.get(user_id, [])
+        if self.loaded_until is None:
+            return list(loaded_reminders)
+        # Only the store knows about all reminders of the user
+        # Use the objects in memory for the near-term reminders, so that they can be cancelled
+        loaded_reminders_by_key: Dict[tuple, List[Reminder]] = {}
+        for reminder in loaded_reminders:
+            loaded_reminders_by_key.setdefault(reminder_key(reminder.to_dict()), []).append(reminder)
+        user_reminders: List[Reminder] = []
+        for reminder_dict in self.store.user_reminders(user_id):
+            same_reminders = loaded_reminders_by_key.get(reminder_key(reminder_dict))
+            user_reminders.append(same_reminders.pop(0) if same_reminders else Reminder.from_dict(reminder_dict))
+        return user_reminders
+
+    async def _get_reminder_count_by_user_id(self, user_id: int) -> int:
+        if self.loaded_until is None:
+            return len(self.reminders_by_user.get(user_id, []))
+        return len(self.store.user_reminders(user_id))
+
+    async def _user_reached_max_reminder_threshold(self, user_id: int) -> bool:
+        return await self._get_reminder_count_by_user_id(user_id) >= self.reminder_limit
+
+    async def _parse_date_and_time_from_message(self, message: str) -> Optional[Tuple[arrow.Arrow, str]]:
+        return parse_date_and_time(message, arrow.utcnow())
+
+    async def _parse_time_shift_from_message(self, message: str) -> Optional[Tuple[arrow.Arrow, str]]:
+        return parse_time_shift(message, arrow.utcnow())
 
     async def public_remind_in(
         self,
@@ -241,38 +873,42 @@ class Remind(BaseClass):
         time: str,
         reminder_message: str,
     ):
-        """ Reminds the user in a couple days, hours or minutes with a certain message. """
-        threshold_reached: bool = await self._user_reached_max_reminder_threshold(author.id)
-        if threshold_reached:
-            user_reminders = await self._get_all_reminders_by_user_id(author.id)
-            return f"You already have {len(user_reminders)} / {self.reminder_limit} reminders, which is higher than the limit."
+        """
+        Reminds the user in a couple days, hours or minutes with a certain message.
+        Lines starting with '+' are additional reminders, they are all added at once.
+        """
+        reminder_count: int = await self._get_reminder_count_by_user_id(author.id)
+        if reminder_count >= self.reminder_limit:
+            return f"You already have {reminder_count} / {self.reminder_limit} reminders, which is higher than the limit."
 
         error_description = """
 Example usage:
 !reminder 5d 3h 2m 1s remind me of this
 !reminder 1day 1hour 1min 1second remind me of this
 !reminder 5days 3hours 2mins 420seconds remind me of this
+Several reminders at once, each further one on a new line starting with +
+!reminder 5m remind me of this
++ 1h remind me of that
         """
         error_embed: discord.Embed = discord.Embed(title="Usage of reminder command", description=error_description)
 
-        result = await self._parse_time_shift_from_message(f"{time} {reminder_message}".strip())
-        if result is None:
+        results = [
+            await self._parse_time_shift_from_message(text)
+            for text in self._split_reminders(f"{time} {reminder_message}")
+        ]
+        if not results or None in results:
             return error_embed
+        if reminder_count + len(results) > self.reminder_limit:
+            return self._get_bulk_limit_message(reminder_count, len(results))
 
-        future_reminder_time, reminder_message = result
-        reminder: Reminder = Reminder(
-            reminder_utc_timestamp=future_reminder_time.timestamp(),
-            user_id=author.id,
-            user_name=author.name,
-            guild_id=channel.guild.id,
-            channel_id=channel.id,
-            message=reminder_message,
-            message_id=message.id if message else None,
+        await self._add_reminders(
+            [
+                self._create_reminder(message, author, channel, future_reminder_time, text)
+                for future_reminder_time, text in results
+            ]
         )
-        await self._add_reminder(reminder)
-        # Tell the user that the reminder was added successfully
-        output_message: str = f"You will be reminded {future_reminder_time.humanize()} of: {reminder_message}"
-        return output_message
+        # Tell the user that the reminders were added successfully
+        return self._get_added_message(results)
 
     async def public_remind_at(
         self,
@@ -282,11 +918,13 @@ Example usage:
         time: str,
         reminder_message: str,
     ):
-        """ Add a reminder which reminds you at a certain time or date. """
-        threshold_reached: bool = await self._user_reached_max_reminder_threshold(author.id)
-        if threshold_reached:
-            user_reminders = await self._get_all_reminders_by_user_id(message.author.id)
-            return f"You already have {len(user_reminders)} / {self.reminder_limit} reminders, which is higher than the limit."
+        """
+        Add a reminder which reminds you at a certain time or date.
+        Lines starting with '+' are additional reminders, they are all added at once.
+        """
+        reminder_count: int = await self._get_reminder_count_by_user_id(author.id)
+        if reminder_count >= self.reminder_limit:
+            return f"You already have {reminder_count} / {self.reminder_limit} reminders, which is higher than the limit."
 
         time_now: arrow.Arrow = arrow.utcnow()
 
@@ -300,34 +938,85 @@ Example usage:
 !remindat 04-20 remind me of this
 !remindat 04:20:00 remind me of this
 !remindat 04:20 remind me of this
+Several reminders at once, each further one on a new line starting with +
+!remindat 04:20 remind me of this
++ 2021-04-20 remind me of that
         """
         error_embed: discord.Embed = discord.Embed(title="Usage of remindat command", description=error_description)
 
-        result = await self._parse_date_and_time_from_message(f"{time} {reminder_message}".strip())
-        if result is None:
+        results = [
+            await self._parse_date_and_time_from_message(text)
+            for text in self._split_reminders(f"{time} {reminder_message}")
+        ]
+        if not results or None in results:
             return error_embed
-        future_reminder_time, reminder_message = result
-
-        if time_now < future_reminder_time:
-            reminder: Reminder = Reminder(
-                reminder_utc_timestamp=future_reminder_time.timestamp(),
-                user_id=author.id,
-                user_name=author.name,
-                guild_id=channel.guild.id,
-                channel_id=channel.id,
-                message=reminder_message,
-                message_id=message.id if message else None,
-            )
-            await self._add_reminder(reminder)
-            # Tell the user that the reminder was added successfully
-            output_message: str = f"You will be reminded {future_reminder_time.humanize()} of: {reminder.message}"
-            return output_message
-        else:
+
+        if any(future_reminder_time <= time_now for future_reminder_time, _ in results):
             # TODO Fix embed for reminders in the past
             # Check if reminder is in the past, error invalid, reminder must be in the future
             return discord.Embed(
                 title="Usage of remindat command", description=f"Your reminder is in the past!\n{error_description}"
             )
+        if reminder_count + len(results) > self.reminder_limit:
+            return self._get_bulk_limit_message(reminder_count, len(results))
+
+        await self._add_reminders(
+            [
+                self._create_reminder(message, author, channel, future_reminder_time, text)
+                for future_reminder_time, text in results
+            ]
+        )
+        # Tell the user that the reminders were added successfully
+        return self._get_added_message(results)
+
+    @staticmethod
+    def _get_added_message(results: List[Tuple[arrow.Arrow, str]]) -> str:
+        return truncate_lines(
+            [f"You will be reminded {future_reminder_time.humanize()} of: {text}" for future_reminder_time, text in results]
+        )
+
+    @staticmethod
+    def _split_reminders(text: str) -> List[str]:
+        """
+        Reminders of a command, each starting with its time.
+        Lines starting with '+' start another reminder, all other lines continue the text of the previous one.
+        """
+        reminders: List[str] = []
+        for line in text.strip().split("\n"):
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("+") and reminders:
+                reminders.append(line[1:].strip())
+            elif reminders:
+                reminders[-1] = f"{reminders[-1]} {line}"
+            else:
+                reminders.append(line)
+        return reminders
+
+    def _get_bulk_limit_message(self, reminder_count: int, new_reminder_count: int) -> str:
+        return (
+            f"You already have {reminder_count} / {self.reminder_limit} reminders, "
+            f"adding {new_reminder_count} more would be higher than the limit."
+        )
+
+    @staticmethod
+    def _create_reminder(
+        message: discord.Message,
+        author: discord.User,
+        channel: discord.TextChannel,
+        future_reminder_time: arrow.Arrow,
+        reminder_message: str,
+    ) -> Reminder:
+        return Reminder(
+            reminder_utc_timestamp=future_reminder_time.timestamp(),
+            user_id=author.id,
+            user_name=author.name,
+            guild_id=channel.guild.id,
+            channel_id=channel.id,
+            message=reminder_message,
+            message_id=message.id if message else None,
+        )
 
     async def public_list_reminders(self, author: discord.User, channel: discord.TextChannel):
         """ List all of the user's reminders """
@@ -337,12 +1026,11 @@ Example usage:
 
         # Sorted reminders by date and time ascending
         user_reminders2: List[Reminder] = await self._get_all_reminders_by_user_id(author.id)
-        reminder_id = 1
-        while user_reminders2:
-            r: Reminder = user_reminders2.pop(0)
+        # Times are only converted to arrow here, to render them for the user
+        time_now: arrow.Arrow = arrow.utcnow()
+        for reminder_id, r in enumerate(user_reminders2, start=1):
             time: arrow.Arrow = arrow.Arrow.utcfromtimestamp(r.reminder_utc_timestamp)
-            user_reminders.append((reminder_id, str(time), time.humanize(), r.message))
-            reminder_id += 1
+            user_reminders.append((reminder_id, str(time), time.humanize(time_now), r.message))
 
         if user_reminders:
             reminders: List[str] = [
@@ -356,30 +1044,37 @@ Example usage:
             return f"You don't have any reminders."
 
     async def public_del_remind(self, author: discord.User, message: str):
-        """ Removes reminders from the user """
-        try:
-            reminder_id_to_delete = int(message) - 1
-        except ValueError:
+        """
+        Removes reminders from the user.
+        Takes a single reminder id, ids and ranges like '1-5,8', or 'all'. All of them are removed at once.
+        """
+        user_reminders = await self._get_all_reminders_by_user_id(author.id)
+        selection: str = message.strip().lower()
+        reminder_ids: Optional[List[int]] = list(range(1, len(user_reminders) + 1))
+        if selection != "all":
+            reminder_ids = self._parse_reminder_ids(selection, len(user_reminders))
+        if reminder_ids is None:
             # Error: message is not valid
             # TODO Replace "!" with bot variable
             error_title = f"Invalid usage of !delreminder"
-            embed_description = f"If you have 3 reminders, a valid command is is:\n!delreminder 2"
+            embed_description = (
+                f"If you have 3 reminders, a valid command is is:\n!delreminder 2\n"
+                f"Several reminders at once:\n!delreminder 1-2,3\n!delreminder all"
+            )
             embed = discord.Embed(title=error_title, description=embed_description)
             return embed
 
-        user_reminders = await self._get_all_reminders_by_user_id(author.id)
-        if 0 <= reminder_id_to_delete <= len(user_reminders) - 1:
-            reminder_to_delete: Reminder = user_reminders[reminder_id_to_delete]
-            # Find the reminder in the reminder list, then remove it
-            logger.info(f"Trying to remove reminder {reminder_to_delete}")
-            logger.info(f"Reminders available: {self.reminders}")
-            self.reminders.remove((reminder_to_delete.reminder_utc_timestamp, reminder_to_delete))
-            heapify(self.reminders)
-            await self.save_reminders()
+        if user_reminders and reminder_ids and 1 <= reminder_ids[0] and reminder_ids[-1] <= len(user_reminders):
+            reminders_to_delete: List[Reminder] = [user_reminders[reminder_id - 1] for reminder_id in reminder_ids]
+            await self._delete_reminders(reminders_to_delete)
             # Say that the reminder was successfully removed?
-            embed = discord.Embed(
-                title=f"Removed {author.name}'s reminder", description=f"{reminder_to_delete.message}"
+            title: str = f"Removed {author.name}'s reminder"
+            if len(reminders_to_delete) > 1:
+                title = f"Removed {len(reminders_to_delete)} of {author.name}'s reminders"
+            description: str = truncate_lines(
+                [reminder.message for reminder in reminders_to_delete], limit=DISCORD_EMBED_DESCRIPTION_LIMIT
             )
+            embed = discord.Embed(title=title, description=description)
             return embed
         else:
             # Invalid reminder id, too high number
@@ -389,6 +1084,23 @@ Example usage:
                 return f"Invalid reminder id, you only have one reminders. Only '!delreminder 1' works for you."
             return f"Invalid reminder id, you only have {len(user_reminders)} reminders. Pick a number between 1 and {len(user_reminders)}."
 
+    @staticmethod
+    def _parse_reminder_ids(selection: str, reminder_count: int) -> Optional[List[int]]:
+        """
+        Parses '1-5,8' into the sorted reminder ids [1, 2, 3, 4, 5, 8], None if it is not valid.
+        Ranges are only expanded up to one past 'reminder_count', which is enough to tell that they are too high.
+        """
+        reminder_ids: Set[int] = set()
+        for part in selection.split(","):
+            bounds: List[str] = [bound.strip() for bound in part.split("-")]
+            if not 1 <= len(bounds) <= 2 or not all(bound.isdigit() for bound in bounds):
+                return None
+            first, last = int(bounds[0]), int(bounds[-1])
+            if first > last:
+                return None
+            reminder_ids.update(range(first, min(last, max(first, reminder_count + 1)) + 1))
+        return sorted(reminder_ids)
+
 
 if __name__ == "__main__":
     message = "16:20 some message"
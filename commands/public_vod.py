@@ -11,9 +11,26 @@ from prettytable import PrettyTable  # pip install PTable
 import traceback
 
 from .base_class import BaseClass
+from .http_client import HttpClient
+from .persister import DebouncedPersister
+from .single_flight import SingleFlight
+
+TWITCH_API_URL = "https://api.twitch.tv"
 
 
 class Vod(BaseClass):
+    def __init__(
+        self,
+        http_client: Optional[HttpClient] = None,
+        settings: Optional[dict] = None,
+        settings_persister: Optional[DebouncedPersister] = None,
+    ):
+        super().__init__(settings, settings_persister)
+        # Shared with the other commands by the bot, so connections to the twitch api are reused
+        self.http_client: HttpClient = http_client or HttpClient()
+        # Concurrent '!vod' commands share one pass over the live streams and one lookup per vod
+        self.single_flight: SingleFlight = SingleFlight()
+
     async def _match_stream_name(self, streamer_name: str, stream_infos: List[dict]):
         # Find exact name matches first, e.g. "starcraft" should match "twitch.tv/starcraft" but also other channels that contain "starcraft" in their twitch username
         matches = [
@@ -78,18 +95,37 @@ class Vod(BaseClass):
         uptime_readable = " ".join(uptime_list)
         return uptime_readable
 
-    async def _get_vod_with_timestamp(
-        self, session: aiohttp.ClientSession, streamer_name: str, uptime_in_seconds: int
-    ) -> str:
+    async def _get_vod_with_timestamp(self, http_client: HttpClient, streamer_name: str, uptime_in_seconds: int) -> str:
+        latest_vod_url: str = await self.single_flight.do(
+            ("vod", streamer_name.lower()), lambda: self._fetch_latest_vod_url(http_client, streamer_name)
+        )
+        latest_vod_url_with_timestamp = f"{latest_vod_url}?t={uptime_in_seconds}s"
+        return latest_vod_url_with_timestamp
 
+    async def _fetch_latest_vod_url(self, http_client: HttpClient, streamer_name: str) -> str:
         # https://api.twitch.tv/kraken/channels/rotterdam08/videos?broadcast_type=archive&limit=1&login=rotterdam08&client_id=
-        url = f"https://api.twitch.tv/kraken/channels/{streamer_name}/videos?broadcast_type=archive&limit=1&login={streamer_name}&client_id={self.client_id}"
-        async with session.get(url) as response:
+        url = f"{TWITCH_API_URL}/kraken/channels/{streamer_name}/videos?broadcast_type=archive&limit=1&login={streamer_name}&client_id={self.client_id}"
+        async with http_client.get(url) as response:
             response_dict = await response.json()
         latest_vod_info = response_dict["videos"][0]
-        latest_vod_url = latest_vod_info["url"]
-        latest_vod_url_with_timestamp = f"{latest_vod_url}?t={uptime_in_seconds}s"
-        return latest_vod_url_with_timestamp
+        return latest_vod_info["url"]
+
+    async def _fetch_live_streams(self) -> List[dict]:
+        """ All live starcraft 2 streams, concurrent callers share one pass over the pages """
+        return await self.single_flight.do("streams", self._fetch_live_stream_pages)
+
+    async def _fetch_live_stream_pages(self) -> List[dict]:
+        streams: List[dict] = []
+        next_url = f"{TWITCH_API_URL}/kraken/streams?game=StarCraft+II&limit=100&stream_type=live"
+        # Loop until a page is empty, might take a while on a game with many streams
+        while True:
+            url = f"{next_url}&client_id={self.client_id}"
+            async with self.http_client.get(url) as response:
+                response_dict = await response.json()
+            if not response_dict["streams"]:
+                return streams
+            streams.extend(response_dict["streams"])
+            next_url = response_dict["_links"]["next"]
 
     async def public_vod(self, message: discord.Message):
         """This public command looks up a starcraft 2 twitch stream in the list of online streams, lists the current viewers and stream uptime, and if the stream is storing vods it will list the latest vod with the current timestamp
@@ -111,62 +147,43 @@ class Vod(BaseClass):
             # TODO: CHILL OUT too many requests in one message
             return
 
-        # Setup
-        response_dict = {
-            "streams": ["placeholder"],
-            "_links": {"next": "https://api.twitch.tv/kraken/streams?game=StarCraft+II&limit=100&stream_type=live"},
-        }
-
         streamer_dict: Dict[str, str] = {streamer_name: "" for streamer_name in content_as_list}
         responses = []
         vod_channels: Set[str] = set(await self._get_setting_server_value(message.guild, "vod_channels", list))
 
-        # Loop while stream name not found, might take a while on a game with many streams
-        session: aiohttp.ClientSession
-        async with aiohttp.ClientSession() as session:
-            while len(response_dict["streams"]):
-                next_url = response_dict["_links"]["next"]
-                url = f"{next_url}&client_id={self.client_id}"
-                async with session.get(url) as response:
-                    response_dict = await response.json()
-
-                    for streamer_name, info in streamer_dict.items():
-                        if streamer_name.strip() == "":
-                            # Fix double space: "test  test2".split(" ") == ["test", "", "test2"]
-                            continue
-
-                        if info:  # If info about the streamer was found already
-                            break
+        stream_infos: List[dict] = await self._fetch_live_streams()
+        for streamer_name, info in streamer_dict.items():
+            if streamer_name.strip() == "":
+                # Fix double space: "test  test2".split(" ") == ["test", "", "test2"]
+                continue
 
-                        matches: List[dict] = await self._match_stream_name(streamer_name, response_dict["streams"])
+            matches: List[dict] = await self._match_stream_name(streamer_name, stream_infos)
 
-                        if len(matches) > 1:
-                            streamer_dict[streamer_name] = "Too many matches"
-                            responses.append(
-                                f"Too many ({len(matches)}) streams found for stream name `{streamer_name}`"
-                            )
+            if len(matches) > 1:
+                streamer_dict[streamer_name] = "Too many matches"
+                responses.append(f"Too many ({len(matches)}) streams found for stream name `{streamer_name}`")
 
-                        elif len(matches) == 1:
-                            match = matches[0]
+            elif len(matches) == 1:
+                match = matches[0]
 
-                            data = await self.vod_parse_api_response(session, match)
-                            stream_name, stream_url, stream_viewers, stream_uptime_readable, stream_vod_timestamp = data
+                data = await self.vod_parse_api_response(self.http_client, match)
+                stream_name, stream_url, stream_viewers, stream_uptime_readable, stream_vod_timestamp = data
 
-                            embed = discord.Embed(title=stream_name, url=stream_url)
-                            embed.add_field(name="Uptime", value=stream_uptime_readable)
-                            embed.add_field(name="Viewers", value=str(stream_viewers))
-                            # embed.add_field(name="Quality", value=f"{stream_quality}p {stream_fps}fps")
-                            embed.add_field(name="Vod Timestamp", value=stream_vod_timestamp)
-                            # embed.add_field(name="Stream Title", value=stream_title)
+                embed = discord.Embed(title=stream_name, url=stream_url)
+                embed.add_field(name="Uptime", value=stream_uptime_readable)
+                embed.add_field(name="Viewers", value=str(stream_viewers))
+                # embed.add_field(name="Quality", value=f"{stream_quality}p {stream_fps}fps")
+                embed.add_field(name="Vod Timestamp", value=stream_vod_timestamp)
+                # embed.add_field(name="Stream Title", value=stream_title)
 
-                            await message.channel.send("", embed=embed)
+                await message.channel.send("", embed=embed)
 
-                            # Send the vod link also to the other channels
-                            for channel in message.guild.channels:
-                                if channel.name in vod_channels:
-                                    await channel.send("", embed=embed)
+                # Send the vod link also to the other channels
+                for channel in message.guild.channels:
+                    if channel.name in vod_channels:
+                        await channel.send("", embed=embed)
 
-                            streamer_dict[streamer_name] = "Found"
+                streamer_dict[streamer_name] = "Found"
 
         for streamer_name, info in streamer_dict.items():
             if info == "":
@@ -176,7 +193,7 @@ class Vod(BaseClass):
             response_message = f"{responses_as_str}"
             await message.channel.send(response_message)
 
-    async def vod_parse_api_response(self, session: aiohttp.ClientSession, api_response: dict) -> tuple:
+    async def vod_parse_api_response(self, http_client: HttpClient, api_response: dict) -> tuple:
         stream_url: str = api_response["channel"]["url"]
         stream_name: str = api_response["channel"]["display_name"]
         # stream_title: str = api_response["channel"]["status"]
@@ -186,7 +203,7 @@ class Vod(BaseClass):
         # stream_quality: int = api_response["video_height"]
         # stream_fps: int = api_response["average_fps"]
         try:
-            stream_vod_timestamp: str = await self._get_vod_with_timestamp(session, stream_name, stream_uptime)
+            stream_vod_timestamp: str = await self._get_vod_with_timestamp(http_client, stream_name, stream_uptime)
         except:
             stream_vod_timestamp: str = "No past broadcasts available"
 
@@ -0,0 +1,28 @@
+import asyncio
+import time
+
+
+class RateLimiter:
+    """
+    Token bucket which allows 'rate' acquisitions per 'per' seconds.
+    Up to 'rate' acquisitions may happen at once after the limiter was idle.
+    """
+
+    def __init__(self, rate: float, per: float = 1):
+        self.rate: float = rate
+        self.per: float = per
+        self.tokens: float = rate
+        self.updated_at: float = time.monotonic()
+
+    def _refill(self):
+        time_now: float = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (time_now - self.updated_at) * self.rate / self.per)
+        self.updated_at = time_now
+
+    async def acquire(self):
+        """ Waits until the next acquisition is allowed """
+        self._refill()
+        while self.tokens < 1:
+            await asyncio.sleep((1 - self.tokens) * self.per / self.rate)
+            self._refill()
+        self.tokens -= 1
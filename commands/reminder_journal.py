@@ -0,0 +1,268 @@
+from pathlib import Path
+import os
+import json
+import hashlib
+import re
+from typing import Any, List, Dict, Iterable, Iterator, Optional, Union, Tuple, TextIO
+
+from atomicwrites import atomic_write
+from loguru import logger
+
+ReminderDict = Dict[str, Union[int, float, str, None]]
+
+
+# Fields which identify a reminder
+REMINDER_KEY_FIELDS = ("reminder_utc_timestamp", "guild_id", "channel_id", "user_id", "message_id", "message")
+
+
+def reminder_key(reminder: ReminderDict) -> Tuple:
+    """ Two reminders with the same key are interchangeable, so a 'delete' or 'fire' record may remove either one """
+    return tuple(reminder.get(field) for field in REMINDER_KEY_FIELDS)
+
+
+def iter_json_array(f: TextIO, chunk_size: int = 1 << 16) -> Iterator[Any]:
+    """
+    Yields the items of a json array one by one while reading the file in chunks,
+    so the whole file content and all decoded items never have to be in memory at the same time.
+    """
+    decoder = json.JSONDecoder()
+    separator = re.compile(r"[\s,]*")
+    buffer: str = f.read(chunk_size).lstrip()
+    if not buffer.startswith("["):
+        raise ValueError(f"Expected a json array in {getattr(f, 'name', f)}")
+    position: int = 1
+    end_of_file: bool = False
+    while True:
+        # Skip whitespace and the comma between two items
+        position = separator.match(buffer, position).end()
+        if position < len(buffer) and buffer[position] == "]":
+            return
+        try:
+            item, next_position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            # The item continues in the next chunk
+            if end_of_file:
+                raise
+            chunk: str = f.read(chunk_size)
+            end_of_file = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        # A number at the end of the buffer may be cut off, so only trust it if something follows
+        if next_position == len(buffer) and not end_of_file:
+            chunk = f.read(chunk_size)
+            end_of_file = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield item
+        position = next_position
+
+
+class _HashingReader:
+    """ File wrapper which computes the hash of everything that was read """
+
+    def __init__(self, f: TextIO):
+        self.f: TextIO = f
+        self.name: str = f.name
+        self.sha1 = hashlib.sha1()
+
+    def read(self, size: int = -1) -> str:
+        data: str = self.f.read(size)
+        self.sha1.update(data.encode())
+        return data
+
+
+class ReminderJournal:
+    """
+    Append-only log of reminder mutations on top of a json snapshot.
+    Each 'add', 'delete' and 'fire' is written as one json line to the journal file.
+    Once enough records piled up, the journal is folded into a new snapshot (compaction).
+
+    The first line of the journal is a header with the hash of the snapshot it belongs to.
+    If the bot crashes after the new snapshot was written but before the journal was reset,
+    the hash no longer matches and the stale journal is ignored instead of being applied twice.
+
+    The new snapshot can be prepared in a worker thread while records are still appended. Before it replaces the old
+    snapshot, a header of the new snapshot and the records since the start of the compaction are appended, so the
+    journal has one segment for each snapshot, and load() only replays the segment of the snapshot that is on disk.
+    """
+
+    def __init__(self, snapshot_path: Path, journal_path: Path, compact_threshold: int = 1000):
+        self.snapshot_path: Path = snapshot_path
+        self.journal_path: Path = journal_path
+        # Amount of records after which the journal should be folded into the snapshot
+        self.compact_threshold: int = compact_threshold
+        self.records_since_compaction: int = 0
+        # True if the journal on disk belongs to an older snapshot and has to be reset
+        self.stale: bool = False
+        self._file: Optional[TextIO] = None
+        # Journal lines written since begin_compaction(), and the amount of records in them
+        self._compaction_lines: Optional[List[str]] = None
+        self._compaction_records: int = 0
+
+    @staticmethod
+    def _hash(data: str) -> str:
+        return hashlib.sha1(data.encode()).hexdigest()
+
+    @property
+    def needs_compaction(self) -> bool:
+        return self.records_since_compaction >= self.compact_threshold
+
+    def _iter_snapshot(self) -> Iterator[ReminderDict]:
+        if self.snapshot_path.is_file():
+            with open(self.snapshot_path) as f:
+                yield from iter_json_array(f)
+
+    @property
+    def _prepared_snapshot_path(self) -> Path:
+        return self.snapshot_path.with_name(f"{self.snapshot_path.name}.compacting")
+
+    def _read_segments(self) -> List[Tuple[Optional[str], List[dict]]]:
+        """ The snapshot hash of each header and the records after it, a journal without header has hash None """
+        segments: List[Tuple[Optional[str], List[dict]]] = [(None, [])]
+        valid_lines: List[str] = []
+        torn: bool = False
+        if self.journal_path.is_file():
+            with open(self.journal_path) as f:
+                for line_number, line in enumerate(f, start=1):
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Last line may be torn if the bot crashed during a write
+                        logger.warning(f"Skipping corrupt line {line_number} in {self.journal_path}")
+                        torn = True
+                        continue
+                    # A complete record without line break would be glued to the next appended record
+                    torn = torn or not line.endswith("\n")
+                    valid_lines.append(line if line.endswith("\n") else f"{line}\n")
+                    if record["op"] == "base":
+                        if segments[-1][0] is None and not segments[-1][1]:
+                            segments.pop()
+                        segments.append((record["snapshot"], []))
+                    else:
+                        segments[-1][1].append(record)
+        if torn:
+            # Later records must start on a line of their own, otherwise they are lost with the torn line
+            self.close()
+            with atomic_write(self.journal_path, overwrite=True) as f:
+                f.write("".join(valid_lines))
+        return segments
+
+    def load(self) -> Iterable[ReminderDict]:
+        """
+        Replay the snapshot and then all journal records on top of it.
+        Without journal records, the snapshot is streamed from the file instead of being read at once.
+        """
+        self.records_since_compaction = 0
+        self.stale = False
+        segments: List[Tuple[Optional[str], List[dict]]] = self._read_segments()
+        if not any(segment_records for _, segment_records in segments):
+            return self._iter_snapshot()
+
+        reminders: List[ReminderDict] = []
+        snapshot_hash: Optional[str] = None
+        if self.snapshot_path.is_file():
+            with open(self.snapshot_path) as f:
+                reader = _HashingReader(f)
+                reminders = list(iter_json_array(reader))
+            snapshot_hash = reader.sha1.hexdigest()
+        records: Optional[List[dict]] = None
+        for base_hash, segment_records in segments:
+            if base_hash is None or base_hash == snapshot_hash:
+                records = segment_records
+        if records is None:
+            # Journal was already folded into the current snapshot
+            logger.info(f"Ignoring stale journal {self.journal_path}")
+            self.stale = True
+            self._reset(snapshot_hash)
+            return reminders
+
+        # Interchangeable reminders are grouped by key so that a delete record costs O(1)
+        reminders_by_key: Dict[Tuple, List[ReminderDict]] = {}
+        for reminder in reminders:
+            reminders_by_key.setdefault(reminder_key(reminder), []).append(reminder)
+
+        for record in records:
+            self.records_since_compaction += 1
+            operation = record["op"]
+            reminder: ReminderDict = record["reminder"]
+            key = reminder_key(reminder)
+            if operation == "add":
+                reminders_by_key.setdefault(key, []).append(reminder)
+            elif operation in {"delete", "fire"}:
+                same_reminders = reminders_by_key.get(key)
+                if same_reminders:
+                    same_reminders.pop()
+                else:
+                    logger.warning(f"Journal tried to remove unknown reminder {reminder}")
+        return [reminder for same_reminders in reminders_by_key.values() for reminder in same_reminders]
+
+    def _reset(self, snapshot_hash: Optional[str]):
+        """ Start an empty journal for the current snapshot, so records appended later are not behind a stale header """
+        self.close()
+        with atomic_write(self.journal_path, overwrite=True) as f:
+            if snapshot_hash is not None:
+                f.write(f"{json.dumps({'op': 'base', 'snapshot': snapshot_hash})}\n")
+
+    def append(self, operation: str, reminder: ReminderDict):
+        """ Write a single mutation, one of 'add', 'delete' or 'fire' """
+        self.append_many(operation, [reminder])
+
+    def append_many(self, operation: str, reminders: List[ReminderDict]):
+        """ Write the same mutation of several reminders with one write, one record per reminder """
+        if not reminders:
+            return
+        lines: str = "".join(f"{json.dumps({'op': operation, 'reminder': reminder})}\n" for reminder in reminders)
+        self._write(lines)
+        self.records_since_compaction += len(reminders)
+        if self._compaction_lines is not None:
+            self._compaction_lines.append(lines)
+            self._compaction_records += len(reminders)
+
+    def _write(self, data: str):
+        if self._file is None:
+            self._file = open(self.journal_path, "a")
+        self._file.write(data)
+        self._file.flush()
+
+    def compact(self, reminders: List[ReminderDict]):
+        """ Write all reminders as new snapshot and start an empty journal which belongs to that snapshot """
+        self.begin_compaction()
+        self.commit_snapshot(self.prepare_snapshot(reminders))
+
+    def begin_compaction(self):
+        """ Called when the reminders for the new snapshot are taken, records appended after this are kept """
+        self._compaction_lines = []
+        self._compaction_records = 0
+
+    def prepare_snapshot(self, reminders: List[ReminderDict]) -> str:
+        """ Blocking, can run in a worker thread: write the new snapshot next to the current one, returns its hash """
+        snapshot_data = json.dumps(reminders, indent=2)
+        self.snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+        with atomic_write(self._prepared_snapshot_path, overwrite=True) as f:
+            f.write(snapshot_data)
+        return self._hash(snapshot_data)
+
+    def commit_snapshot(self, snapshot_hash: str):
+        """ Replace the snapshot with the prepared one, the journal keeps the records appended since begin_compaction """
+        lines: str = "".join(self._compaction_lines or [])
+        records: int = self._compaction_records
+        self.abort_compaction()
+        segment: str = f"{json.dumps({'op': 'base', 'snapshot': snapshot_hash})}\n{lines}"
+        # If the bot crashes before the snapshot was replaced, the old snapshot's segment ends at this header
+        self._write(segment)
+        os.replace(self._prepared_snapshot_path, self.snapshot_path)
+        self.close()
+        with atomic_write(self.journal_path, overwrite=True) as f:
+            f.write(segment)
+        self.records_since_compaction = records
+
+    def abort_compaction(self):
+        self._compaction_lines = None
+        self._compaction_records = 0
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
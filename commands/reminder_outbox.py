@@ -0,0 +1,216 @@
+from pathlib import Path
+import json
+import time
+from typing import Any, Callable, Dict, List, Optional, TextIO
+
+from atomicwrites import atomic_write
+from loguru import logger
+
+
+class OutboxEntry:
+    """ A reminder that is due and waits until its delivery was acknowledged """
+
+    __slots__ = ("id", "reminder", "attempts", "next_attempt_at", "last_error", "in_flight")
+
+    def __init__(self, id: int, reminder: Any, attempts: int = 0, next_attempt_at: float = 0, last_error: str = ""):
+        self.id: int = id
+        # A Reminder, it is converted with to_dict() when written to disk
+        self.reminder: Any = reminder
+        # Amount of failed delivery attempts
+        self.attempts: int = attempts
+        self.next_attempt_at: float = next_attempt_at
+        self.last_error: str = last_error
+        # True while a delivery attempt is running, so the entry is not taken twice
+        self.in_flight: bool = False
+
+
+class ReminderOutbox:
+    """
+    Durable queue of due reminders which were not delivered yet.
+    A reminder is written to the outbox before it is removed from the reminder store, and removed from the outbox
+    only after it was sent. Failed deliveries are retried with exponential backoff, and after 'max_attempts' failures
+    the reminder is moved to the dead letter file.
+
+    The outbox file is an append-only log of 'add', 'retry', 'ack' and 'dead' records, one json line each.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        dead_letter_path: Path,
+        from_dict: Callable[[dict], Any],
+        max_attempts: int = 5,
+        retry_delay: float = 5,
+        max_retry_delay: float = 600,
+        compact_threshold: int = 1000,
+    ):
+        self.path: Path = path
+        self.dead_letter_path: Path = dead_letter_path
+        # Creates a reminder from a dict when the outbox is loaded
+        self.from_dict: Callable[[dict], Any] = from_dict
+        self.max_attempts: int = max_attempts
+        # Delay before the first retry, doubled with every further failure up to 'max_retry_delay'
+        self.retry_delay: float = retry_delay
+        self.max_retry_delay: float = max_retry_delay
+        # Amount of records after which the log is rewritten with only the pending entries
+        self.compact_threshold: int = compact_threshold
+        self.entries: Dict[int, OutboxEntry] = {}
+        self.records: int = 0
+        self.dead_letters: int = 0
+        self._next_id: int = 0
+        self._file: Optional[TextIO] = None
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def load(self):
+        """ Replay the outbox log, entries that were in flight during a crash are retried """
+        self.entries = {}
+        self.records = 0
+        if self.path.is_file():
+            with open(self.path) as f:
+                for line_number, line in enumerate(f, start=1):
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Last line may be torn if the bot crashed during a write
+                        logger.warning(f"Skipping corrupt line {line_number} in {self.path}")
+                        continue
+                    self.records += 1
+                    operation = record["op"]
+                    if operation == "add":
+                        entry = OutboxEntry(
+                            record["id"],
+                            self.from_dict(record["reminder"]),
+                            record.get("attempts", 0),
+                            record.get("next_attempt_at", 0),
+                            record.get("error", ""),
+                        )
+                        self.entries[entry.id] = entry
+                        self._next_id = max(self._next_id, entry.id + 1)
+                    elif operation == "retry" and record["id"] in self.entries:
+                        entry = self.entries[record["id"]]
+                        entry.attempts = record["attempts"]
+                        entry.next_attempt_at = record["next_attempt_at"]
+                        entry.last_error = record["error"]
+                    elif operation in {"ack", "dead"}:
+                        for entry_id in record["ids"]:
+                            self.entries.pop(entry_id, None)
+        if self.entries:
+            logger.info(f"Loaded {len(self.entries)} undelivered reminders from {self.path}")
+        self.compact()
+
+    def _write(self, records: List[dict]):
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, "a")
+        self._file.write("".join(f"{json.dumps(record)}\n" for record in records))
+        self._file.flush()
+        self.records += len(records)
+
+    def add(self, reminders: List[Any]) -> List[OutboxEntry]:
+        """ Adds due reminders, the returned entries are in flight and have to be acknowledged or failed """
+        entries: List[OutboxEntry] = []
+        if not reminders:
+            return entries
+        for reminder in reminders:
+            entry = OutboxEntry(self._next_id, reminder, next_attempt_at=time.time())
+            entry.in_flight = True
+            self._next_id += 1
+            entries.append(entry)
+        # Only entries which were written are kept, if the write fails the reminders are not in the outbox
+        self._write([{"op": "add", "id": entry.id, "reminder": entry.reminder.to_dict()} for entry in entries])
+        for entry in entries:
+            self.entries[entry.id] = entry
+        return entries
+
+    def take_due(self, limit: int) -> List[OutboxEntry]:
+        """ Up to 'limit' entries whose next attempt is due, oldest first, they are marked as in flight """
+        time_now: float = time.time()
+        due_entries: List[OutboxEntry] = []
+        # Entries are kept in insertion order, which is the order in which the reminders were due
+        for entry in self.entries.values():
+            if not entry.in_flight and entry.next_attempt_at <= time_now:
+                entry.in_flight = True
+                due_entries.append(entry)
+                if len(due_entries) >= limit:
+                    break
+        return due_entries
+
+    def next_attempt_at(self) -> Optional[float]:
+        """ When the next retry is due, None if there is nothing to retry """
+        return min(
+            (entry.next_attempt_at for entry in self.entries.values() if not entry.in_flight), default=None
+        )
+
+    def ack(self, entries: List[OutboxEntry]):
+        """ The reminders were delivered """
+        if not entries:
+            return
+        for entry in entries:
+            self.entries.pop(entry.id, None)
+        self._write([{"op": "ack", "ids": [entry.id for entry in entries]}])
+        self._compact_if_needed()
+
+    def fail(self, entry: OutboxEntry, error: str) -> bool:
+        """ Schedules a retry, returns True if the entry failed too often and was moved to the dead letter file """
+        entry.in_flight = False
+        entry.attempts += 1
+        entry.last_error = error
+        if entry.attempts >= self.max_attempts:
+            self.entries.pop(entry.id, None)
+            self.dead_letters += 1
+            self.dead_letter_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.dead_letter_path, "a") as f:
+                dead_letter = {
+                    "reminder": entry.reminder.to_dict(),
+                    "attempts": entry.attempts,
+                    "error": error,
+                    "failed_at": time.time(),
+                }
+                f.write(f"{json.dumps(dead_letter)}\n")
+            self._write([{"op": "dead", "ids": [entry.id]}])
+            self._compact_if_needed()
+            return True
+        entry.next_attempt_at = time.time() + min(self.max_retry_delay, self.retry_delay * 2 ** (entry.attempts - 1))
+        self._write(
+            [
+                {
+                    "op": "retry",
+                    "id": entry.id,
+                    "attempts": entry.attempts,
+                    "next_attempt_at": entry.next_attempt_at,
+                    "error": error,
+                }
+            ]
+        )
+        return False
+
+    def _compact_if_needed(self):
+        # Wait until the log consists mostly of finished entries
+        if self.records >= max(self.compact_threshold, 2 * len(self.entries)):
+            self.compact()
+
+    def compact(self):
+        """ Rewrite the log with only the pending entries """
+        self.close()
+        records = [
+            {
+                "op": "add",
+                "id": entry.id,
+                "reminder": entry.reminder.to_dict(),
+                "attempts": entry.attempts,
+                "next_attempt_at": entry.next_attempt_at,
+                "error": entry.last_error,
+            }
+            for entry in self.entries.values()
+        ]
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with atomic_write(self.path, overwrite=True) as f:
+            f.write("".join(f"{json.dumps(record)}\n" for record in records))
+        self.records = len(records)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,80 @@
+import time
+from heapq import heappush, heappop, heapify
+from typing import List, Tuple, Iterable, Iterator, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from commands.public_remind import Reminder
+
+
+def to_epoch_ms(timestamp: float) -> int:
+    """ Scheduling works on integer epoch milliseconds, arrow is only used to render times for users """
+    return int(timestamp * 1000)
+
+
+def epoch_ms_now() -> int:
+    return time.time_ns() // 1_000_000
+
+
+class ReminderQueue:
+    """
+    Min-heap of (epoch milliseconds, reminder) entries, the earliest reminder is first.
+    Cancelling a reminder only marks it as cancelled (tombstone), which is O(1).
+    Tombstones are dropped when they reach the top of the heap, or all at once when they make up too much of the heap.
+    """
+
+    def __init__(self, reminders: Iterable["Reminder"] = (), compact_ratio: float = 0.5, compact_minimum: int = 64):
+        self.heap: List[Tuple[int, "Reminder"]] = [(to_epoch_ms(r.reminder_utc_timestamp), r) for r in reminders]
+        heapify(self.heap)
+        # Amount of cancelled reminders that are still in the heap
+        self.cancelled: int = 0
+        # Compact once more than 'compact_minimum' tombstones make up more than 'compact_ratio' of the heap
+        self.compact_ratio: float = compact_ratio
+        self.compact_minimum: int = compact_minimum
+
+    def __len__(self) -> int:
+        return len(self.heap) - self.cancelled
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    def __iter__(self) -> Iterator["Reminder"]:
+        """ All reminders that are not cancelled, in no particular order """
+        return (reminder for _, reminder in self.heap if not reminder.cancelled)
+
+    def push(self, reminder: "Reminder"):
+        heappush(self.heap, (to_epoch_ms(reminder.reminder_utc_timestamp), reminder))
+
+    def _drop_cancelled_top(self):
+        while self.heap and self.heap[0][1].cancelled:
+            heappop(self.heap)
+            self.cancelled -= 1
+
+    def peek(self) -> Optional["Reminder"]:
+        """ The earliest reminder that is not cancelled """
+        self._drop_cancelled_top()
+        return self.heap[0][1] if self.heap else None
+
+    def peek_due_ms(self) -> Optional[int]:
+        """ When the earliest reminder is due in epoch milliseconds, without looking at the reminder itself """
+        self._drop_cancelled_top()
+        return self.heap[0][0] if self.heap else None
+
+    def pop(self) -> "Reminder":
+        self._drop_cancelled_top()
+        return heappop(self.heap)[1]
+
+    def cancel(self, reminder: "Reminder") -> bool:
+        """ Returns False if the reminder was already cancelled """
+        if reminder.cancelled:
+            return False
+        reminder.cancelled = True
+        self.cancelled += 1
+        if self.cancelled > self.compact_minimum and self.cancelled > len(self.heap) * self.compact_ratio:
+            self.compact()
+        return True
+
+    def compact(self):
+        """ Remove all tombstones from the heap in O(n) """
+        self.heap = [entry for entry in self.heap if not entry[1].cancelled]
+        heapify(self.heap)
+        self.cancelled = 0
@@ -0,0 +1,436 @@
+from pathlib import Path
+import asyncio
+import json
+import sqlite3
+from bisect import bisect_left
+from typing import Callable, List, Dict, Iterable, Iterator, Optional, Set, Tuple, TextIO
+
+from atomicwrites import atomic_write
+from loguru import logger
+
+from commands.persister import DebouncedPersister
+from commands.reminder_journal import ReminderJournal, ReminderDict, REMINDER_KEY_FIELDS, reminder_key, iter_json_array
+
+
+class ReminderStore:
+    """
+    Where reminders are kept on disk.
+    Changes are recorded as 'add', 'delete' or 'fire' of a single reminder (as dict from Reminder.to_dict()).
+    """
+
+    # True if the store can answer queries itself, so Remind only needs to keep the near-term reminders in memory
+    windowed: bool = False
+    # Changes which did not need their own write to disk
+    coalesced_writes: int = 0
+    # True if several bot processes can use the store at the same time, each with its own shards
+    shared: bool = False
+
+    def load(self, since: Optional[float] = None, until: Optional[float] = None) -> Iterable[ReminderDict]:
+        """ Reminders with since <= reminder_utc_timestamp < until, all reminders if not given """
+        raise NotImplementedError
+
+    def record(self, operation: str, reminder: ReminderDict):
+        raise NotImplementedError
+
+    def record_many(self, operation: str, reminders: List[ReminderDict]):
+        for reminder in reminders:
+            self.record(operation, reminder)
+
+    def fire_many(self, reminders: List[ReminderDict]) -> List[bool]:
+        """
+        Removes due reminders from the store, returns for each reminder if it was still stored.
+        In a shared store another process may have deleted it in the meantime, then it must not be delivered.
+        """
+        self.record_many("fire", reminders)
+        return [True] * len(reminders)
+
+    async def flush(self):
+        """ Write everything that is not on disk yet, stores which write in the background wait for it here """
+
+    def user_reminders(self, user_id: int) -> List[ReminderDict]:
+        """ All reminders of a user sorted by time, only needed for windowed stores """
+        raise NotImplementedError
+
+    def migrate_from_json(self, snapshot_path: Path, journal_path: Path):
+        """ One-shot import of reminders.json (and its journal) into a windowed store, the files are renamed after """
+        if not snapshot_path.is_file() and not journal_path.is_file():
+            return
+        reminders = list(ReminderJournal(snapshot_path, journal_path).load())
+        self.record_many("add", reminders)
+        for path in [snapshot_path, journal_path]:
+            if path.is_file():
+                path.rename(path.with_name(f"{path.name}.migrated"))
+        logger.info(f"Migrated {len(reminders)} reminders from {snapshot_path} to {self}")
+
+    def close(self):
+        pass
+
+
+class JsonReminderStore(ReminderStore):
+    """ All reminders in one json file, which is rewritten in the background shortly after changes """
+
+    def __init__(self, path: Path, get_reminders: Callable[[], List[ReminderDict]], save_interval: float = 1):
+        self.path: Path = path
+        # Returns all reminders that are in memory, serialized
+        self.get_reminders: Callable[[], List[ReminderDict]] = get_reminders
+        self.persister: DebouncedPersister = DebouncedPersister(path, get_reminders, interval=save_interval)
+
+    def load(self, since: Optional[float] = None, until: Optional[float] = None) -> Iterator[ReminderDict]:
+        if not self.path.is_file():
+            self.persister.write([])
+            return
+        with open(self.path) as f:
+            yield from iter_json_array(f)
+
+    def record(self, operation: str, reminder: ReminderDict):
+        self.persister.mark_dirty()
+
+    def record_many(self, operation: str, reminders: List[ReminderDict]):
+        # The whole file is rewritten anyway, so several changes are one write request
+        self.persister.mark_dirty()
+
+    async def flush(self):
+        await self.persister.flush()
+
+    @property
+    def coalesced_writes(self) -> int:
+        return self.persister.coalesced_writes
+
+    def close(self):
+        self.persister.cancel()
+
+
+class JournalReminderStore(ReminderStore):
+    """
+    A json snapshot plus an append-only journal of changes, see ReminderJournal.
+    Compactions serialize and write the snapshot in a worker thread, changes are appended to the journal meanwhile.
+    """
+
+    def __init__(
+        self,
+        snapshot_path: Path,
+        journal_path: Path,
+        get_reminders: Callable[[], List[ReminderDict]],
+        compact_threshold: int = 1000,
+    ):
+        self.journal: ReminderJournal = ReminderJournal(snapshot_path, journal_path, compact_threshold)
+        self.get_reminders: Callable[[], List[ReminderDict]] = get_reminders
+        self._compaction: Optional[asyncio.Future] = None
+
+    def load(self, since: Optional[float] = None, until: Optional[float] = None) -> Iterable[ReminderDict]:
+        reminders = self.journal.load()
+        # Fold the replayed journal into a fresh snapshot, also creates the file if it did not exist
+        if self.journal.records_since_compaction or self.journal.stale or not self.journal.snapshot_path.is_file():
+            reminders = list(reminders)
+            self._start_compaction(reminders)
+        return reminders
+
+    def record(self, operation: str, reminder: ReminderDict):
+        self.record_many(operation, [reminder])
+
+    def record_many(self, operation: str, reminders: List[ReminderDict]):
+        self.journal.append_many(operation, reminders)
+        if self.journal.needs_compaction:
+            self._start_compaction()
+
+    def _start_compaction(self, reminders: Optional[List[ReminderDict]] = None) -> asyncio.Future:
+        """ Compact in the background, 'reminders' are all reminders if they are not in memory yet """
+        if self._compaction is None:
+            # The snapshot contains every change up to here, later ones stay in the journal
+            reminders = self.get_reminders() if reminders is None else reminders
+            self.journal.begin_compaction()
+            self._compaction = asyncio.ensure_future(self._compact(reminders))
+        return self._compaction
+
+    async def _compact(self, reminders: List[ReminderDict]):
+        try:
+            snapshot_hash: str = await asyncio.get_event_loop().run_in_executor(
+                None, self.journal.prepare_snapshot, reminders
+            )
+            self.journal.commit_snapshot(snapshot_hash)
+        except Exception:
+            # The journal still has every change, try again with the next record
+            self.journal.abort_compaction()
+            logger.exception(f"Failed to compact {self.journal.journal_path}")
+            self._compaction = None
+            return
+        self._compaction = None
+        # Enough records may have been appended while the snapshot was written
+        if self.journal.needs_compaction:
+            self._start_compaction()
+
+    async def flush(self):
+        # Every change is in the journal already, fold it into the snapshot so the next start is fast
+        if self._compaction is not None:
+            await self._compaction
+        if self.journal.records_since_compaction:
+            await self._start_compaction()
+
+    def close(self):
+        self.journal.close()
+
+
+class SqliteReminderStore(ReminderStore):
+    """
+    Reminders in a sqlite database, indexed by due time and by user.
+    Every change is one small transaction, which the write-ahead log (WAL) makes cheap.
+    Several bot processes can share the database, each one only loads the reminders of its own shards.
+    """
+
+    windowed = True
+    shared = True
+    columns = ["reminder_utc_timestamp", "guild_id", "channel_id", "user_id", "user_name", "message", "message_id"]
+
+    def __init__(self, path: Path, shard_ids: Optional[List[int]] = None, shard_count: int = 1):
+        self.path: Path = path
+        # Only reminders of guilds on these shards are loaded, None loads all
+        self.shard_ids: Optional[List[int]] = shard_ids
+        self.shard_count: int = shard_count
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection: sqlite3.Connection = sqlite3.connect(str(path))
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        # Durable on application crash, only a power loss may lose the last transactions
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS reminders (
+                reminder_utc_timestamp REAL NOT NULL,
+                guild_id INTEGER,
+                channel_id INTEGER,
+                user_id INTEGER,
+                user_name TEXT,
+                message TEXT,
+                message_id INTEGER
+            )
+            """
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS reminders_by_time ON reminders (reminder_utc_timestamp)"
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS reminders_by_user ON reminders (user_id, reminder_utc_timestamp)"
+        )
+        self.connection.commit()
+
+    def _rows_to_dicts(self, rows: Iterable[tuple]) -> List[ReminderDict]:
+        return [dict(zip(self.columns, row)) for row in rows]
+
+    def load(self, since: Optional[float] = None, until: Optional[float] = None) -> List[ReminderDict]:
+        query = f"SELECT {', '.join(self.columns)} FROM reminders WHERE reminder_utc_timestamp >= ?"
+        parameters = [since if since is not None else float("-inf")]
+        if until is not None:
+            query += " AND reminder_utc_timestamp < ?"
+            parameters.append(until)
+        if self.shard_ids is not None:
+            # Same as shard_for_guild(), direct messages have no guild and belong to shard 0
+            query += f" AND ((COALESCE(guild_id, 0) >> 22) % ?) IN ({', '.join('?' * len(self.shard_ids))})"
+            parameters += [self.shard_count, *self.shard_ids]
+        return self._rows_to_dicts(self.connection.execute(query, parameters))
+
+    def user_reminders(self, user_id: int) -> List[ReminderDict]:
+        query = f"SELECT {', '.join(self.columns)} FROM reminders WHERE user_id = ? ORDER BY reminder_utc_timestamp"
+        return self._rows_to_dicts(self.connection.execute(query, [user_id]))
+
+    def _insert(self, reminders: List[ReminderDict]):
+        self.connection.executemany(
+            f"INSERT INTO reminders ({', '.join(self.columns)}) VALUES ({', '.join('?' * len(self.columns))})",
+            [[reminder.get(column) for column in self.columns] for reminder in reminders],
+        )
+
+    def _delete(self, reminders: List[ReminderDict]):
+        # Interchangeable reminders have the same key, so deleting any one of them is fine
+        condition = " AND ".join(f"{column} IS ?" for column in REMINDER_KEY_FIELDS)
+        self.connection.executemany(
+            f"DELETE FROM reminders WHERE rowid = (SELECT rowid FROM reminders WHERE {condition} LIMIT 1)",
+            [list(reminder_key(reminder)) for reminder in reminders],
+        )
+
+    def record(self, operation: str, reminder: ReminderDict):
+        self.record_many(operation, [reminder])
+
+    def record_many(self, operation: str, reminders: List[ReminderDict]):
+        with self.connection:
+            if operation == "add":
+                self._insert(reminders)
+            else:
+                self._delete(reminders)
+
+    def fire_many(self, reminders: List[ReminderDict]) -> List[bool]:
+        condition = " AND ".join(f"{column} IS ?" for column in REMINDER_KEY_FIELDS)
+        query = f"DELETE FROM reminders WHERE rowid = (SELECT rowid FROM reminders WHERE {condition} LIMIT 1)"
+        with self.connection:
+            # One statement per reminder, so the amount of deleted rows tells which reminders were still there
+            return [self.connection.execute(query, list(reminder_key(reminder))).rowcount > 0 for reminder in reminders]
+
+    def count(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM reminders").fetchone()[0]
+
+    def __str__(self) -> str:
+        return str(self.path)
+
+    def close(self):
+        self.connection.close()
+
+
+class PartitionedReminderStore(ReminderStore):
+    """
+    Reminders split into one json file per due-time bucket of 'bucket_seconds'.
+    Loading a time range only reads the buckets that overlap it, so reminders set far into the future are not read
+    at startup. A small manifest remembers which buckets each user has reminders in.
+    """
+
+    windowed = True
+
+    def __init__(self, folder: Path, bucket_seconds: float = 6 * 3600):
+        self.folder: Path = folder
+        self.bucket_seconds: float = bucket_seconds
+        self.manifest_path: Path = folder / "users.json"
+        # Changes to the manifest since it was last written, one [user_id, bucket, added] line each
+        self.manifest_log_path: Path = folder / "users.log"
+        self.manifest_log_lines: int = 0
+        self._manifest_log: Optional[TextIO] = None
+        self.folder.mkdir(parents=True, exist_ok=True)
+        # Start times of all buckets that have a file, sorted ascending
+        self.buckets: List[int] = sorted(int(path.stem.split("_")[1]) for path in folder.glob("bucket_*.json"))
+        # User id -> start times of the buckets which contain reminders of that user
+        self.user_buckets: Dict[int, Set[int]] = {}
+        self._load_manifest()
+
+    def __str__(self) -> str:
+        return str(self.folder)
+
+    def _bucket_of(self, timestamp: float) -> int:
+        return int(timestamp // self.bucket_seconds * self.bucket_seconds)
+
+    def _bucket_path(self, bucket: int) -> Path:
+        return self.folder / f"bucket_{bucket}.json"
+
+    def _read_bucket(self, bucket: int) -> List[ReminderDict]:
+        path = self._bucket_path(bucket)
+        if not path.is_file():
+            return []
+        with open(path) as f:
+            return json.load(f)
+
+    def _write_bucket(self, bucket: int, reminders: List[ReminderDict]):
+        path = self._bucket_path(bucket)
+        index = bisect_left(self.buckets, bucket)
+        exists = index < len(self.buckets) and self.buckets[index] == bucket
+        if not reminders:
+            if exists:
+                path.unlink()
+                self.buckets.pop(index)
+            return
+        with atomic_write(path, overwrite=True) as f:
+            f.write(json.dumps(reminders))
+        if not exists:
+            self.buckets.insert(index, bucket)
+
+    def _load_manifest(self):
+        if self.manifest_path.is_file():
+            with open(self.manifest_path) as f:
+                self.user_buckets = {int(user_id): set(buckets) for user_id, buckets in json.load(f).items()}
+        if self.manifest_log_path.is_file():
+            # Replaying is idempotent, so a log that was already folded into users.json does no harm
+            torn: bool = False
+            with open(self.manifest_log_path) as f:
+                for line in f:
+                    try:
+                        user_id, bucket, added = json.loads(line)
+                    except ValueError:
+                        # Last line may be torn if the bot crashed during a write
+                        torn = True
+                        continue
+                    torn = torn or not line.endswith("\n")
+                    self._apply_manifest_change(user_id, bucket, added)
+                    self.manifest_log_lines += 1
+            if torn:
+                # Later changes would be appended to the torn line and lost with it
+                self._write_manifest()
+
+    def _apply_manifest_change(self, user_id: int, bucket: int, added: bool):
+        buckets = self.user_buckets.setdefault(user_id, set())
+        if added:
+            buckets.add(bucket)
+        else:
+            buckets.discard(bucket)
+        if not buckets:
+            self.user_buckets.pop(user_id)
+
+    def _log_manifest_changes(self, changes: List[Tuple[int, int, bool]]):
+        if self._manifest_log is None:
+            self._manifest_log = open(self.manifest_log_path, "a")
+        self._manifest_log.write("".join(f"{json.dumps(change)}\n" for change in changes))
+        self._manifest_log.flush()
+        self.manifest_log_lines += len(changes)
+        # Fold the log into users.json once it is longer than the manifest itself
+        if self.manifest_log_lines > max(1000, len(self.user_buckets)):
+            self._write_manifest()
+
+    def _write_manifest(self):
+        self.close()
+        manifest = {user_id: sorted(buckets) for user_id, buckets in self.user_buckets.items()}
+        with atomic_write(self.manifest_path, overwrite=True) as f:
+            f.write(json.dumps(manifest))
+        self.manifest_log_path.unlink()
+        self.manifest_log_lines = 0
+
+    def load(self, since: Optional[float] = None, until: Optional[float] = None) -> List[ReminderDict]:
+        # Overdue reminders from old buckets are loaded too when 'since' is not given
+        first_index = 0 if since is None else bisect_left(self.buckets, self._bucket_of(since))
+        reminders: List[ReminderDict] = []
+        for bucket in self.buckets[first_index:]:
+            if until is not None and bucket >= until:
+                break
+            for reminder in self._read_bucket(bucket):
+                timestamp = reminder["reminder_utc_timestamp"]
+                if (since is None or timestamp >= since) and (until is None or timestamp < until):
+                    reminders.append(reminder)
+        return reminders
+
+    def user_reminders(self, user_id: int) -> List[ReminderDict]:
+        reminders: List[ReminderDict] = []
+        for bucket in sorted(self.user_buckets.get(user_id, ())):
+            reminders.extend(reminder for reminder in self._read_bucket(bucket) if reminder["user_id"] == user_id)
+        reminders.sort(key=lambda reminder: reminder["reminder_utc_timestamp"])
+        return reminders
+
+    def record(self, operation: str, reminder: ReminderDict):
+        self.record_many(operation, [reminder])
+
+    def record_many(self, operation: str, reminders: List[ReminderDict]):
+        # Each affected bucket and the manifest are rewritten once per batch
+        reminders_by_bucket: Dict[int, List[ReminderDict]] = {}
+        for reminder in reminders:
+            reminders_by_bucket.setdefault(self._bucket_of(reminder["reminder_utc_timestamp"]), []).append(reminder)
+        manifest_changes: List[Tuple[int, int, bool]] = []
+        for bucket, changed_reminders in reminders_by_bucket.items():
+            bucket_reminders = self._read_bucket(bucket)
+            if operation == "add":
+                bucket_reminders.extend(changed_reminders)
+            else:
+                for reminder in changed_reminders:
+                    key = reminder_key(reminder)
+                    for index, bucket_reminder in enumerate(bucket_reminders):
+                        if reminder_key(bucket_reminder) == key:
+                            bucket_reminders.pop(index)
+                            break
+            self._write_bucket(bucket, bucket_reminders)
+
+            # Keep the manifest in sync for every user whose reminders changed in this bucket
+            remaining_users: Set[int] = {reminder["user_id"] for reminder in bucket_reminders}
+            for user_id in {reminder["user_id"] for reminder in changed_reminders}:
+                added: bool = user_id in remaining_users
+                if added != (bucket in self.user_buckets.get(user_id, ())):
+                    self._apply_manifest_change(user_id, bucket, added)
+                    manifest_changes.append((user_id, bucket, added))
+        if manifest_changes:
+            self._log_manifest_changes(manifest_changes)
+
+    def count(self) -> int:
+        return sum(len(self._read_bucket(bucket)) for bucket in self.buckets)
+
+    def close(self):
+        if self._manifest_log is not None:
+            self._manifest_log.close()
+            self._manifest_log = None
@@ -0,0 +1,112 @@
+"""
+Parsers for the time given to '!reminder' (e.g. '5d 3h 2m 1s text') and '!remindat' (e.g. '2021-04-20 04:20 text').
+
+The patterns are compiled once. The reminder text at the end is matched with '(.+)' in DOTALL mode,
+a single character repeat which runs to the end of the message without leaving a backtracking point per character,
+unlike the previous '((?:.|\n)+)'. The time part in front only has a fixed amount of alternatives,
+so matching is linear in the message length.
+The captured numbers are turned into the reminder time directly instead of formatting and re-parsing a date string.
+"""
+import re
+from datetime import timedelta
+from typing import Optional, Tuple
+
+import arrow
+
+# Longest message (time + reminder text) that will be parsed, the same as discord's message length limit with nitro
+MAX_MESSAGE_LENGTH = 4000
+# Highest value allowed for each of days, hours, minutes and seconds in '!reminder'
+MAX_TIME_SHIFT_VALUE = 1_000_000
+
+_DAYS_PATTERN = "(?:([0-9]+) ?(?:d|day|days))?"
+_HOURS_PATTERN = "(?:([0-9]+) ?(?:h|hour|hours))?"
+_MINUTES_PATTERN = "(?:([0-9]+) ?(?:m|min|mins|minute|minutes))?"
+_SECONDS_PATTERN = "(?:([0-9]+) ?(?:s|sec|secs|second|seconds))?"
+_DATE_PATTERN = r"(?:(?:(\d{4})-)?(\d{1,2})-(\d{1,2}))?"
+_TIME_PATTERN = r"(?:(\d{1,2}):(\d{1,2})(?::(\d{1,2}))?)?"
+_TEXT_PATTERN = "(.+)"
+_SPACE_PATTERN = " ?"
+
+TIME_SHIFT_REGEX = re.compile(
+    f"{_DAYS_PATTERN}{_SPACE_PATTERN}{_HOURS_PATTERN}{_SPACE_PATTERN}{_MINUTES_PATTERN}{_SPACE_PATTERN}{_SECONDS_PATTERN} {_TEXT_PATTERN}",
+    re.DOTALL,
+)
+DATE_AND_TIME_REGEX = re.compile(
+    f"{_DATE_PATTERN}{_SPACE_PATTERN}{_TIME_PATTERN}{_SPACE_PATTERN} {_TEXT_PATTERN}", re.DOTALL
+)
+
+
+def _to_int(digits: str) -> int:
+    """ Converts a string of digits, without running into the slow (or forbidden) conversion of huge numbers """
+    digits = digits.lstrip("0") or "0"
+    if len(digits) > len(str(MAX_TIME_SHIFT_VALUE)):
+        return MAX_TIME_SHIFT_VALUE + 1
+    return int(digits)
+
+
+def parse_time_shift(message: str, time_now: arrow.Arrow) -> Optional[Tuple[arrow.Arrow, str]]:
+    """ Parses '5d 3h 2m 1s remind me of this' into the time in 5 days, 3 hours, 2 minutes, 1 second and the text """
+    if len(message) > MAX_MESSAGE_LENGTH:
+        return None
+    result = TIME_SHIFT_REGEX.fullmatch(message)
+
+    # Pattern does not match
+    if result is None:
+        return None
+    day, hour, minute, second, reminder_message = result.groups("")
+
+    # Message is empty or just a new line character
+    if not reminder_message.strip():
+        return None
+
+    # At least one value must be given
+    if not (day or hour or minute or second):
+        return None
+
+    days, hours, minutes, seconds = [_to_int(value) if value else 0 for value in [day, hour, minute, second]]
+
+    # Do not do ridiculous reminders
+    if any(time > MAX_TIME_SHIFT_VALUE for time in [days, hours, minutes, seconds]):
+        return None
+
+    try:
+        future_reminder_time = time_now + timedelta(days=days, hours=hours, minutes=minutes, seconds=seconds)
+    # Date after year 9999 => error
+    except OverflowError:
+        return None
+    return future_reminder_time, reminder_message.strip()
+
+
+def parse_date_and_time(message: str, time_now: arrow.Arrow) -> Optional[Tuple[arrow.Arrow, str]]:
+    """ Parses '2021-04-20 04:20:00 remind me of this', where year, date, time and seconds are optional """
+    if len(message) > MAX_MESSAGE_LENGTH:
+        return None
+    result = DATE_AND_TIME_REGEX.fullmatch(message)
+
+    # Pattern does not match
+    if result is None:
+        return None
+    year, month, day, hour, minute, second, reminder_message = result.groups("")
+
+    # Message is empty or just a new line character
+    if not reminder_message.strip():
+        return None
+
+    # Could not retrieve a combination of month+day or hour+minute from the message
+    if not all([month, day]) and not all([hour, minute]):
+        return None
+
+    try:
+        future_reminder_time = arrow.Arrow(
+            # Set current year, month and day if they were not set in the message string
+            int(year) if year else time_now.year,
+            int(month) if month else time_now.month,
+            int(day) if day else time_now.day,
+            int(hour) if hour else 0,
+            int(minute) if minute else 0,
+            int(second) if second else 0,
+        )
+    except ValueError:
+        # Invalid date, e.g. 30th of february or hour 25
+        return None
+    return future_reminder_time, reminder_message.strip()
@@ -0,0 +1,27 @@
+from typing import List, Optional, Tuple
+
+import discord
+
+
+def shard_for_guild(guild_id: Optional[int], shard_count: int) -> int:
+    """ Discord's formula for the shard that receives the events of a guild, direct messages go to shard 0 """
+    if not guild_id:
+        return 0
+    return (guild_id >> 22) % shard_count
+
+
+def get_client_shards(client: discord.Client) -> Tuple[Optional[List[int]], int]:
+    """
+    Shard ids the client is connected to and the total amount of shards, None means all shards.
+    Works with AutoShardedClient (shard_ids) as well as with a client started with an explicit shard_id.
+    """
+    shard_count: int = getattr(client, "shard_count", None) or 1
+    if shard_count == 1:
+        return None, 1
+    shard_ids: Optional[List[int]] = getattr(client, "shard_ids", None)
+    if shard_ids is None and getattr(client, "shard_id", None) is not None:
+        shard_ids = [client.shard_id]
+    # A single process that is connected to all shards does not need to filter
+    if shard_ids is None or set(shard_ids) == set(range(shard_count)):
+        return None, shard_count
+    return sorted(shard_ids), shard_count
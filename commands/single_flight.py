@@ -0,0 +1,27 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent calls: while a call for a key is in flight, callers with the same key await its result
+    instead of starting their own call. Exceptions are raised in all callers. A caller that is cancelled does not
+    cancel the shared call for the others.
+    """
+
+    def __init__(self):
+        self.in_flight: Dict[Hashable, asyncio.Future] = {}
+        # Calls which were started, and calls which joined one that was already in flight
+        self.calls: int = 0
+        self.coalesced: int = 0
+
+    async def do(self, key: Hashable, function: Callable[[], Awaitable[Any]]) -> Any:
+        future: Optional[asyncio.Future] = self.in_flight.get(key)
+        if future is None:
+            self.calls += 1
+            future = asyncio.ensure_future(function())
+            self.in_flight[key] = future
+            future.add_done_callback(lambda _: self.in_flight.pop(key, None))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(future)
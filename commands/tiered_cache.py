@@ -0,0 +1,141 @@
+import asyncio
+import json
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from commands.metrics import LatencyHistogram
+from commands.persister import DebouncedPersister
+from commands.ttl_cache import TTLCache
+
+
+class TieredCache:
+    """
+    Cache for slow upstream apis with an in-memory LRU tier and an optional json file tier which survives restarts.
+    Entries are fresh for 'ttl' seconds. Up to 'stale_ttl' seconds they are still returned immediately,
+    but a refresh is started in the background (stale-while-revalidate). Values have to be json serializable.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 600,
+        stale_ttl: float = 86400,
+        max_size: int = 1000,
+        path: Optional[Path] = None,
+        disk_max_size: int = 10_000,
+        save_interval: float = 10,
+    ):
+        self.ttl: float = ttl
+        self.stale_ttl: float = max(ttl, stale_ttl)
+        # Key -> (fetch time, value), the fetch time is a unix timestamp so it stays valid across restarts
+        self.memory: TTLCache = TTLCache(max_size=max_size, ttl=self.stale_ttl)
+        self.path: Optional[Path] = path
+        self.disk_max_size: int = disk_max_size
+        # Key -> [fetch time, value] in the order they were fetched, loaded on first use
+        self._disk: Optional[Dict[str, list]] = None
+        self.persister: Optional[DebouncedPersister] = None
+        if path is not None:
+            self.persister = DebouncedPersister(path, lambda: dict(self._disk), interval=save_interval, indent=None)
+        # Keys which are refreshed in the background
+        self.refreshing: Dict[str, asyncio.Future] = {}
+        self.hits: int = 0
+        self.stale_hits: int = 0
+        self.disk_hits: int = 0
+        self.misses: int = 0
+        self.refresh_failures: int = 0
+        self.upstream_latency: LatencyHistogram = LatencyHistogram()
+
+    @property
+    def disk(self) -> Dict[str, list]:
+        if self._disk is None:
+            self._disk = {}
+            if self.path is not None and self.path.is_file():
+                try:
+                    self._disk = json.loads(self.path.read_text())
+                except ValueError:
+                    logger.exception(f"Ignoring corrupt cache file {self.path}")
+        return self._disk
+
+    def _lookup(self, key: str) -> Optional[Tuple[float, Any]]:
+        entry: Optional[Tuple[float, Any]] = self.memory.get(key)
+        if entry is None and self.path is not None:
+            disk_entry: Optional[list] = self.disk.get(key)
+            if disk_entry is not None and time.time() - disk_entry[0] < self.stale_ttl:
+                self.disk_hits += 1
+                entry = (disk_entry[0], disk_entry[1])
+                self.memory.set(key, entry)
+        if entry is not None and time.time() - entry[0] >= self.stale_ttl:
+            # Promoted from disk after a restart, the memory tier only knows when it was promoted
+            return None
+        return entry
+
+    def set(self, key: str, value: Any, fetched_at: Optional[float] = None):
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        self.memory.set(key, (fetched_at, value))
+        if self.persister is not None:
+            disk: Dict[str, list] = self.disk
+            # Re-insert so the dict stays ordered by fetch time, the oldest entries are dropped first
+            disk.pop(key, None)
+            disk[key] = [fetched_at, value]
+            while len(disk) > self.disk_max_size:
+                disk.pop(next(iter(disk)))
+            self.persister.mark_dirty()
+
+    async def get(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """ Returns the cached value of 'key', awaits fetch() if there is none, exceptions of fetch() are raised """
+        entry: Optional[Tuple[float, Any]] = self._lookup(key)
+        if entry is None:
+            self.misses += 1
+            return await self._fetch(key, fetch)
+        fetched_at, value = entry
+        if time.time() - fetched_at < self.ttl:
+            self.hits += 1
+        else:
+            self.stale_hits += 1
+            if key not in self.refreshing:
+                self.refreshing[key] = asyncio.ensure_future(self._refresh(key, fetch))
+        return value
+
+    async def _fetch(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        t0: float = time.perf_counter()
+        value: Any = await fetch()
+        self.upstream_latency.record(time.perf_counter() - t0)
+        self.set(key, value)
+        return value
+
+    async def _refresh(self, key: str, fetch: Callable[[], Awaitable[Any]]):
+        try:
+            await self._fetch(key, fetch)
+        except Exception as e:
+            # Keep serving the stale value until it expires
+            self.refresh_failures += 1
+            logger.warning(f"Failed to refresh cached '{key}': {e!r}")
+        finally:
+            self.refreshing.pop(key, None)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups: int = self.hits + self.stale_hits + self.misses
+        return (self.hits + self.stale_hits) / lookups if lookups else 0
+
+    @property
+    def latency_saved(self) -> float:
+        """ Estimated seconds of upstream latency which callers did not have to wait for """
+        return (self.hits + self.stale_hits) * self.upstream_latency.mean
+
+    def summary(self) -> str:
+        return (
+            f"{self.hit_rate:.0%} hit rate ({self.hits} fresh, {self.stale_hits} stale, {self.disk_hits} from disk, "
+            f"{self.misses} misses), saved {self.latency_saved:.1f}s of upstream latency, "
+            f"upstream {self.upstream_latency.summary()}"
+        )
+
+    async def close(self):
+        """ Waits for background refreshes and writes the disk tier """
+        refreshes: List[asyncio.Future] = list(self.refreshing.values())
+        if refreshes:
+            await asyncio.gather(*refreshes, return_exceptions=True)
+        if self.persister is not None:
+            await self.persister.flush()
@@ -0,0 +1,216 @@
+import time
+from heapq import heappush, heappop
+from itertools import chain
+from typing import List, Tuple, Iterable, Iterator, Optional, TYPE_CHECKING
+
+from commands.reminder_queue import to_epoch_ms
+
+if TYPE_CHECKING:
+    from commands.public_remind import Reminder
+
+
+class TimingWheelQueue:
+    """
+    Hierarchical timing wheel with the same interface as ReminderQueue.
+
+    Reminders are put into per-second slots of the lowest wheel, or into coarser slots of higher wheels if they are
+    further in the future. Each wheel has 2**SLOT_BITS slots, a slot of wheel n spans 2**(SLOT_BITS * n) seconds.
+    Pushing and cancelling is O(1). When the cursor reaches a slot of a higher wheel, its reminders are moved down
+    into the finer wheels (cascading), until they end up in 'ready', a small heap of the reminders that are due
+    within the current second, keyed by epoch milliseconds. Empty slots are skipped, so advancing over idle time
+    is cheap.
+    """
+
+    SLOT_BITS = 8
+    LEVELS = 5
+
+    def __init__(
+        self,
+        reminders: Iterable["Reminder"] = (),
+        compact_ratio: float = 0.5,
+        compact_minimum: int = 64,
+        time_now: Optional[float] = None,
+    ):
+        self.slot_count: int = 1 << self.SLOT_BITS
+        self.slot_mask: int = self.slot_count - 1
+        self.wheels: List[List[List["Reminder"]]] = [
+            [[] for _ in range(self.slot_count)] for _ in range(self.LEVELS)
+        ]
+        # Amount of entries in each wheel, so empty wheels are skipped
+        self.wheel_sizes: List[int] = [0] * self.LEVELS
+        # Reminders due within the current second or earlier
+        self.ready: List[Tuple[int, "Reminder"]] = []
+        # Reminders beyond the range of the highest wheel
+        self.far_future: List[Tuple[int, "Reminder"]] = []
+        # Current position of the wheels, in whole seconds
+        self.cursor: int = to_epoch_ms(time.time() if time_now is None else time_now) // 1000
+        # Amount of entries including cancelled ones, and amount of cancelled ones
+        self.size: int = 0
+        self.cancelled: int = 0
+        # Same compaction rule as ReminderQueue
+        self.compact_ratio: float = compact_ratio
+        self.compact_minimum: int = compact_minimum
+        # Cached result of peek() while no reminder is ready, only valid if '_earliest_known' is set
+        self._earliest: Optional["Reminder"] = None
+        self._earliest_known: bool = True
+        for reminder in reminders:
+            self.push(reminder)
+
+    def __len__(self) -> int:
+        return self.size - self.cancelled
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    def __iter__(self) -> Iterator["Reminder"]:
+        """ All reminders that are not cancelled, in no particular order """
+        entries = chain(
+            (reminder for _, reminder in self.ready),
+            (reminder for wheel in self.wheels for slot in wheel for reminder in slot),
+            (reminder for _, reminder in self.far_future),
+        )
+        return (reminder for reminder in entries if not reminder.cancelled)
+
+    def _place(self, reminder: "Reminder"):
+        """ Puts the reminder into the wheel and slot that matches its distance to the cursor """
+        due_ms: int = to_epoch_ms(reminder.reminder_utc_timestamp)
+        second: int = due_ms // 1000
+        cursor: int = self.cursor
+        if second <= cursor:
+            heappush(self.ready, (due_ms, reminder))
+            return
+        # The highest digit in which the due time differs from the cursor decides the wheel
+        level: int = ((second ^ cursor).bit_length() - 1) // self.SLOT_BITS
+        if level >= self.LEVELS:
+            heappush(self.far_future, (due_ms, reminder))
+            return
+        self.wheels[level][(second >> (self.SLOT_BITS * level)) & self.slot_mask].append(reminder)
+        self.wheel_sizes[level] += 1
+
+    def push(self, reminder: "Reminder"):
+        self.size += 1
+        self._place(reminder)
+        if self._earliest_known:
+            earliest: Optional["Reminder"] = self._earliest
+            # Compare the timestamps first, Reminder.__lt__ is only needed for ties
+            if (
+                earliest is None
+                or reminder.reminder_utc_timestamp < earliest.reminder_utc_timestamp
+                or (reminder.reminder_utc_timestamp == earliest.reminder_utc_timestamp and reminder < earliest)
+            ):
+                self._earliest = reminder
+
+    def _next_slot(self) -> Optional[Tuple[int, int, int]]:
+        """ Start time, wheel and index of the next slot after the cursor that has entries """
+        for level in range(self.LEVELS):
+            if not self.wheel_sizes[level]:
+                continue
+            shift: int = self.SLOT_BITS * level
+            slots = self.wheels[level]
+            for index in range(((self.cursor >> shift) & self.slot_mask) + 1, self.slot_count):
+                if slots[index]:
+                    block_start: int = (self.cursor >> (shift + self.SLOT_BITS)) << (shift + self.SLOT_BITS)
+                    return block_start + (index << shift), level, index
+        return None
+
+    def _advance_to(self, target: int):
+        """ Moves the cursor forward to 'target', all reminders due until then are moved into 'ready' """
+        while self.cursor < target:
+            next_slot = self._next_slot()
+            if next_slot is None or next_slot[0] > target:
+                self.cursor = target
+                break
+            self.cursor, level, index = next_slot
+            entries: List["Reminder"] = self.wheels[level][index]
+            self.wheels[level][index] = []
+            self.wheel_sizes[level] -= len(entries)
+            # Cascade into the finer wheels, relative to the new cursor
+            for reminder in entries:
+                if reminder.cancelled:
+                    self.size -= 1
+                    self.cancelled -= 1
+                else:
+                    self._place(reminder)
+        while self.far_future and (
+            ((self.far_future[0][0] // 1000) ^ self.cursor).bit_length() <= self.SLOT_BITS * self.LEVELS
+        ):
+            self._place(heappop(self.far_future)[1])
+        self._earliest_known = False
+
+    def advance(self, time_now: float):
+        """ Moves all reminders which are due at 'time_now' into 'ready' """
+        self._advance_to(to_epoch_ms(time_now) // 1000)
+
+    def _drop_cancelled(self, heap: List[Tuple[int, "Reminder"]]):
+        while heap and heap[0][1].cancelled:
+            heappop(heap)
+            self.size -= 1
+            self.cancelled -= 1
+
+    def _find_earliest(self) -> Optional["Reminder"]:
+        """ Earliest reminder in the wheels, only the first slot which has reminders is searched """
+        for level in range(self.LEVELS):
+            if not self.wheel_sizes[level]:
+                continue
+            shift: int = self.SLOT_BITS * level
+            slots = self.wheels[level]
+            for index in range(((self.cursor >> shift) & self.slot_mask) + 1, self.slot_count):
+                reminders = [reminder for reminder in slots[index] if not reminder.cancelled]
+                if reminders:
+                    return min(reminders)
+        self._drop_cancelled(self.far_future)
+        return self.far_future[0][1] if self.far_future else None
+
+    def peek(self) -> Optional["Reminder"]:
+        """ The earliest reminder that is not cancelled """
+        self._drop_cancelled(self.ready)
+        if self.ready:
+            return self.ready[0][1]
+        if not self._earliest_known:
+            self._earliest = self._find_earliest()
+            self._earliest_known = True
+        return self._earliest
+
+    def peek_due_ms(self) -> Optional[int]:
+        """ When the earliest reminder is due in epoch milliseconds """
+        self._drop_cancelled(self.ready)
+        if self.ready:
+            return self.ready[0][0]
+        earliest: Optional["Reminder"] = self.peek()
+        return to_epoch_ms(earliest.reminder_utc_timestamp) if earliest is not None else None
+
+    def pop(self) -> "Reminder":
+        earliest: Optional["Reminder"] = self.peek()
+        if earliest is None:
+            raise IndexError("pop from an empty queue")
+        if not self.ready:
+            self._advance_to(to_epoch_ms(earliest.reminder_utc_timestamp) // 1000)
+            self._drop_cancelled(self.ready)
+        self.size -= 1
+        self._earliest_known = False
+        return heappop(self.ready)[1]
+
+    def cancel(self, reminder: "Reminder") -> bool:
+        """ Returns False if the reminder was already cancelled """
+        if reminder.cancelled:
+            return False
+        reminder.cancelled = True
+        self.cancelled += 1
+        if reminder is self._earliest:
+            self._earliest_known = False
+        if self.cancelled > self.compact_minimum and self.cancelled > self.size * self.compact_ratio:
+            self.compact()
+        return True
+
+    def compact(self):
+        """ Remove all tombstones, O(n) """
+        reminders: List["Reminder"] = list(self)
+        self.wheels = [[[] for _ in range(self.slot_count)] for _ in range(self.LEVELS)]
+        self.wheel_sizes = [0] * self.LEVELS
+        self.ready = []
+        self.far_future = []
+        self.size = len(reminders)
+        self.cancelled = 0
+        for reminder in reminders:
+            self._place(reminder)
+        self._earliest_known = False
@@ -0,0 +1,44 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class TTLCache:
+    """ Least recently used cache where each entry expires 'ttl' seconds after it was set """
+
+    def __init__(self, max_size: int = 1000, ttl: float = 300):
+        self.max_size: int = max_size
+        self.ttl: float = ttl
+        # Key -> (expire time, value), the least recently used entry is first
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry: Optional[tuple] = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry: Optional[tuple] = self._entries.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups: int = self.hits + self.misses
+        return self.hits / lookups if lookups else 0
@@ -0,0 +1,54 @@
+import sys, os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from typing import Optional
+
+import pytest
+
+from commands.public_remind import Remind, Reminder
+
+
+@pytest.fixture
+def create_remind(tmp_path):
+    """
+    Creates a Remind which keeps all its files in the temporary folder of the test, calling it again is a restart.
+    The attributes are set before the reminders are loaded.
+    """
+
+    async def create(client=None, load: bool = True, **attributes) -> Remind:
+        r = Remind(client=client, data_folder=tmp_path)
+        for name, value in attributes.items():
+            assert hasattr(r, name), f"Remind has no attribute {name}"
+            setattr(r, name, value)
+        if load:
+            await r.load_reminders()
+            # Loading folds the journal into the snapshot in a worker thread, wait for it so the files are complete
+            compaction = getattr(r.store, "_compaction", None)
+            if compaction is not None:
+                await compaction
+        return r
+
+    return create
+
+
+@pytest.fixture
+def create_reminder():
+    def create(
+        timestamp: float,
+        user_id: int = 1,
+        channel_id: int = 3,
+        message_id: Optional[int] = None,
+        message: str = "test",
+    ) -> Reminder:
+        return Reminder(
+            reminder_utc_timestamp=timestamp,
+            user_id=user_id,
+            user_name=f"user{user_id}",
+            guild_id=2,
+            channel_id=channel_id,
+            message=message,
+            message_id=message_id,
+        )
+
+    return create
@@ -0,0 +1,92 @@
+"""
+Small stand-ins for the discord.py objects that the reminder commands use, so they can be tested without a gateway connection.
+Every REST call sleeps for 'latency' seconds to simulate the round-trip to discord.
+"""
+import asyncio
+from typing import List, Dict, Optional
+
+
+class FakeGuild:
+    def __init__(self, id: int):
+        self.id = id
+
+
+class FakeUser:
+    def __init__(self, id: int, name: str = "", latency: float = 0):
+        self.id = id
+        self.name = name or f"user{id}"
+        self.mention = f"<@{id}>"
+        self.latency = latency
+        self.sent: List[str] = []
+
+    async def send(self, content: str = "", **kwargs):
+        await asyncio.sleep(self.latency)
+        self.sent.append(content)
+
+
+class FakeMessage:
+    def __init__(self, id: int, channel: "FakeChannel"):
+        self.id = id
+        self.channel = channel
+        self.jump_url = f"https://discord.com/channels/{channel.guild.id}/{channel.id}/{id}"
+
+
+class FakeChannel:
+    def __init__(self, id: int, guild: FakeGuild, latency: float = 0):
+        self.id = id
+        self.guild = guild
+        self.latency = latency
+        self.sent: List[str] = []
+        # Amount of upcoming sends that fail, like a discord outage would
+        self.failing_sends: int = 0
+
+    async def send(self, content: str = "", **kwargs):
+        await asyncio.sleep(self.latency)
+        if self.failing_sends > 0:
+            self.failing_sends -= 1
+            raise ConnectionError("Discord is unavailable")
+        self.sent.append(content)
+
+    async def fetch_message(self, message_id: int) -> FakeMessage:
+        await asyncio.sleep(self.latency)
+        return FakeMessage(message_id, self)
+
+
+class FakeClient:
+    def __init__(self, latency: float = 0, shard_ids: Optional[List[int]] = None, shard_count: Optional[int] = None):
+        self.latency = latency
+        # Same attributes as an AutoShardedClient, a client that is not sharded has shard_count None
+        self.shard_ids = shard_ids
+        self.shard_count = shard_count
+        self.users: Dict[int, FakeUser] = {}
+        # Users that the gateway already knows about, e.g. because they share a guild with the bot
+        self.cached_users: Dict[int, FakeUser] = {}
+        self.channels: Dict[int, FakeChannel] = {}
+        self.rest_calls: int = 0
+
+    def add_user(self, id: int, name: str = "", cached: bool = False) -> FakeUser:
+        self.users[id] = FakeUser(id, name, latency=self.latency)
+        if cached:
+            self.cached_users[id] = self.users[id]
+        return self.users[id]
+
+    def add_channel(self, id: int, guild_id: int = 1) -> FakeChannel:
+        self.channels[id] = FakeChannel(id, FakeGuild(guild_id), latency=self.latency)
+        return self.channels[id]
+
+    def get_user(self, user_id: int) -> Optional[FakeUser]:
+        return self.cached_users.get(user_id)
+
+    async def fetch_user(self, user_id: int) -> FakeUser:
+        self.rest_calls += 1
+        await asyncio.sleep(self.latency)
+        # Raises KeyError for unknown users, like discord.NotFound would
+        return self.users[user_id]
+
+    def get_channel(self, channel_id: int) -> Optional[FakeChannel]:
+        return self.channels.get(channel_id)
+
+    async def fetch_channel(self, channel_id: int) -> FakeChannel:
+        self.rest_calls += 1
+        await asyncio.sleep(self.latency)
+        return self.channels[channel_id]
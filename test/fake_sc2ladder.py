@@ -0,0 +1,60 @@
+import asyncio
+from typing import Dict, List
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+PLAYER = {
+    "realm": "1",
+    "region": "EU",
+    "rank": "Grandmaster",
+    "username": "ToIsengard",
+    "bnet_id": "llllllllllll#2984",
+    "race": "Protoss",
+    "mmr": 6762,
+    "wins": 91,
+    "losses": 47,
+    "clan": "Zorr0",
+    "profile_id": 6836532,
+    "alias": "Harstem",
+}
+
+
+class FakeSc2Ladder:
+    """ Local server which answers like the sc2ladder player api, unknown queries find PLAYER and '/slow' takes 1s """
+
+    def __init__(self):
+        self.server: TestServer = None
+        # Query of each request to the player api
+        self.queries: List[str] = []
+        self.status: int = 200
+        # Query -> players found, and seconds to wait before answering
+        self.players: Dict[str, List[dict]] = {"nobody": []}
+        self.delay: float = 0
+
+    async def start(self) -> "FakeSc2Ladder":
+        app = web.Application()
+        app.router.add_get("/api/player", self.player)
+        app.router.add_get("/slow", self.slow)
+        self.server = TestServer(app)
+        await self.server.start_server()
+        return self
+
+    @property
+    def url(self) -> str:
+        return str(self.server.make_url("")).rstrip("/")
+
+    async def player(self, request: web.Request) -> web.Response:
+        query: str = request.query["query"]
+        self.queries.append(query)
+        await asyncio.sleep(self.delay)
+        if self.status != 200:
+            return web.Response(status=self.status)
+        return web.json_response(self.players.get(query, [PLAYER]))
+
+    async def slow(self, request: web.Request) -> web.Response:
+        await asyncio.sleep(1)
+        return web.json_response([])
+
+    async def close(self):
+        await self.server.close()
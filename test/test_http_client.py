@@ -0,0 +1,72 @@
+import sys, os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+import asyncio
+import time
+
+import aiohttp
+import pytest
+
+import commands.public_mmr
+from commands.http_client import HttpClient
+from commands.public_mmr import public_mmr
+from fake_discord import FakeUser
+from fake_sc2ladder import FakeSc2Ladder, PLAYER
+
+
+@pytest.mark.asyncio
+async def test_connections_are_reused():
+    sc2ladder = await FakeSc2Ladder().start()
+    http_client = HttpClient()
+    for _ in range(3):
+        async with http_client.get(f"{sc2ladder.url}/api/player?query=harstem") as response:
+            assert await response.json() == [PLAYER]
+    assert http_client.requests == 3
+    assert http_client.pool_misses == 1
+    assert http_client.pool_hits == 2
+    assert http_client.pool_hit_rate == 2 / 3
+
+    await http_client.close()
+    assert http_client._session is None
+    # Closing twice is fine, and the client can be used again afterwards with a new pool
+    await http_client.close()
+    async with http_client.get(f"{sc2ladder.url}/api/player?query=harstem") as response:
+        assert response.status == 200
+    assert http_client.pool_misses == 2
+    await http_client.close()
+    await sc2ladder.close()
+
+
+@pytest.mark.asyncio
+async def test_timeout_per_upstream():
+    sc2ladder = await FakeSc2Ladder().start()
+    http_client = HttpClient(timeouts={sc2ladder.server.host: aiohttp.ClientTimeout(total=0.1)})
+    assert http_client.timeout_for("https://www.sc2ladder.com/api/player") is http_client.default_timeout
+    t0 = time.perf_counter()
+    # aiohttp 3.7 wraps the timeout into a ClientOSError on python 3.11+, where TimeoutError is an OSError
+    with pytest.raises((asyncio.TimeoutError, aiohttp.ClientOSError)):
+        async with http_client.get(f"{sc2ladder.url}/slow"):
+            pass
+    assert time.perf_counter() - t0 < 0.5
+    await http_client.close()
+    await sc2ladder.close()
+
+
+@pytest.mark.asyncio
+async def test_public_mmr(monkeypatch):
+    sc2ladder = await FakeSc2Ladder().start()
+    monkeypatch.setattr(commands.public_mmr, "SC2LADDER_URL", sc2ladder.url)
+    http_client = HttpClient()
+    author = FakeUser(1)
+
+    result = await public_mmr(author, "harstem", http_client)
+    assert "1 results for harstem" in result
+    assert "ToIsengard" in result
+    assert await public_mmr(author, "nobody", http_client) == "No player found with name `nobody`"
+    # Both commands used the same pooled connection
+    assert http_client.pool_misses == 1
+    assert http_client.pool_hits == 1
+
+    await http_client.close()
+    await sc2ladder.close()
@@ -0,0 +1,127 @@
+import sys, os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+import json
+
+import pytest
+
+from commands.http_client import HttpClient
+from commands.ladder_index import LadderIndex, LadderSnapshot
+from commands.public_mmr import public_mmr
+from fake_discord import FakeUser
+from fake_sc2ladder import PLAYER
+
+
+def create_player(profile_id: int, username: str, mmr: int, clan: str = None, alias: str = None) -> dict:
+    return {
+        **PLAYER,
+        "profile_id": profile_id,
+        "username": username,
+        "bnet_id": f"{username}#{profile_id}",
+        "mmr": mmr,
+        "clan": clan,
+        "alias": alias,
+    }
+
+
+PLAYERS = [
+    create_player(1, "Harstem", 6700, clan="Zorr0", alias="Harstem"),
+    create_player(2, "HarstemFan", 4000),
+    create_player(3, "Serral", 7300, clan="ENCE"),
+    create_player(4, "Zest", 6500, alias="zest"),
+    create_player(5, "Maru", 7100),
+]
+
+
+def usernames(results):
+    return [result["username"] for result in results]
+
+
+def test_search():
+    index = LadderIndex(PLAYERS)
+    assert len(index) == 5
+    # Substrings of any field, ordered by mmr
+    assert usernames(index.search("harstem")) == ["Harstem", "HarstemFan"]
+    assert usernames(index.search("rste")) == ["Harstem", "HarstemFan"]
+    assert usernames(index.search("[zorr0]")) == ["Harstem"]
+    assert usernames(index.search("Serral#3")) == ["Serral"]
+    assert usernames(index.search("rral")) == ["Serral"]
+    # Short queries only match prefixes
+    assert usernames(index.search("ma")) == ["Maru"]
+    assert usernames(index.search("z")) == ["Harstem", "Zest"]
+    assert usernames(index.search("e")) == ["Serral"]
+    assert index.search("innovation") == []
+    assert index.search(" ") == []
+    assert usernames(index.search("s", limit=1)) == ["Serral"]
+
+
+def test_replace_remove_and_compact():
+    index = LadderIndex(PLAYERS, compact_minimum=1)
+    index.add(create_player(2, "HarstemFan", 7500))
+    assert usernames(index.search("harstem")) == ["HarstemFan", "Harstem"]
+    assert index.remove(1)
+    assert not index.remove(1)
+    assert usernames(index.search("harstem")) == ["HarstemFan"]
+    assert index.search("zorr0") == []
+    for profile_id in [3, 4]:
+        index.remove(profile_id)
+    # More than half of the records were tombstones
+    assert index.removed == 0
+    assert len(index.records) == 2
+    assert usernames(index.search("ha")) == ["HarstemFan"]
+    assert usernames(index.search("harstem")) == ["HarstemFan"]
+
+
+def write_lines(path, records, mode="a"):
+    with path.open(mode) as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+
+
+@pytest.mark.asyncio
+async def test_snapshot_refresh(tmp_path):
+    path = tmp_path / "ladder_snapshot.jsonl"
+    snapshot = LadderSnapshot(path)
+    # A missing snapshot leaves the index empty
+    await snapshot.refresh()
+    assert not snapshot.loaded and len(snapshot.index) == 0
+
+    write_lines(path, PLAYERS[:3])
+    await snapshot.refresh()
+    first_index = snapshot.index
+    assert snapshot.loaded and len(first_index) == 3
+
+    # Appended lines are applied to the same index, an incomplete last line waits for the next refresh
+    write_lines(path, [create_player(5, "Maru", 7100), {"profile_id": 2, "deleted": True}])
+    with path.open("a") as f:
+        f.write(json.dumps(PLAYERS[3])[:20])
+    await snapshot.refresh()
+    assert snapshot.index is first_index
+    assert sorted(snapshot.index.ids_by_profile) == [1, 3, 5]
+    with path.open("a") as f:
+        f.write(json.dumps(PLAYERS[3])[20:] + "\n")
+    await snapshot.refresh()
+    assert usernames(snapshot.index.search("zest")) == ["Zest"]
+
+    # A new snapshot file is loaded into a new index
+    new_path = tmp_path / "new_snapshot.jsonl"
+    write_lines(new_path, PLAYERS[4:], mode="w")
+    os.replace(new_path, path)
+    await snapshot.refresh()
+    assert snapshot.index is not first_index
+    assert sorted(snapshot.index.ids_by_profile) == [5]
+
+
+@pytest.mark.asyncio
+async def test_public_mmr_uses_index():
+    # Nothing listens on this port, the lookup only works because the index answers it
+    http_client = HttpClient()
+    index = LadderIndex(PLAYERS)
+    author = FakeUser(1)
+
+    result = await public_mmr(author, "harstem", http_client, index=index)
+    assert "2 results for harstem" in result
+    assert result.index("HarstemFan") > result.index("Harstem ")
+    assert http_client.requests == 0
+    await http_client.close()
@@ -0,0 +1,33 @@
+import sys, os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from commands.message_splitter import pack_lines, split_line, split_message, truncate_lines
+
+
+def test_lines_are_packed_into_few_messages():
+    assert split_message(["a" * 5, "b" * 5, "c" * 5], limit=11) == ["aaaaa\nbbbbb", "ccccc"]
+    assert split_message([], limit=10) == []
+
+
+def test_long_lines_are_split_at_spaces():
+    assert split_line("aaa bbb ccc", limit=7) == ["aaa bbb", "ccc"]
+    # A single word that is too long is split anywhere
+    assert split_line("a" * 25, limit=10) == ["a" * 10, "a" * 10, "a" * 5]
+    assert all(len(message) <= 10 for message in split_message(["word " * 30, "x" * 35], limit=10))
+
+
+def test_packed_messages_know_their_lines():
+    assert pack_lines(["a" * 5, "b" * 5, "c" * 5], limit=11) == [("aaaaa\nbbbbb", [0, 1]), ("ccccc", [2])]
+    # A line that is split belongs to every message it is in
+    assert pack_lines(["a", "b" * 15], limit=10) == [("a", [0]), ("b" * 10, [1]), ("b" * 5, [1])]
+
+
+def test_truncated_lines_summarize_the_rest():
+    assert truncate_lines(["a" * 5, "b" * 5, "c" * 5], limit=30) == "aaaaa\nbbbbb\nccccc"
+    assert truncate_lines(["a" * 5, "b" * 5, "c" * 5], limit=20) == "aaaaa\n... and 2 more"
+    assert truncate_lines(["x" * 50], limit=20) == "x" * 17 + "..."
+    assert truncate_lines(["x" * 50, "y"], limit=30) == "x" * 12 + "...\n... and 1 more"
+    assert truncate_lines([]) == ""
+    lines = [f"{i} " + "z" * 100 for i in range(100)]
+    assert len(truncate_lines(lines)) <= 2000
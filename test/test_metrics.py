@@ -0,0 +1,31 @@
+import sys, os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from commands.metrics import LatencyHistogram
+
+
+def test_percentiles_are_within_bucket_growth():
+    histogram = LatencyHistogram(resolution=0.001, growth=1.1)
+    # 0.01s to 10s
+    values = [i / 100 for i in range(1, 1001)]
+    for value in values:
+        histogram.record(value)
+    assert histogram.count == 1000
+    for percent, exact in [(50, 5), (95, 9.5), (99, 9.9)]:
+        assert exact <= histogram.percentile(percent) <= exact * 1.1
+    assert histogram.percentile(100) == histogram.max == 10
+    assert abs(histogram.mean - 5.005) < 1e-9
+    # A few buckets instead of one entry per value
+    assert len(histogram.buckets) < 100
+
+
+def test_small_and_negative_values_go_into_first_bucket():
+    histogram = LatencyHistogram(resolution=0.001)
+    assert histogram.percentile(50) == 0
+    histogram.record(-0.5)
+    histogram.record(0.0005)
+    assert histogram.buckets == {0: 2}
+    # Never more than the largest recorded value
+    assert histogram.percentile(99) == 0.0005
+    assert "2 values" in histogram.summary()
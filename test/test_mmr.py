@@ -2,9 +2,15 @@ import sys, os
 
 sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
 
+import time
+
 import pytest, arrow
 
-from commands.public_mmr import Sc2LadderResult
+import commands.public_mmr
+from commands.http_client import HttpClient
+from commands.public_mmr import Sc2LadderResult, public_mmr_batch
+from fake_discord import FakeUser
+from fake_sc2ladder import FakeSc2Ladder, PLAYER
 
 
 @pytest.mark.asyncio
@@ -30,3 +36,73 @@ async def test_parse_api_result():
     correct_result = ["EU P GM", "6762", "91-47", "ToIsengard", "Harstem"]
 
     assert result == correct_result
+
+
+def create_player(profile_id: int, username: str) -> dict:
+    return {**PLAYER, "profile_id": profile_id, "username": username, "alias": None, "mmr": 6000 + profile_id}
+
+
+@pytest.mark.asyncio
+async def test_batch_lookup(monkeypatch):
+    sc2ladder = await FakeSc2Ladder().start()
+    monkeypatch.setattr(commands.public_mmr, "SC2LADDER_URL", sc2ladder.url)
+    sc2ladder.delay = 0.2
+    sc2ladder.players.update(
+        {
+            "harstem": [create_player(1, "Harstem")],
+            "serral": [create_player(2, "Serral")],
+            # Found by name and by clan tag
+            "[zorr0]": [create_player(1, "Harstem"), create_player(3, "Zorr0Member")],
+        }
+    )
+    http_client = HttpClient()
+    author = FakeUser(1)
+
+    t0 = time.perf_counter()
+    messages = await public_mmr_batch(author, ["Harstem", "serral", "[zorr0]", "nobody", "HARSTEM"], http_client)
+    # The lookups ran at the same time
+    assert time.perf_counter() - t0 < 0.6
+    assert sorted(sc2ladder.queries) == ["[zorr0]", "harstem", "nobody", "serral"]
+    assert messages[0] == "No player found with name `nobody`"
+    table = messages[1]
+    assert table.startswith("```md\n3 results for Harstem, serral, [zorr0], nobody:\n")
+    assert table.endswith("```")
+    # De-duplicated by profile id
+    assert table.count("Harstem") == 2
+    assert "Serral" in table and "Zorr0Member" in table
+
+    await http_client.close()
+    await sc2ladder.close()
+
+
+@pytest.mark.asyncio
+async def test_batch_lookup_is_split(monkeypatch):
+    sc2ladder = await FakeSc2Ladder().start()
+    monkeypatch.setattr(commands.public_mmr, "SC2LADDER_URL", sc2ladder.url)
+    names = [f"player{i}" for i in range(10)]
+    for i, name in enumerate(names):
+        sc2ladder.players[name] = [create_player(i * 100 + j, f"{name}_{j}") for j in range(15)]
+    http_client = HttpClient()
+    author = FakeUser(1)
+
+    messages = await public_mmr_batch(author, names, http_client, limit=500)
+    assert len(messages) > 1
+    header = messages[0].split("\n")[2]
+    rows = []
+    for message in messages:
+        assert len(message) <= 500
+        assert message.startswith("```md\n") and message.endswith("```")
+        lines = message[len("```md\n") : -len("```")].split("\n")
+        if message is messages[0]:
+            assert lines[0].startswith("150 results for player0")
+            lines = lines[1:]
+        # Every message repeats the table header
+        assert lines[0] == header
+        rows.extend(lines[1:])
+    assert len(rows) == 150
+    assert await public_mmr_batch(author, names + ["maru"], http_client) == [
+        "Too many names, at most 10 can be looked up at once"
+    ]
+
+    await http_client.close()
+    await sc2ladder.close()
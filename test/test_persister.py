@@ -0,0 +1,93 @@
+import sys, os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+from commands.persister import DebouncedPersister
+from commands.public_remind import Remind
+from commands.public_vod import Vod
+
+
+@pytest.mark.asyncio
+async def test_burst_of_changes_is_written_once(tmp_path):
+    data = {"counter": 0}
+    persister = DebouncedPersister(tmp_path / "settings.json", lambda: dict(data), interval=0.05)
+    for i in range(10):
+        data["counter"] = i
+        persister.mark_dirty()
+    assert not (tmp_path / "settings.json").exists()
+
+    await asyncio.sleep(0.2)
+    assert json.loads((tmp_path / "settings.json").read_text()) == {"counter": 9}
+    assert persister.writes == 1
+    assert persister.coalesced_writes == 9
+
+
+@pytest.mark.asyncio
+async def test_flush_writes_immediately_in_worker_thread(tmp_path, monkeypatch):
+    persister = DebouncedPersister(tmp_path / "settings.json", lambda: [1, 2, 3], interval=3600)
+    write_threads = []
+    write = persister.write
+
+    def spy_write(data):
+        write_threads.append(threading.current_thread())
+        write(data)
+
+    monkeypatch.setattr(persister, "write", spy_write)
+    persister.mark_dirty()
+    await persister.flush()
+    assert json.loads((tmp_path / "settings.json").read_text()) == [1, 2, 3]
+    assert write_threads and write_threads[0] is not threading.main_thread()
+
+    # Nothing changed, so there is nothing to write
+    await persister.flush()
+    assert persister.writes == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_write_keeps_old_file(tmp_path):
+    path = tmp_path / "settings.json"
+    path.write_text("[]")
+    persister = DebouncedPersister(path, lambda: [object()], interval=3600)
+    persister.mark_dirty()
+    await persister.flush()
+    # Serializing failed, the previous file is untouched and the change is retried with the next flush
+    assert path.read_text() == "[]"
+    assert persister.dirty
+
+
+@pytest.mark.asyncio
+async def test_json_reminders_are_flushed_on_shutdown(tmp_path, create_remind, create_reminder):
+    r = await create_remind(reminder_storage="json", save_interval=3600)
+    for i in range(5):
+        await r._add_reminder(create_reminder(time.time() + 60 + i, message=str(i)))
+    assert json.loads((tmp_path / "reminders.json").read_text()) == []
+
+    await r.shutdown()
+    assert [reminder["message"] for reminder in json.loads((tmp_path / "reminders.json").read_text())] == [
+        str(i) for i in range(5)
+    ]
+    assert r.store.coalesced_writes == 4
+
+
+@pytest.mark.asyncio
+async def test_commands_share_the_settings_of_the_bot(tmp_path):
+    settings = {"servers": {"1": {"trigger": "!"}}}
+    persister = DebouncedPersister(tmp_path / "settings.json", lambda: dict(settings), interval=3600)
+    vod = Vod(settings=settings, settings_persister=persister)
+    r = Remind(client=None, settings=settings, settings_persister=persister)
+    assert vod.settings is settings and r.settings is settings
+
+    settings["servers"]["1"]["trigger"] = "?"
+    await vod.save_settings()
+    await persister.flush()
+    assert json.loads((tmp_path / "settings.json").read_text()) == {"servers": {"1": {"trigger": "?"}}}
+
+    # Without the bot's persister nothing is written
+    await Vod().save_settings()
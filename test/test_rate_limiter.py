@@ -0,0 +1,23 @@
+import sys, os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+import time
+
+import pytest
+
+from commands.rate_limiter import RateLimiter
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_allows_burst_then_paces():
+    rate_limiter = RateLimiter(rate=5, per=0.5)
+    t0 = time.perf_counter()
+    for _ in range(5):
+        await rate_limiter.acquire()
+    assert time.perf_counter() - t0 < 0.05
+
+    for _ in range(5):
+        await rate_limiter.acquire()
+    # One token every 0.1 seconds
+    assert 0.45 <= time.perf_counter() - t0 < 0.7
@@ -0,0 +1,479 @@
+import sys, os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+import asyncio
+import heapq
+import time
+
+import pytest
+import arrow
+import discord
+from loguru import logger
+
+from commands.public_remind import Reminder
+from fake_discord import FakeClient
+
+
+@pytest.mark.asyncio
+async def test_user_index_is_sorted_and_per_user(create_remind, create_reminder):
+    r = await create_remind()
+    for timestamp, user_id in [(5, 1), (3, 2), (1, 1), (4, 1)]:
+        await r._add_reminder(create_reminder(timestamp, user_id=user_id, message=str(timestamp)))
+
+    assert [reminder.message for reminder in await r._get_all_reminders_by_user_id(1)] == ["1", "4", "5"]
+    assert [reminder.message for reminder in await r._get_all_reminders_by_user_id(2)] == ["3"]
+    assert await r._get_all_reminders_by_user_id(3) == []
+
+    # Index survives a restart
+    r2 = await create_remind()
+    assert [reminder.message for reminder in await r2._get_all_reminders_by_user_id(1)] == ["1", "4", "5"]
+
+
+@pytest.mark.asyncio
+async def test_user_index_is_updated_on_delete_and_fire(create_remind, create_reminder):
+    client = FakeClient()
+    user = client.add_user(1)
+    channel = client.add_channel(3)
+    r = await create_remind(client)
+    now = arrow.utcnow().timestamp()
+    await r._add_reminder(create_reminder(now - 10, message="due"))
+    await r._add_reminder(create_reminder(now + 100, message="later"))
+    await r._add_reminder(create_reminder(now + 200, message="delete me"))
+
+    await r.public_del_remind(user, "3")
+    assert [reminder.message for reminder in await r._get_all_reminders_by_user_id(1)] == ["due", "later"]
+
+    await r.tick()
+    assert channel.sent == [f"{user.mention} You wanted to be reminded of: due"]
+    assert [reminder.message for reminder in await r._get_all_reminders_by_user_id(1)] == ["later"]
+
+
+@pytest.mark.asyncio
+async def test_reminder_limit(create_remind):
+    client = FakeClient()
+    user = client.add_user(1)
+    channel = client.add_channel(3)
+    r = await create_remind(client)
+    r.reminder_limit = 2
+    for _ in range(2):
+        assert isinstance(await r.public_remind_in(None, user, channel, "5m", "test"), str)
+    response = await r.public_remind_in(None, user, channel, "5m", "test")
+    assert response == "You already have 2 / 2 reminders, which is higher than the limit."
+    assert await r._get_reminder_count_by_user_id(1) == 2
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("reminder_scheduler", ["heap", "wheel"])
+async def test_scheduler_sleeps_until_earliest_reminder(create_remind, create_reminder, reminder_scheduler):
+    client = FakeClient()
+    client.add_user(1)
+    channel = client.add_channel(3)
+    r = await create_remind(client, reminder_scheduler=reminder_scheduler)
+    r.scheduler_max_sleep = 60
+    # Deliver each reminder exactly when it is due
+    r.coalesce_window = 0
+    scheduler = asyncio.ensure_future(r.run_scheduler())
+    try:
+        await asyncio.sleep(0.05)
+        # Scheduler is sleeping with an empty heap, adding a reminder re-arms the timer
+        await r._add_reminder(create_reminder(time.time() + 0.2, message="later"))
+        await r._add_reminder(create_reminder(time.time() + 0.1, message="earlier"))
+        await asyncio.sleep(0.15)
+        assert channel.sent == ["<@1> You wanted to be reminded of: earlier"]
+        await asyncio.sleep(0.15)
+        assert channel.sent[1:] == ["<@1> You wanted to be reminded of: later"]
+    finally:
+        scheduler.cancel()
+
+
+@pytest.mark.asyncio
+async def test_tick_delivers_concurrently_and_isolates_failures(create_remind, create_reminder):
+    client = FakeClient(latency=0.05)
+    channels = [client.add_channel(user_id) for user_id in range(20)]
+    for user_id in range(20):
+        client.add_user(user_id)
+    r = await create_remind(client)
+    r.delivery_concurrency = 10
+    r.tick_batch_size = 15
+    now = time.time()
+    for user_id in range(20):
+        await r._add_reminder(create_reminder(now - 1, user_id=user_id, channel_id=user_id, message=str(user_id)))
+    # Fetching this user fails, the other reminders are still delivered
+    await r._add_reminder(create_reminder(now - 2, user_id=404, channel_id=0))
+
+    t0 = time.perf_counter()
+    await r.tick()
+    # 21 reminders with 2 round-trips each would take 2.1 seconds one after another
+    assert time.perf_counter() - t0 < 1
+    assert [channel.sent for channel in channels] == [
+        [f"<@{user_id}> You wanted to be reminded of: {user_id}"] for user_id in range(20)
+    ]
+    assert not r.reminders
+
+
+@pytest.mark.asyncio
+async def test_delivery_uses_cached_users_and_builds_jump_url(create_remind, create_reminder):
+    client = FakeClient()
+    cached_user = client.add_user(1, cached=True)
+    other_user = client.add_user(2)
+    client.add_channel(3)
+    r = await create_remind(client)
+    now = time.time()
+    for user_id in [1, 2, 2]:
+        await r._add_reminder(create_reminder(now - 1, user_id=user_id, message_id=5, message="dm"))
+    r.delivery_concurrency = 1
+    await r.tick()
+
+    assert cached_user.sent == ["https://discord.com/channels/2/3/5\nYou wanted to be reminded of: dm"]
+    assert len(other_user.sent) == 2
+    # The uncached user was only fetched once
+    assert client.rest_calls == 1
+    assert r.delivered_reminders == 3
+    # One fetch and three sends
+    assert r.rest_calls == 4
+
+
+def test_reminder_is_compact_and_round_trips(create_reminder):
+    reminder = create_reminder(5, message="round trip")
+    assert not hasattr(reminder, "__dict__")
+    data = reminder.to_dict()
+    assert Reminder.from_dict(data).to_dict() == data
+    # Unknown keys from older or newer reminder files are ignored
+    assert Reminder.from_dict({**data, "unknown": 1}).to_dict() == data
+    assert Reminder.from_dict(data).user_name is reminder.user_name
+
+
+def test_reminders_due_at_the_same_time_keep_insertion_order(create_reminder):
+    reminders = [create_reminder(5, message=str(i)) for i in range(5)]
+    heap = []
+    for reminder in reversed(reminders):
+        heapq.heappush(heap, (reminder.reminder_utc_timestamp, reminder))
+    assert [heapq.heappop(heap)[1].message for _ in range(5)] == [str(i) for i in range(5)]
+
+
+@pytest.mark.asyncio
+async def test_reminders_in_the_same_channel_are_sent_together(create_remind, create_reminder):
+    client = FakeClient()
+    channel = client.add_channel(3)
+    other_channel = client.add_channel(4)
+    for user_id in range(5):
+        client.add_user(user_id)
+    r = await create_remind(client)
+    now = time.time()
+    for user_id in range(4):
+        await r._add_reminder(create_reminder(now - 1, user_id=user_id, message="scrim"))
+    await r._add_reminder(create_reminder(now - 1, user_id=4, message="practice"))
+    # Due a moment later, but within the coalesce window
+    await r._add_reminder(create_reminder(now + 0.5, user_id=4, message="scrim"))
+    await r._add_reminder(create_reminder(now - 1, user_id=0, channel_id=4, message="other channel"))
+    # Made with a bot command, so it is sent to the user with its own jump url
+    await r._add_reminder(create_reminder(now - 1, user_id=1, message_id=5, message="dm"))
+    await r.tick()
+
+    assert channel.sent == [
+        "<@0> <@1> <@2> <@3> <@4> You wanted to be reminded of: scrim\n<@4> You wanted to be reminded of: practice"
+    ]
+    assert other_channel.sent == ["<@0> You wanted to be reminded of: other channel"]
+    assert client.users[1].sent == ["https://discord.com/channels/2/3/5\nYou wanted to be reminded of: dm"]
+    assert r.delivered_reminders == 8
+    assert not r.reminders
+
+
+@pytest.mark.asyncio
+async def test_coalesced_reminders_are_split_at_message_limit(create_remind, create_reminder):
+    client = FakeClient()
+    channel = client.add_channel(3)
+    user_ids = range(10 ** 17, 10 ** 17 + 150)
+    for user_id in user_ids:
+        client.add_user(user_id)
+    r = await create_remind(client)
+    r.tick_batch_size = 1000
+    for user_id in user_ids:
+        await r._add_reminder(create_reminder(time.time() - 1, user_id=user_id, message="scrim"))
+    await r.tick()
+
+    assert len(channel.sent) > 1
+    assert all(len(content) <= 2000 for content in channel.sent)
+    assert all(content.endswith("You wanted to be reminded of: scrim") for content in channel.sent)
+    assert " ".join(channel.sent).count("<@") == 150
+    assert r.delivered_reminders == 150
+
+
+@pytest.mark.asyncio
+async def test_overdue_backlog_is_drained_paced_while_due_reminders_stay_on_time(create_remind, create_reminder):
+    client = FakeClient()
+    channels = [client.add_channel(channel_id) for channel_id in range(10)]
+    client.add_user(1)
+    r = await create_remind(client)
+    now = time.time()
+    # The bot was down for an hour
+    for channel_id in range(10):
+        await r._add_reminder(create_reminder(now - 3600 + channel_id, channel_id=channel_id, message=str(channel_id)))
+    await r.shutdown()
+
+    r = await create_remind(client)
+    assert len(r.backlog) == 10 and not r.reminders
+    # A burst of 5 messages, then one every 0.2 seconds
+    r.backlog_rate = 5
+    scheduler = asyncio.ensure_future(r.run_scheduler())
+    try:
+        await r._add_reminder(create_reminder(time.time() + 0.1, channel_id=9, message="on time"))
+        await asyncio.sleep(0.2)
+        assert "<@1> You wanted to be reminded of: on time" in channels[9].sent
+        # Oldest first, and not all at once
+        assert 0 < r.backlog_drained < 10
+        assert channels[0].sent == ["<@1> You wanted to be reminded of: 0"]
+        await asyncio.sleep(1)
+        assert r.backlog_drained == r.backlog_size == 10
+        assert 5 < r.backlog_drain_rate < 20
+        assert not r.backlog
+    finally:
+        scheduler.cancel()
+
+
+@pytest.mark.asyncio
+async def test_failing_backlog_batch_is_drained_again(create_remind, create_reminder, monkeypatch):
+    client = FakeClient()
+    channels = [client.add_channel(channel_id) for channel_id in range(3)]
+    client.add_user(1)
+    r = await create_remind(client)
+    for channel_id in range(3):
+        await r._add_reminder(create_reminder(time.time() - 3600, channel_id=channel_id, message=str(channel_id)))
+    await r.shutdown()
+
+    r = await create_remind(client)
+    assert len(r.backlog) == 3
+    r.tick_retry_interval = 0.01
+    fire_many = r.store.fire_many
+    failures = []
+
+    def fire_many_failing_once(reminders):
+        if not failures:
+            failures.append(reminders)
+            raise OSError("disk full")
+        return fire_many(reminders)
+
+    monkeypatch.setattr(r.store, "fire_many", fire_many_failing_once)
+    await r.drain_backlog()
+    assert failures
+    assert not r.backlog and not r.outbox.entries
+    assert [channel.sent for channel in channels] == [[f"<@1> You wanted to be reminded of: {i}"] for i in range(3)]
+
+
+@pytest.mark.asyncio
+async def test_scheduler_survives_failing_tick(create_remind, monkeypatch):
+    r = await create_remind(FakeClient())
+    r.scheduler_max_sleep = 0.01
+    ticks = []
+
+    async def failing_tick():
+        ticks.append(1)
+        raise RuntimeError("discord is down")
+
+    monkeypatch.setattr(r, "tick", failing_tick)
+    scheduler = asyncio.ensure_future(r.run_scheduler())
+    await asyncio.sleep(0.1)
+    assert not scheduler.done()
+    assert len(ticks) > 1
+    scheduler.cancel()
+
+
+@pytest.mark.asyncio
+async def test_scheduler_backs_off_after_failing_tick(create_remind, create_reminder, monkeypatch):
+    r = await create_remind(FakeClient())
+    r.tick_retry_interval = 0.05
+    await r._add_reminder(create_reminder(time.time() - 1))
+    ticks = []
+
+    def failing_load_next_window():
+        ticks.append(1)
+        raise RuntimeError("corrupt bucket")
+
+    monkeypatch.setattr(r, "_load_next_window", failing_load_next_window)
+    scheduler = asyncio.ensure_future(r.run_scheduler())
+    await asyncio.sleep(0.2)
+    scheduler.cancel()
+    # The due reminder does not make the scheduler retry in a busy loop
+    assert 1 < len(ticks) <= 6
+
+
+@pytest.mark.asyncio
+async def test_reminders_are_requeued_if_moving_them_to_the_outbox_fails(create_remind, create_reminder, monkeypatch):
+    client = FakeClient()
+    user = client.add_user(1)
+    channel = client.add_channel(3)
+    r = await create_remind(client)
+    await r._add_reminder(create_reminder(time.time() - 1, message="due"))
+    fire_many = r.store.fire_many
+
+    def failing_fire_many(reminders):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(r.store, "fire_many", failing_fire_many)
+    with pytest.raises(OSError):
+        await r.tick()
+    assert [reminder.message for reminder in r.reminders] == ["due"]
+    assert [reminder.message for reminder in await r._get_all_reminders_by_user_id(1)] == ["due"]
+    assert not r.outbox.entries
+
+    monkeypatch.setattr(r.store, "fire_many", fire_many)
+    await r.tick()
+    assert not r.reminders
+    assert r.delivered_reminders == 1
+
+
+@pytest.mark.asyncio
+async def test_shutdown_before_reminders_were_loaded(create_remind):
+    r = await create_remind(FakeClient(), load=False)
+    assert r.store is None
+    await r.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_tick_records_duration_fired_and_queue_size(create_remind, create_reminder):
+    client = FakeClient()
+    client.add_user(1)
+    client.add_channel(3)
+    r = await create_remind(client)
+    for timestamp in [time.time() - 1, time.time() - 1, time.time() + 3600]:
+        await r._add_reminder(create_reminder(timestamp))
+
+    await r.tick()
+    assert r.tick_count == 1
+    assert r.last_tick.fired == 2
+    assert r.last_tick.queue_size == 1
+    assert r.last_tick.duration_ms > 0
+    await r.tick()
+    assert r.tick_count == 2
+    assert r.last_tick.fired == 0
+
+
+@pytest.mark.asyncio
+async def test_lateness_is_recorded_per_delivery_path(create_remind, create_reminder):
+    client = FakeClient()
+    client.add_user(1)
+    client.add_user(2)
+    client.add_channel(3)
+    r = await create_remind(client)
+    await r._add_reminder(create_reminder(time.time() - 2, user_id=1))
+    await r._add_reminder(create_reminder(time.time() - 2, user_id=2))
+    await r._add_reminder(create_reminder(time.time() - 5, user_id=1, message_id=10))
+    r.lateness_summary_interval = 0
+    messages = []
+    handler_id = logger.add(messages.append, format="{message}")
+    try:
+        await r.tick()
+    finally:
+        logger.remove(handler_id)
+
+    assert r.delivery_lateness["channel"].count == 2
+    assert r.delivery_lateness["dm"].count == 1
+    assert 2 <= r.delivery_lateness["channel"].percentile(50) < 2.5
+    assert 5 <= r.delivery_lateness["dm"].max < 5.5
+    assert any("Delivery lateness via channel: 2 values" in message for message in messages)
+    assert any("Delivery lateness via dm: 1 values" in message for message in messages)
+
+
+@pytest.mark.asyncio
+async def test_bulk_delete_is_one_change(create_remind, create_reminder, monkeypatch):
+    client = FakeClient()
+    user = client.add_user(1)
+    r = await create_remind(client)
+    now = time.time()
+    await r._add_reminders([create_reminder(now + i * 100, message=str(i)) for i in range(1, 7)])
+    writes = []
+    monkeypatch.setattr(r.store, "record_many", lambda operation, reminders: writes.append((operation, len(reminders))))
+
+    embed = await r.public_del_remind(user, "1-2, 4")
+    assert embed.title == "Removed 3 of user1's reminders"
+    assert [reminder.message for reminder in await r._get_all_reminders_by_user_id(1)] == ["3", "5", "6"]
+    assert len(r.reminders) == 3
+    assert writes == [("delete", 3)]
+
+    # Any id that is too high rejects the whole command
+    assert (await r.public_del_remind(user, "1,50")).startswith("Invalid reminder id")
+    assert isinstance(await r.public_del_remind(user, "1-x"), discord.Embed)
+    assert len(r.reminders) == 3
+
+    await r.public_del_remind(user, "all")
+    assert await r._get_all_reminders_by_user_id(1) == []
+    assert not r.reminders
+    assert writes[-1] == ("delete", 3)
+
+
+@pytest.mark.asyncio
+async def test_bulk_responses_fit_into_one_message(create_remind):
+    client = FakeClient()
+    user = client.add_user(1)
+    channel = client.add_channel(3)
+    r = await create_remind(client)
+    r.reminder_limit = 50
+    text = "\n+ ".join(f"{i}m {i} " + "x" * 500 for i in range(1, 41))
+
+    response = await r.public_remind_in(None, user, channel, "", text)
+    assert len(response) <= 2000
+    assert response.endswith(" more")
+    assert await r._get_reminder_count_by_user_id(1) == 40
+
+    embed = await r.public_del_remind(user, "all")
+    assert embed.title == "Removed 40 of user1's reminders"
+    assert len(embed.description) <= 4096
+    assert embed.description.endswith(" more")
+
+
+@pytest.mark.asyncio
+async def test_bulk_create_adds_every_reminder_in_one_change(create_remind, monkeypatch):
+    client = FakeClient()
+    user = client.add_user(1)
+    channel = client.add_channel(3)
+    r = await create_remind(client)
+    r.reminder_limit = 3
+    writes = []
+    record_many = r.store.record_many
+
+    def counting_record_many(operation, reminders):
+        writes.append((operation, len(reminders)))
+        record_many(operation, reminders)
+
+    monkeypatch.setattr(r.store, "record_many", counting_record_many)
+
+    response = await r.public_remind_in(None, user, channel, "", "5m first\n\n+ 1h second")
+    assert response.splitlines() == [
+        "You will be reminded in 5 minutes of: first",
+        "You will be reminded in an hour of: second",
+    ]
+    assert [reminder.message for reminder in await r._get_all_reminders_by_user_id(1)] == ["first", "second"]
+    assert writes == [("add", 2)]
+
+    # One invalid line or going over the limit adds nothing
+    assert isinstance(await r.public_remind_in(None, user, channel, "", "5m third\n+not a time"), discord.Embed)
+    response = await r.public_remind_in(None, user, channel, "", "5m third\n+10m fourth")
+    assert response == "You already have 2 / 3 reminders, adding 2 more would be higher than the limit."
+    assert await r._get_reminder_count_by_user_id(1) == 2
+
+    # Survives a restart
+    await r.shutdown()
+    r2 = await create_remind(client)
+    assert [reminder.message for reminder in await r2._get_all_reminders_by_user_id(1)] == ["first", "second"]
+
+
+@pytest.mark.asyncio
+async def test_multi_line_reminder_text_is_one_reminder(create_remind):
+    client = FakeClient()
+    user = client.add_user(1)
+    channel = client.add_channel(3)
+    r = await create_remind(client)
+
+    response = await r.public_remind_in(None, user, channel, "5m", "buy milk\nand eggs")
+    assert response == "You will be reminded in 5 minutes of: buy milk and eggs"
+    # A line that looks like a time is still part of the text
+    response = await r.public_remind_in(None, user, channel, "5m", "practice\n2 hours of ladder")
+    assert response == "You will be reminded in 5 minutes of: practice 2 hours of ladder"
+    response = await r.public_remind_at(None, user, channel, "2099-04-20", "tournament\n04:20 check in")
+    assert response.endswith("of: tournament 04:20 check in")
+    assert [reminder.message for reminder in await r._get_all_reminders_by_user_id(1)] == [
+        "buy milk and eggs",
+        "practice 2 hours of ladder",
+        "tournament 04:20 check in",
+    ]
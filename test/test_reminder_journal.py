@@ -0,0 +1,202 @@
+import sys, os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+import json
+import threading
+
+import pytest
+
+from commands.reminder_journal import ReminderJournal, iter_json_array
+
+
+# The reminders in these tests are long overdue, keep them in the heap instead of the backlog
+NO_BACKLOG = {"backlog_grace": float("inf")}
+
+
+def test_journal_replays_records_on_top_of_snapshot(tmp_path, create_reminder):
+    journal = ReminderJournal(tmp_path / "reminders.json", tmp_path / "reminders.journal")
+    first, second = create_reminder(1, message="first").to_dict(), create_reminder(2, message="second").to_dict()
+    journal.compact([first])
+    journal.append("add", second)
+    journal.append("fire", first)
+    journal.close()
+
+    journal = ReminderJournal(tmp_path / "reminders.json", tmp_path / "reminders.journal")
+    assert journal.load() == [second]
+    assert journal.records_since_compaction == 2
+
+
+def test_journal_keeps_records_appended_after_torn_line(tmp_path, create_reminder):
+    journal = ReminderJournal(tmp_path / "reminders.json", tmp_path / "reminders.journal")
+    first, second = [create_reminder(timestamp).to_dict() for timestamp in [1, 2]]
+    journal.append("add", first)
+    journal.close()
+    with open(tmp_path / "reminders.journal", "a") as f:
+        f.write('{"op": "add", "remin')
+
+    assert journal.load() == [first]
+    journal.append("add", second)
+    journal.close()
+    assert journal.load() == [first, second]
+
+
+def test_journal_keeps_records_appended_during_compaction(tmp_path, create_reminder):
+    journal = ReminderJournal(tmp_path / "reminders.json", tmp_path / "reminders.journal")
+    first, second, third = [create_reminder(timestamp).to_dict() for timestamp in [1, 2, 3]]
+    journal.compact([])
+    journal.append("add", first)
+    journal.begin_compaction()
+    snapshot_hash = journal.prepare_snapshot([first])
+    # Appended while the snapshot is written in a worker thread
+    journal.append("add", second)
+    journal.commit_snapshot(snapshot_hash)
+    journal.append("add", third)
+    journal.close()
+
+    assert json.loads((tmp_path / "reminders.json").read_text()) == [first]
+    assert journal.load() == [first, second, third]
+    assert journal.records_since_compaction == 2
+
+
+def test_journal_replays_old_segment_after_crash_before_snapshot_was_replaced(tmp_path, create_reminder, monkeypatch):
+    journal = ReminderJournal(tmp_path / "reminders.json", tmp_path / "reminders.journal")
+    first, second = [create_reminder(timestamp).to_dict() for timestamp in [1, 2]]
+    journal.compact([])
+    journal.append("add", first)
+    journal.begin_compaction()
+    snapshot_hash = journal.prepare_snapshot([first])
+    journal.append("add", second)
+
+    def crash(*args):
+        raise OSError("crash")
+
+    monkeypatch.setattr(os, "replace", crash)
+    with pytest.raises(OSError):
+        journal.commit_snapshot(snapshot_hash)
+    monkeypatch.undo()
+    journal.close()
+
+    assert json.loads((tmp_path / "reminders.json").read_text()) == []
+    assert journal.load() == [first, second]
+
+
+def test_journal_ignores_torn_line(tmp_path, create_reminder):
+    journal = ReminderJournal(tmp_path / "reminders.json", tmp_path / "reminders.journal")
+    journal.append("add", create_reminder(1).to_dict())
+    journal.close()
+    with open(tmp_path / "reminders.journal", "a") as f:
+        f.write('{"op": "add", "remin')
+
+    assert len(journal.load()) == 1
+
+
+def test_journal_ignores_stale_journal_after_crash_during_compaction(tmp_path, create_reminder):
+    journal = ReminderJournal(tmp_path / "reminders.json", tmp_path / "reminders.journal")
+    reminder = create_reminder(1).to_dict()
+    journal.compact([])
+    journal.append("add", reminder)
+    journal.close()
+    # Crash after the new snapshot was written, but before the journal was reset
+    (tmp_path / "reminders.json").write_text(json.dumps([reminder], indent=2))
+
+    assert journal.load() == [reminder]
+
+
+def test_journal_keeps_records_appended_after_stale_journal(tmp_path, create_reminder):
+    journal = ReminderJournal(tmp_path / "reminders.json", tmp_path / "reminders.journal")
+    first, second = [create_reminder(timestamp).to_dict() for timestamp in [1, 2]]
+    journal.compact([])
+    journal.append("add", first)
+    journal.close()
+    (tmp_path / "reminders.json").write_text(json.dumps([first], indent=2))
+
+    assert journal.load() == [first]
+    assert journal.stale
+    journal.append("add", second)
+    journal.close()
+    assert journal.load() == [first, second]
+    assert not journal.stale
+
+
+@pytest.mark.asyncio
+async def test_remind_restores_reminders_from_journal(create_remind, create_reminder):
+    r = await create_remind(**NO_BACKLOG)
+    for timestamp in [3, 1, 2]:
+        await r._add_reminder(create_reminder(timestamp, message=str(timestamp)))
+    reminder_to_delete = r.reminders.peek()
+    r.reminders.cancel(reminder_to_delete)
+    await r._persist_many("delete", [reminder_to_delete])
+    # Only journal records were written, the snapshot is still empty
+    assert json.loads(r.reminder_file_path.read_text()) == []
+
+    r2 = await create_remind(**NO_BACKLOG)
+    assert sorted(reminder.message for reminder in r2.reminders) == ["2", "3"]
+    # Loading folded the journal into the snapshot
+    assert len(json.loads(r2.reminder_file_path.read_text())) == 2
+
+
+@pytest.mark.asyncio
+async def test_remind_folds_journal_at_startup_in_worker_thread(tmp_path, create_remind, create_reminder, monkeypatch):
+    journal = ReminderJournal(tmp_path / "reminders.json", tmp_path / "reminders.journal")
+    journal.append("add", create_reminder(1).to_dict())
+    journal.close()
+    threads = []
+    prepare_snapshot = ReminderJournal.prepare_snapshot
+
+    def spy_prepare_snapshot(journal, reminders):
+        threads.append(threading.current_thread())
+        return prepare_snapshot(journal, reminders)
+
+    monkeypatch.setattr(ReminderJournal, "prepare_snapshot", spy_prepare_snapshot)
+    r = await create_remind(**NO_BACKLOG)
+    assert threads and threads[0] is not threading.main_thread()
+    assert len(json.loads(r.reminder_file_path.read_text())) == 1
+
+
+@pytest.mark.asyncio
+async def test_remind_compacts_journal(create_remind, create_reminder):
+    r = await create_remind(**NO_BACKLOG, journal_compact_threshold=3)
+    for timestamp in range(3):
+        await r._add_reminder(create_reminder(timestamp))
+    # The snapshot is written in a worker thread
+    assert r.store._compaction is not None
+    await r.store._compaction
+    assert len(json.loads(r.reminder_file_path.read_text())) == 3
+    assert r.store.journal.records_since_compaction == 0
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1 << 16])
+def test_iter_json_array_across_chunks(tmp_path, create_reminder, chunk_size):
+    items = [create_reminder(i, message=f"message {i} with ], and {{").to_dict() for i in range(20)] + [12345, "x"]
+    path = tmp_path / "reminders.json"
+    path.write_text(json.dumps(items, indent=2))
+    with open(path) as f:
+        assert list(iter_json_array(f, chunk_size=chunk_size)) == items
+
+    path.write_text("[]")
+    with open(path) as f:
+        assert list(iter_json_array(f, chunk_size=chunk_size)) == []
+
+
+def test_iter_json_array_rejects_truncated_file(tmp_path, create_reminder):
+    path = tmp_path / "reminders.json"
+    path.write_text(json.dumps([create_reminder(1).to_dict(), create_reminder(2).to_dict()])[:-20])
+    with open(path) as f, pytest.raises(json.JSONDecodeError):
+        list(iter_json_array(f, chunk_size=16))
+
+
+@pytest.mark.asyncio
+async def test_remind_resets_stale_journal(tmp_path, create_remind, create_reminder):
+    r = await create_remind(**NO_BACKLOG)
+    await r._add_reminder(create_reminder(1, message="before crash"))
+    r.store.close()
+    # Crash after the new snapshot was written, but before the journal was reset
+    (tmp_path / "reminders.json").write_text(json.dumps([create_reminder(1, message="before crash").to_dict()]))
+
+    r = await create_remind(**NO_BACKLOG)
+    await r._add_reminder(create_reminder(2, message="after restart"))
+    r.store.close()
+
+    r = await create_remind(**NO_BACKLOG)
+    assert sorted(reminder.message for reminder in r.reminders) == ["after restart", "before crash"]
@@ -0,0 +1,144 @@
+import sys, os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+import asyncio
+import json
+import time
+
+import pytest
+
+from commands.public_remind import Reminder
+from commands.reminder_outbox import ReminderOutbox
+from fake_discord import FakeClient
+
+
+def create_outbox(tmp_path) -> ReminderOutbox:
+    outbox = ReminderOutbox(
+        tmp_path / "reminders.outbox", tmp_path / "reminders_dead_letter.jsonl", Reminder.from_dict, max_attempts=2
+    )
+    outbox.load()
+    return outbox
+
+
+def test_outbox_replays_its_log(tmp_path, create_reminder):
+    outbox = create_outbox(tmp_path)
+    delivered, failed, pending = outbox.add([create_reminder(i, message=str(i)) for i in range(3)])
+    outbox.ack([delivered])
+    assert not outbox.fail(failed, "timeout")
+    outbox.close()
+
+    outbox = create_outbox(tmp_path)
+    assert [entry.reminder.message for entry in outbox.entries.values()] == ["1", "2"]
+    assert outbox.entries[failed.id].attempts == 1
+    assert outbox.entries[failed.id].last_error == "timeout"
+    # Entries that were in flight during the crash are due again right away
+    assert [entry.reminder.message for entry in outbox.take_due(10)] == ["2"]
+
+    # Second failure moves the reminder to the dead letter file
+    assert outbox.fail(outbox.entries[failed.id], "timeout")
+    dead_letters = [json.loads(line) for line in (tmp_path / "reminders_dead_letter.jsonl").read_text().splitlines()]
+    assert [dead_letter["reminder"]["message"] for dead_letter in dead_letters] == ["1"]
+    assert dead_letters[0]["attempts"] == 2
+    outbox.close()
+
+
+@pytest.mark.asyncio
+async def test_failed_delivery_is_retried_until_it_succeeds(create_remind, create_reminder):
+    client = FakeClient()
+    client.add_user(1)
+    channel = client.add_channel(3)
+    channel.failing_sends = 2
+    r = await create_remind(client, delivery_retry_delay=0.05)
+    await r._add_reminder(create_reminder(time.time() - 1, message="retry me"))
+
+    await r.tick()
+    assert channel.sent == [] and len(r.outbox) == 1
+    # Backoff doubles: 0.05 seconds, then 0.1 seconds
+    for _ in range(20):
+        await asyncio.sleep(0.02)
+        await r.tick()
+    assert channel.sent == ["<@1> You wanted to be reminded of: retry me"]
+    assert len(r.outbox) == 0
+
+    # Nothing is delivered twice after a restart
+    await r.shutdown()
+    r = await create_remind(client, delivery_retry_delay=0.05)
+    await r.tick()
+    assert len(channel.sent) == 1
+
+
+@pytest.mark.asyncio
+async def test_delivery_gives_up_after_max_attempts(tmp_path, create_remind, create_reminder):
+    client = FakeClient()
+    client.add_user(1)
+    channel = client.add_channel(3)
+    channel.failing_sends = 100
+    r = await create_remind(client, delivery_retry_delay=0.05)
+    r.outbox.max_attempts = 3
+    await r._add_reminder(create_reminder(time.time() - 1, message="undeliverable"))
+    for _ in range(30):
+        await r.tick()
+        await asyncio.sleep(0.02)
+    assert len(r.outbox) == 0
+    dead_letters = (tmp_path / "reminders_dead_letter.jsonl").read_text().splitlines()
+    assert len(dead_letters) == 1
+    assert json.loads(dead_letters[0])["error"] == "ConnectionError('Discord is unavailable')"
+
+
+@pytest.mark.asyncio
+async def test_reminders_in_outbox_survive_crash(create_remind, create_reminder):
+    client = FakeClient()
+    client.add_user(1)
+    channel = client.add_channel(3)
+    r = await create_remind(client, delivery_retry_delay=0.05)
+    await r._add_reminder(create_reminder(time.time() - 1, message="moved"))
+    await r._add_reminder(create_reminder(time.time() - 1, message="not removed from store"))
+    # Crash right before sending
+    r._move_to_outbox([r.reminders.pop()])
+    # Crash after writing to the outbox, but before the reminder was removed from the store
+    r.outbox.add([r.reminders.pop()])
+    r.store.close()
+    r.outbox.close()
+
+    r = await create_remind(client, delivery_retry_delay=0.05)
+    assert not r.reminders
+    await r.tick()
+    assert channel.sent == [
+        "<@1> You wanted to be reminded of: moved\n<@1> You wanted to be reminded of: not removed from store"
+    ]
+
+
+@pytest.mark.asyncio
+async def test_partially_sent_channel_delivery_only_retries_unsent_messages(create_remind, create_reminder):
+    client = FakeClient()
+    channel = client.add_channel(3)
+    user_ids = range(10 ** 17, 10 ** 17 + 60)
+    for user_id in user_ids:
+        client.add_user(user_id)
+    r = await create_remind(client, delivery_retry_delay=0.05)
+    for user_id in user_ids:
+        await r._add_reminder(create_reminder(time.time() - 1, user_id=user_id, message=f"task of {user_id}"))
+
+    # Only the second of the messages to the channel fails
+    send = channel.send
+    sends = []
+
+    async def send_failing_second(content: str = "", **kwargs):
+        sends.append(content)
+        if len(sends) == 2:
+            raise ConnectionError("Discord is unavailable")
+        await send(content, **kwargs)
+
+    channel.send = send_failing_second
+    await r.tick()
+    assert len(sends) > 2
+    assert 0 < len(r.outbox) < 60
+    for _ in range(10):
+        await asyncio.sleep(0.06)
+        await r.tick()
+    assert len(r.outbox) == 0
+    mentions = " ".join(channel.sent)
+    assert mentions.count("<@") == 60
+    assert all(mentions.count(f"<@{user_id}>") == 1 for user_id in user_ids)
+    assert r.delivered_reminders == 60
@@ -0,0 +1,45 @@
+import sys, os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from commands.public_remind import Reminder
+from commands.reminder_queue import ReminderQueue
+
+
+def test_cancelled_reminders_are_skipped():
+    reminders = [Reminder(reminder_utc_timestamp=timestamp, message=str(timestamp)) for timestamp in [3, 1, 2]]
+    queue = ReminderQueue(reminders)
+    assert queue.peek().message == "1"
+
+    assert queue.cancel(reminders[1])
+    # Cancelling twice does nothing
+    assert not queue.cancel(reminders[1])
+    assert len(queue) == 2
+    assert sorted(reminder.message for reminder in queue) == ["2", "3"]
+    assert queue.peek().message == "2"
+    assert [queue.pop().message, queue.pop().message] == ["2", "3"]
+    assert not queue
+    assert queue.peek() is None
+
+
+def test_queue_compacts_when_tombstones_pass_threshold():
+    reminders = [Reminder(reminder_utc_timestamp=timestamp) for timestamp in range(100)]
+    queue = ReminderQueue(reminders, compact_ratio=0.5, compact_minimum=10)
+    for reminder in reminders[50:60]:
+        queue.cancel(reminder)
+    # Not enough tombstones yet
+    assert len(queue.heap) == 100
+    for reminder in reminders[40:50] + reminders[60:100]:
+        queue.cancel(reminder)
+    assert len(queue.heap) < 100
+    assert len(queue) == 40
+    assert [queue.pop().reminder_utc_timestamp for _ in range(40)] == list(range(40))
+
+
+def test_queue_is_keyed_by_epoch_milliseconds():
+    reminders = [Reminder(reminder_utc_timestamp=timestamp) for timestamp in [1.5, 1.0005, 2]]
+    queue = ReminderQueue(reminders)
+    assert queue.peek_due_ms() == 1000
+    queue.cancel(reminders[1])
+    assert queue.peek_due_ms() == 1500
+    assert ReminderQueue().peek_due_ms() is None
@@ -0,0 +1,127 @@
+import sys, os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+import json
+import time
+
+import pytest
+
+from commands.reminder_store import PartitionedReminderStore
+from fake_discord import FakeClient
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("storage", ["sqlite", "partitioned"])
+async def test_windowed_keeps_only_near_term_reminders_in_memory(create_remind, create_reminder, storage):
+    r = await create_remind(reminder_storage=storage, memory_window=3600)
+    now = time.time()
+    await r._add_reminder(create_reminder(now + 10_000_000, message="far"))
+    await r._add_reminder(create_reminder(now + 60, message="near"))
+    await r._add_reminder(create_reminder(now + 120, user_id=2, message="other user"))
+
+    assert sorted(reminder.message for reminder in r.reminders) == ["near", "other user"]
+    assert [reminder.message for reminder in await r._get_all_reminders_by_user_id(1)] == ["near", "far"]
+    assert await r._get_reminder_count_by_user_id(1) == 2
+
+    # Delete the far reminder which is not in memory, then the near one which is
+    user = FakeClient().add_user(1)
+    await r.public_del_remind(user, "2")
+    await r.public_del_remind(user, "1")
+    assert await r._get_all_reminders_by_user_id(1) == []
+    assert [reminder.message for reminder in r.reminders] == ["other user"]
+
+    r2 = await create_remind(reminder_storage=storage, memory_window=3600)
+    assert [reminder.message for reminder in r2.reminders] == ["other user"]
+    r.store.close()
+    r2.store.close()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("storage", ["sqlite", "partitioned"])
+async def test_windowed_promotes_reminders_into_memory(create_remind, create_reminder, storage):
+    r = await create_remind(reminder_storage=storage, memory_window=3600)
+    # Pretend that most of the loaded window has passed
+    r.loaded_until = time.time() + 1
+    await r._add_reminder(create_reminder(time.time() + 60))
+    assert not r.reminders
+
+    r._load_next_window()
+    assert len(r.reminders) == 1
+    assert r.loaded_until > time.time() + 3000
+    r.store.close()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("storage", ["sqlite", "partitioned"])
+async def test_windowed_fired_reminders_are_removed(create_remind, create_reminder, storage):
+    client = FakeClient()
+    client.add_user(1)
+    channel = client.add_channel(3)
+    r = await create_remind(client, reminder_storage=storage, memory_window=3600)
+    await r._add_reminder(create_reminder(time.time() - 1, message="due"))
+    await r.tick()
+    assert channel.sent == ["<@1> You wanted to be reminded of: due"]
+    assert r.store.count() == 0
+    r.store.close()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("storage", ["sqlite", "partitioned"])
+async def test_windowed_migrates_json_reminders(tmp_path, create_remind, create_reminder, storage):
+    reminders = [create_reminder(time.time() + i, message=str(i)).to_dict() for i in range(3)]
+    (tmp_path / "reminders.json").write_text(json.dumps(reminders[:2]))
+    (tmp_path / "reminders.journal").write_text(json.dumps({"op": "add", "reminder": reminders[2]}) + "\n")
+
+    r = await create_remind(reminder_storage=storage, memory_window=3600)
+    assert sorted(reminder.message for reminder in r.reminders) == ["0", "1", "2"]
+    assert not (tmp_path / "reminders.json").exists()
+    assert (tmp_path / "reminders.json.migrated").exists()
+    r.store.close()
+
+    # Migration only happens once
+    r = await create_remind(reminder_storage=storage, memory_window=3600)
+    assert r.store.count() == 3
+    r.store.close()
+
+
+@pytest.mark.asyncio
+async def test_partitioned_startup_only_reads_near_buckets(create_remind, create_reminder, monkeypatch):
+    r = await create_remind(reminder_storage="partitioned", memory_window=3600)
+    now = time.time()
+    await r._add_reminder(create_reminder(now - 3600 * 24, message="overdue"))
+    await r._add_reminder(create_reminder(now + 60, message="near"))
+    for day in range(1, 101):
+        await r._add_reminder(create_reminder(now + day * 24 * 3600, user_id=day, message="far"))
+    assert len(r.store.buckets) == 102
+
+    read_buckets = []
+    read_bucket = PartitionedReminderStore._read_bucket
+
+    def spy_read_bucket(store, bucket):
+        read_buckets.append(bucket)
+        return read_bucket(store, bucket)
+
+    monkeypatch.setattr(PartitionedReminderStore, "_read_bucket", spy_read_bucket)
+    r2 = await create_remind(reminder_storage="partitioned", memory_window=3600)
+    assert [reminder.message for reminder in r2.reminders] == ["near"]
+    assert [reminder.message for reminder in r2.backlog] == ["overdue"]
+    # The overdue bucket, the current bucket and the next one
+    assert len(read_buckets) <= 3
+    assert [reminder.message for reminder in await r2._get_all_reminders_by_user_id(50)] == ["far"]
+
+
+def test_partitioned_manifest_keeps_changes_after_torn_line(tmp_path, create_reminder):
+    store = PartitionedReminderStore(tmp_path / "reminders")
+    store.record("add", create_reminder(time.time() + 60, user_id=1).to_dict())
+    store.close()
+    with open(store.manifest_log_path, "a") as f:
+        f.write("[2, 1")
+
+    store = PartitionedReminderStore(tmp_path / "reminders")
+    store.record("add", create_reminder(time.time() + 7 * 24 * 3600, user_id=2).to_dict())
+    store.close()
+    store = PartitionedReminderStore(tmp_path / "reminders")
+    assert set(store.user_buckets) == {1, 2}
+    assert len(store.user_reminders(2)) == 1
+    store.close()
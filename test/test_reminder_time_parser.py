@@ -0,0 +1,67 @@
+import sys, os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+import time
+
+import pytest
+import arrow
+
+from commands.reminder_time_parser import parse_date_and_time, parse_time_shift, MAX_MESSAGE_LENGTH
+
+TIME_NOW = arrow.Arrow(2021, 4, 1, 12, 0, 0)
+
+
+@pytest.mark.parametrize(
+    "message, expected_time",
+    [
+        ("2021-04-20 04:20:00 remind me of this", arrow.Arrow(2021, 4, 20, 4, 20, 0)),
+        ("2021-04-20 04:20 remind me of this", arrow.Arrow(2021, 4, 20, 4, 20)),
+        ("04-20 04:20:00 remind me of this", arrow.Arrow(2021, 4, 20, 4, 20)),
+        ("04-20 04:20 remind me of this", arrow.Arrow(2021, 4, 20, 4, 20)),
+        ("2021-04-20 remind me of this", arrow.Arrow(2021, 4, 20)),
+        ("04-20 remind me of this", arrow.Arrow(2021, 4, 20)),
+        ("04:20:05 remind me of this", arrow.Arrow(2021, 4, 1, 4, 20, 5)),
+        ("4:20 remind me of this", arrow.Arrow(2021, 4, 1, 4, 20)),
+    ],
+)
+def test_parse_date_and_time_examples(message, expected_time):
+    assert parse_date_and_time(message, TIME_NOW) == (expected_time, "remind me of this")
+
+
+@pytest.mark.parametrize(
+    "message, expected_shift",
+    [
+        ("5d 3h 2m 1s remind me of this", {"days": 5, "hours": 3, "minutes": 2, "seconds": 1}),
+        ("1day 1hour 1min 1second remind me of this", {"days": 1, "hours": 1, "minutes": 1, "seconds": 1}),
+        ("5 days 420seconds remind me of this", {"days": 5, "seconds": 420}),
+        ("0005m remind me of this", {"minutes": 5}),
+    ],
+)
+def test_parse_time_shift_examples(message, expected_shift):
+    assert parse_time_shift(message, TIME_NOW) == (TIME_NOW.shift(**expected_shift), "remind me of this")
+
+
+@pytest.mark.parametrize("message", ["02-30 text", "25:00 text", "12:00", "12:00 ", "text", "1:2:3:4 text"])
+def test_parse_date_and_time_invalid(message):
+    assert parse_date_and_time(message, TIME_NOW) is None
+
+
+@pytest.mark.parametrize("message", ["5d", "5d \n", "text", "3s", "1000001d text", "9" * 5000 + "d text"])
+def test_parse_time_shift_invalid(message):
+    assert parse_time_shift(message, TIME_NOW) is None
+
+
+def test_messages_longer_than_limit_are_rejected():
+    message = "5m " + "a" * MAX_MESSAGE_LENGTH
+    assert parse_time_shift(message, TIME_NOW) is None
+    assert parse_time_shift(message[:MAX_MESSAGE_LENGTH], TIME_NOW) is not None
+
+
+def test_parsing_pathological_message_is_fast():
+    messages = ["1" * MAX_MESSAGE_LENGTH, "1 " * (MAX_MESSAGE_LENGTH // 2), "1-" * (MAX_MESSAGE_LENGTH // 2)]
+    t0 = time.perf_counter()
+    for message in messages:
+        parse_time_shift(message, TIME_NOW)
+        parse_date_and_time(message, TIME_NOW)
+    assert time.perf_counter() - t0 < 0.5
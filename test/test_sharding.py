@@ -0,0 +1,148 @@
+import sys, os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+import asyncio
+import multiprocessing
+import time
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from commands.public_remind import Remind, Reminder
+from commands.reminder_store import SqliteReminderStore
+from commands.sharding import shard_for_guild, get_client_shards
+from fake_discord import FakeClient
+
+SHARD_COUNT = 3
+GUILD_IDS = [(index << 22) + 12345 for index in range(1, 31)]
+
+
+def create_process(tmp_path: Path, client: FakeClient, name: str) -> Remind:
+    """ One bot process, all processes share the reminder database, see bot.py """
+    r = Remind(client=client, data_folder=tmp_path)
+    r.reminder_storage = "sqlite"
+    # Every process has its own outbox
+    r.reminder_outbox_path = tmp_path / f"reminders_{name}.outbox"
+    r.reminder_dead_letter_path = tmp_path / f"reminders_dead_letter_{name}.jsonl"
+    return r
+
+
+def create_fake_gateway(shard_ids: List[int], shard_count: int) -> FakeClient:
+    """ Client with a user and one channel per guild """
+    client = FakeClient(shard_ids=shard_ids, shard_count=shard_count)
+    client.add_user(1)
+    for guild_id in GUILD_IDS:
+        client.add_channel(guild_id + 1, guild_id=guild_id)
+    return client
+
+
+def store_due_reminders(database_path: Path):
+    store = SqliteReminderStore(database_path)
+    store.record_many(
+        "add",
+        [
+            Reminder(time.time() - 1, user_id=1, guild_id=guild_id, channel_id=guild_id + 1, message=str(guild_id)).to_dict()
+            for guild_id in GUILD_IDS
+        ],
+    )
+    store.close()
+
+
+def run_shard_process(tmp_path: Path, shard_id: int) -> List[str]:
+    """ One bot process, returns the reminder messages it sent """
+
+    async def run() -> List[str]:
+        client = create_fake_gateway([shard_id], SHARD_COUNT)
+        r = create_process(tmp_path, client, f"shard{shard_id}")
+        await r.set_shards(*get_client_shards(client))
+        await r.tick()
+        await r.shutdown()
+        return [message for channel in client.channels.values() for message in channel.sent]
+
+    return asyncio.run(run())
+
+
+def test_shard_for_guild_uses_discord_formula():
+    assert shard_for_guild(384968030423351298, 1) == 0
+    assert shard_for_guild(7 << 22, 3) == 1
+    assert shard_for_guild((8 << 22) + 4_000_000, 3) == 2
+    # Direct messages
+    assert shard_for_guild(0, 3) == 0
+
+
+def test_client_shards():
+    assert get_client_shards(FakeClient()) == (None, 1)
+    assert get_client_shards(FakeClient(shard_ids=[2, 0], shard_count=3)) == ([0, 2], 3)
+    assert get_client_shards(FakeClient(shard_ids=[0, 1, 2], shard_count=3)) == (None, 3)
+
+
+def test_processes_deliver_only_their_own_shards(tmp_path):
+    store_due_reminders(tmp_path / "reminders.db")
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(SHARD_COUNT) as pool:
+        results = pool.starmap(run_shard_process, [(tmp_path, shard_id) for shard_id in range(SHARD_COUNT)])
+
+    sent_guild_ids = [[int(message.rsplit(" ", 1)[1]) for message in messages] for messages in results]
+    assert sorted(guild_id for guild_ids in sent_guild_ids for guild_id in guild_ids) == GUILD_IDS
+    for shard_id, guild_ids in enumerate(sent_guild_ids):
+        assert guild_ids
+        assert all(shard_for_guild(guild_id, SHARD_COUNT) == shard_id for guild_id in guild_ids)
+    store = SqliteReminderStore(tmp_path / "reminders.db")
+    assert store.count() == 0
+    store.close()
+
+
+@pytest.mark.asyncio
+async def test_shards_are_rebalanced_when_shard_count_changes(tmp_path):
+    store = SqliteReminderStore(tmp_path / "reminders.db")
+    store.record_many(
+        "add", [Reminder(time.time() + 3600, user_id=1, guild_id=guild_id).to_dict() for guild_id in GUILD_IDS]
+    )
+    store.close()
+    processes = [create_process(tmp_path, FakeClient(), f"process{index}") for index in range(2)]
+    await processes[0].set_shards([0], 1)
+    assert len(processes[0].reminders) == 30
+
+    # A second process joins, both now own half of the shards
+    for shard_id, r in enumerate(processes):
+        await r.set_shards([shard_id], 2)
+    assert [len(r.reminders) for r in processes] == [15, 15]
+    assert all(shard_for_guild(reminder.guild_id, 2) == 1 for reminder in processes[1].reminders)
+    # Same shards again does not reload
+    reminders_before = processes[0].reminders
+    await processes[0].set_shards([0], 2)
+    assert processes[0].reminders is reminders_before
+    for r in processes:
+        await r.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_reminder_deleted_by_other_process_is_not_delivered(tmp_path):
+    client = create_fake_gateway([0, 1, 2], SHARD_COUNT)
+    owner = create_process(tmp_path, client, "owner")
+    await owner.set_shards([0, 1, 2], SHARD_COUNT)
+    assert owner.shard_ids == [0, 1, 2]
+    guild_id = GUILD_IDS[0]
+    await owner._add_reminder(
+        Reminder(time.time() - 1, user_id=1, guild_id=guild_id, channel_id=guild_id + 1, message="deleted")
+    )
+    # The reminder is deleted through another process, e.g. one that still owned the shard before a rebalance
+    other = create_process(tmp_path, FakeClient(), "other")
+    await other.set_shards([], SHARD_COUNT)
+    await other.public_del_remind(client.users[1], "1")
+
+    await owner.tick()
+    assert client.channels[guild_id + 1].sent == []
+    assert len(owner.outbox) == 0
+    for r in [owner, other]:
+        await r.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_sharding_requires_a_shared_store(tmp_path):
+    r = create_process(tmp_path, FakeClient(), "json")
+    r.reminder_storage = "journal"
+    with pytest.raises(ValueError):
+        await r.set_shards([0], 2)
@@ -0,0 +1,84 @@
+import sys, os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+import asyncio
+
+import pytest
+
+import commands.public_mmr
+from commands.http_client import HttpClient
+from commands.public_mmr import public_mmr
+from commands.single_flight import SingleFlight
+from commands.tiered_cache import TieredCache
+from fake_discord import FakeUser
+from fake_sc2ladder import FakeSc2Ladder
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_are_coalesced():
+    single_flight = SingleFlight()
+    calls = []
+
+    async def fetch(value):
+        calls.append(value)
+        await asyncio.sleep(0.01)
+        return value
+
+    results = await asyncio.gather(*(single_flight.do(key, lambda key=key: fetch(key)) for key in "aaab"))
+    assert results == list("aaab")
+    assert calls == ["a", "b"]
+    assert (single_flight.calls, single_flight.coalesced) == (2, 2)
+    assert not single_flight.in_flight
+    # Calls which are not concurrent are not coalesced
+    assert await single_flight.do("a", lambda: fetch("a")) == "a"
+    assert calls == ["a", "b", "a"]
+
+
+@pytest.mark.asyncio
+async def test_errors_and_cancellation():
+    single_flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream is down")
+
+    results = await asyncio.gather(single_flight.do("a", fail), single_flight.do("a", fail), return_exceptions=True)
+    assert [type(result) for result in results] == [ValueError, ValueError]
+    assert single_flight.calls == 1
+
+    async def slow():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    # Cancelling the caller which started the call does not cancel it for the others
+    first = asyncio.ensure_future(single_flight.do("b", slow))
+    second = asyncio.ensure_future(single_flight.do("b", slow))
+    await asyncio.sleep(0)
+    first.cancel()
+    assert await second == "done"
+    assert first.cancelled()
+
+
+@pytest.mark.asyncio
+async def test_public_mmr_requests_are_coalesced(monkeypatch):
+    sc2ladder = await FakeSc2Ladder().start()
+    monkeypatch.setattr(commands.public_mmr, "SC2LADDER_URL", sc2ladder.url)
+    http_client = HttpClient()
+    cache = TieredCache(ttl=60)
+    single_flight = SingleFlight()
+    author = FakeUser(1)
+
+    names = ["Harstem"] * 5 + ["harstem "] * 5 + ["serral"]
+    results = await asyncio.gather(*(public_mmr(author, name, http_client, cache, single_flight) for name in names))
+    assert all("ToIsengard" in result for result in results)
+    assert sorted(sc2ladder.queries) == ["harstem", "serral"]
+    assert single_flight.coalesced == 9
+    # All concurrent lookups were misses, later lookups are answered by the cache
+    assert cache.misses == 11
+    await public_mmr(author, "harstem", http_client, cache, single_flight)
+    assert cache.hits == 1
+    assert len(sc2ladder.queries) == 2
+
+    await http_client.close()
+    await sc2ladder.close()
@@ -0,0 +1,121 @@
+import sys, os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+import asyncio
+import time
+
+import pytest
+
+import commands.public_mmr
+from commands.http_client import HttpClient
+from commands.public_mmr import public_mmr
+from commands.tiered_cache import TieredCache
+from fake_discord import FakeUser
+from fake_sc2ladder import FakeSc2Ladder
+
+
+class CountingFetch:
+    def __init__(self):
+        self.calls: int = 0
+        self.fail: bool = False
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(0)
+        if self.fail:
+            raise ValueError("upstream is down")
+        return [self.calls]
+
+
+@pytest.mark.asyncio
+async def test_fresh_and_missing_entries():
+    cache = TieredCache(ttl=60)
+    fetch = CountingFetch()
+    assert await cache.get("harstem", fetch) == [1]
+    assert await cache.get("harstem", fetch) == [1]
+    assert await cache.get("serral", fetch) == [2]
+    assert fetch.calls == 2
+    assert (cache.hits, cache.stale_hits, cache.misses) == (1, 0, 2)
+    assert cache.hit_rate == 1 / 3
+    assert cache.latency_saved > 0
+    # Errors of a miss are raised and nothing is cached
+    fetch.fail = True
+    with pytest.raises(ValueError):
+        await cache.get("maru", fetch)
+    assert cache.memory.get("maru") is None
+
+
+@pytest.mark.asyncio
+async def test_stale_while_revalidate():
+    cache = TieredCache(ttl=60)
+    fetch = CountingFetch()
+    cache.set("harstem", ["old"], fetched_at=time.time() - 120)
+    # The stale value is returned right away, only one refresh runs for concurrent lookups
+    assert await asyncio.gather(cache.get("harstem", fetch), cache.get("harstem", fetch)) == [["old"], ["old"]]
+    assert cache.stale_hits == 2
+    await cache.close()
+    assert fetch.calls == 1
+    assert not cache.refreshing
+    assert await cache.get("harstem", fetch) == [1]
+    assert cache.hits == 1
+
+    # A failed refresh keeps the stale value
+    cache.set("serral", ["old"], fetched_at=time.time() - 120)
+    fetch.fail = True
+    assert await cache.get("serral", fetch) == ["old"]
+    await cache.close()
+    assert cache.refresh_failures == 1
+    assert await cache.get("serral", fetch) == ["old"]
+    await cache.close()
+
+    # Entries older than the stale ttl are refetched
+    cache.set("maru", ["old"], fetched_at=time.time() - 86400)
+    fetch.fail = False
+    assert await cache.get("maru", fetch) == [4]
+
+
+@pytest.mark.asyncio
+async def test_disk_tier_survives_restart(tmp_path):
+    path = tmp_path / "cache.json"
+    cache = TieredCache(ttl=60, path=path, disk_max_size=2)
+    fetch = CountingFetch()
+    for key in ["a", "b", "c"]:
+        await cache.get(key, fetch)
+    await cache.close()
+
+    restarted = TieredCache(ttl=60, path=path)
+    # The oldest entry was dropped from the disk tier
+    assert set(restarted.disk) == {"b", "c"}
+    assert await restarted.get("c", fetch) == [3]
+    assert (restarted.hits, restarted.disk_hits) == (1, 1)
+    # Promoted into the memory tier
+    assert await restarted.get("c", fetch) == [3]
+    assert restarted.disk_hits == 1
+    assert fetch.calls == 3
+
+
+@pytest.mark.asyncio
+async def test_public_mmr_is_cached(monkeypatch):
+    sc2ladder = await FakeSc2Ladder().start()
+    monkeypatch.setattr(commands.public_mmr, "SC2LADDER_URL", sc2ladder.url)
+    http_client = HttpClient()
+    cache = TieredCache(ttl=60)
+    author = FakeUser(1)
+
+    first = await public_mmr(author, "Harstem", http_client, cache)
+    assert "ToIsengard" in first
+    # Queries are normalized
+    assert "ToIsengard" in await public_mmr(author, " harstem ", http_client, cache)
+    assert sc2ladder.queries == ["harstem"]
+    assert cache.hits == 1
+
+    # Errors are not cached
+    sc2ladder.status = 500
+    assert await public_mmr(author, "serral", http_client, cache) == "Error: Status code `500` for query `serral`"
+    assert await public_mmr(author, "serral", http_client, cache) == "Error: Status code `500` for query `serral`"
+    assert sc2ladder.queries == ["harstem", "serral", "serral"]
+
+    await cache.close()
+    await http_client.close()
+    await sc2ladder.close()
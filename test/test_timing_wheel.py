@@ -0,0 +1,79 @@
+import sys, os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+import random
+
+from commands.public_remind import Reminder
+from commands.reminder_queue import ReminderQueue
+from commands.timing_wheel import TimingWheelQueue
+
+NOW = 1_600_000_000
+
+
+def test_pops_in_same_order_as_heap():
+    rng = random.Random(0)
+    heap_reminders = []
+    wheel_reminders = []
+    for _ in range(2000):
+        # Same second, seconds, hours, years and beyond the highest wheel
+        offset = rng.choice([0, rng.uniform(-10, 10), rng.uniform(0, 1000), rng.uniform(0, 10 ** 6), 10 ** 13])
+        heap_reminders.append(Reminder(reminder_utc_timestamp=NOW + offset))
+        wheel_reminders.append(Reminder(reminder_utc_timestamp=NOW + offset))
+    heap = ReminderQueue()
+    wheel = TimingWheelQueue(time_now=NOW)
+    popped_heap = []
+    popped_wheel = []
+    for index in range(len(heap_reminders)):
+        heap.push(heap_reminders[index])
+        wheel.push(wheel_reminders[index])
+        if index % 7 == 0:
+            cancel_index = rng.randrange(index + 1)
+            if heap_reminders[cancel_index].reminder_utc_timestamp in popped_heap:
+                # Like Remind, only cancel reminders that are still queued
+                continue
+            assert heap.cancel(heap_reminders[cancel_index]) == wheel.cancel(wheel_reminders[cancel_index])
+        if index % 5 == 0 and heap:
+            assert heap.peek().reminder_utc_timestamp == wheel.peek().reminder_utc_timestamp
+            assert heap.peek_due_ms() == wheel.peek_due_ms()
+            popped_heap.append(heap.pop().reminder_utc_timestamp)
+            popped_wheel.append(wheel.pop().reminder_utc_timestamp)
+        assert len(heap) == len(wheel)
+    while heap:
+        popped_heap.append(heap.pop().reminder_utc_timestamp)
+        popped_wheel.append(wheel.pop().reminder_utc_timestamp)
+    assert popped_wheel == popped_heap
+    assert not wheel
+    assert wheel.peek() is None
+
+
+def test_reminders_in_the_same_second_keep_order():
+    reminders = [Reminder(reminder_utc_timestamp=NOW + 5.5, message=str(i)) for i in range(3)]
+    reminders.append(Reminder(reminder_utc_timestamp=NOW + 5.2, message="first"))
+    wheel = TimingWheelQueue(reminders, time_now=NOW)
+    assert [wheel.pop().message for _ in range(4)] == ["first", "0", "1", "2"]
+
+
+def test_advance_moves_due_reminders_into_ready():
+    reminders = [Reminder(reminder_utc_timestamp=NOW + offset) for offset in [1, 300, 70_000, 20_000_000]]
+    wheel = TimingWheelQueue(reminders, time_now=NOW)
+    assert not wheel.ready
+    wheel.advance(NOW + 70_000)
+    assert [reminder.reminder_utc_timestamp for _, reminder in sorted(wheel.ready)] == [NOW + 1, NOW + 300, NOW + 70_000]
+    assert len(wheel) == 4
+    assert wheel.peek().reminder_utc_timestamp == NOW + 1
+
+
+def test_cancelled_reminders_are_dropped_and_compacted():
+    reminders = [Reminder(reminder_utc_timestamp=NOW + timestamp) for timestamp in range(100)]
+    wheel = TimingWheelQueue(reminders, compact_ratio=0.5, compact_minimum=10, time_now=NOW)
+    assert wheel.cancel(reminders[0])
+    assert not wheel.cancel(reminders[0])
+    assert wheel.peek() is reminders[1]
+    for reminder in reminders[40:100]:
+        wheel.cancel(reminder)
+    # Compacted once half of the entries were cancelled
+    assert wheel.size < 99
+    assert len(wheel) == 39
+    assert sorted(wheel) == reminders[1:40]
+    assert [wheel.pop() for _ in range(39)] == reminders[1:40]
@@ -2,9 +2,14 @@ import sys, os
 
 sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
 
+import asyncio
+
 import pytest
-import aiohttp
+from aiohttp import web
+from aiohttp.test_utils import TestServer
 
+import commands.public_vod
+from commands.http_client import HttpClient
 from commands.public_vod import Vod
 
 
@@ -66,9 +71,9 @@ async def test_parse_api_result():
     }
     test_object = Vod()
 
-    session: aiohttp.ClientSession
-    async with aiohttp.ClientSession() as session:
-        parsed_data = await test_object.vod_parse_api_response(session, example_response)
+    http_client = HttpClient()
+    parsed_data = await test_object.vod_parse_api_response(http_client, example_response)
+    await http_client.close()
 
     correct_parsed_data = (
         "musti20045",
@@ -80,3 +85,47 @@ async def test_parse_api_result():
 
     # Last value doesnt have to be correct
     assert parsed_data[:3] == correct_parsed_data[:3]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_stream_lookups_are_coalesced(monkeypatch):
+    pages = {"0": ["serral", "harstem"], "1": ["maru"], "2": []}
+    requested_pages = []
+
+    async def streams(request: web.Request) -> web.Response:
+        page: str = request.query.get("page", "0")
+        requested_pages.append(page)
+        await asyncio.sleep(0.01)
+        return web.json_response(
+            {
+                "streams": [{"channel": {"display_name": name}} for name in pages[page]],
+                "_links": {"next": str(server.make_url(f"/kraken/streams?page={int(page) + 1}"))},
+            }
+        )
+
+    async def videos(request: web.Request) -> web.Response:
+        requested_pages.append("videos")
+        await asyncio.sleep(0.01)
+        return web.json_response({"videos": [{"url": "https://www.twitch.tv/videos/1"}]})
+
+    app = web.Application()
+    app.router.add_get("/kraken/streams", streams)
+    app.router.add_get("/kraken/channels/{name}/videos", videos)
+    server = TestServer(app)
+    await server.start_server()
+    monkeypatch.setattr(commands.public_vod, "TWITCH_API_URL", str(server.make_url("")).rstrip("/"))
+
+    http_client = HttpClient()
+    vod = Vod(http_client)
+    results = await asyncio.gather(*(vod._fetch_live_streams() for _ in range(5)))
+    for result in results:
+        assert [stream["channel"]["display_name"] for stream in result] == ["serral", "harstem", "maru"]
+    # One pass over the pages for all callers
+    assert requested_pages == ["0", "1", "2"]
+    vod_urls = await asyncio.gather(*(vod._get_vod_with_timestamp(http_client, "Serral", uptime) for uptime in [1, 2]))
+    assert vod_urls == ["https://www.twitch.tv/videos/1?t=1s", "https://www.twitch.tv/videos/1?t=2s"]
+    assert requested_pages.count("videos") == 1
+    assert vod.single_flight.coalesced == 5
+
+    await http_client.close()
+    await server.close()